@@ -25,8 +25,9 @@ export function fetchAssets() {
     });
 }
 
-export function fetchSensorData() {
-  return axios.get(`${API_BASE}/sensors`)
+// Optional params ({ from, to, points, method }) request a downsampled range instead of the latest readings
+export function fetchSensorData(params = {}) {
+  return axios.get(`${API_BASE}/sensors`, { params })
     .catch(error => {
       console.error("Error fetching sensor data:", error);
       return { data: [] }; 
@@ -42,6 +43,86 @@ export function fetchPredictions() {
     });
 }
 
+// One prediction stream per page, shared by every subscriber: each open stream holds a server worker thread
+const STREAM_RETRY_MIN_MS = 1000;
+const STREAM_RETRY_MAX_MS = 30000;
+const STREAM_RECENT_LIMIT = 200;
+
+const predictionStream = {
+  source: null,
+  listeners: new Set(),
+  recent: null, // the snapshot plus predictions since, newest first, for subscribers that join later
+  retryTimer: null,
+  retryDelay: STREAM_RETRY_MIN_MS
+};
+
+function openPredictionStream() {
+  const stream = predictionStream;
+  const source = new EventSource(`${API_BASE}/stream/predictions`);
+  stream.source = source;
+
+  source.addEventListener('snapshot', event => {
+    const snapshot = JSON.parse(event.data);
+    stream.recent = snapshot;
+    stream.retryDelay = STREAM_RETRY_MIN_MS;
+    stream.listeners.forEach(listener => listener.onSnapshot && listener.onSnapshot(snapshot));
+  });
+  source.addEventListener('predictions', event => {
+    const predictions = JSON.parse(event.data);
+    stream.recent = [...predictions, ...(stream.recent || [])].slice(0, STREAM_RECENT_LIMIT);
+    stream.listeners.forEach(listener => listener.onPredictions && listener.onPredictions(predictions));
+  });
+  source.onerror = error => {
+    console.error("Prediction stream error:", error);
+    stream.recent = null;
+    // Subscribers poll until the next snapshot, which the server sends first on every connection
+    stream.listeners.forEach(listener => listener.onError && listener.onError(error));
+    // EventSource retries dropped connections itself, but gives up once the server answers with an error
+    if (source.readyState === EventSource.CLOSED && stream.source === source) {
+      stream.source = null;
+      stream.retryTimer = setTimeout(() => {
+        stream.retryTimer = null;
+        if (stream.listeners.size > 0) openPredictionStream();
+      }, stream.retryDelay);
+      stream.retryDelay = Math.min(stream.retryDelay * 2, STREAM_RETRY_MAX_MS);
+    }
+  };
+}
+
+function closePredictionStream() {
+  const stream = predictionStream;
+  if (stream.source) stream.source.close();
+  clearTimeout(stream.retryTimer);
+  stream.source = null;
+  stream.retryTimer = null;
+  stream.recent = null;
+  stream.retryDelay = STREAM_RETRY_MIN_MS;
+}
+
+// Subscribe to server-sent prediction updates. Returns a function that unsubscribes; the shared
+// stream closes when its last subscriber leaves.
+export function subscribePredictions({ onSnapshot, onPredictions, onError }) {
+  if (typeof EventSource === 'undefined') {
+    onError && onError(new Error('EventSource is not supported'));
+    return () => {};
+  }
+
+  const stream = predictionStream;
+  const listener = { onSnapshot, onPredictions, onError };
+  stream.listeners.add(listener);
+  if (!stream.source && !stream.retryTimer) {
+    openPredictionStream();
+  } else if (stream.recent) {
+    // Already streaming: start the new subscriber from what the page has seen so far
+    onSnapshot && onSnapshot(stream.recent);
+  }
+
+  return () => {
+    stream.listeners.delete(listener);
+    if (stream.listeners.size === 0) closePredictionStream();
+  };
+}
+
 export function postNewPrediction(payload) {
   console.log("Sending to backend:", payload);
   
@@ -1,12 +1,23 @@
 import React from 'react';
 import { useEffect, useState } from 'react';
-import { fetchPredictions } from '../api/model';
+import { fetchPredictions, subscribePredictions } from '../api/model';
+
+// Newest 10 predictions, de-duplicated by machine and timestamp
+const latestRows = (predictions) => {
+  const unique = new Map();
+  predictions.forEach(p => unique.set(`${p.machine_id}|${p.timestamp}`, p));
+  return Array.from(unique.values())
+    .sort((a, b) => new Date(b.timestamp) - new Date(a.timestamp))
+    .slice(0, 10)
+    .map((p, index) => ({ ...p, id: index + 1 }));
+};
 
 export default function PredictionDashboard() {
   const [rows, setRows] = useState([]);
   const [loading, setLoading] = useState(true);
   const [autoRefresh, setAutoRefresh] = useState(true);
   const [lastUpdated, setLastUpdated] = useState(new Date());
+  const [streaming, setStreaming] = useState(false);
 
   const fetchData = async () => {
     setLoading(true);
@@ -40,16 +51,39 @@ export default function PredictionDashboard() {
     fetchData();
   }, []);
 
-  // Auto-refresh functionality
+  // Live updates pushed by the backend; replaces polling while the stream is up
   useEffect(() => {
     if (!autoRefresh) return;
 
+    const unsubscribe = subscribePredictions({
+      onSnapshot: snapshot => {
+        setStreaming(true);
+        if (snapshot.length > 0) setRows(latestRows(snapshot));
+        setLastUpdated(new Date());
+      },
+      onPredictions: predictions => {
+        setRows(current => latestRows([...predictions, ...current]));
+        setLastUpdated(new Date());
+      },
+      onError: () => setStreaming(false)
+    });
+
+    return () => {
+      unsubscribe();
+      setStreaming(false);
+    };
+  }, [autoRefresh]);
+
+  // Auto-refresh functionality (fallback when the stream is unavailable)
+  useEffect(() => {
+    if (!autoRefresh || streaming) return;
+
     const interval = setInterval(() => {
       fetchData();
     }, 10000); // Refresh every 10 seconds
 
     return () => clearInterval(interval);
-  }, [autoRefresh]);
+  }, [autoRefresh, streaming]);
 
   const containerStyles = {
     padding: '1.5rem',
@@ -297,7 +331,7 @@ export default function PredictionDashboard() {
             <span>
               {autoRefresh && (
                 <span style={{ color: '#22c55e', fontWeight: 500 }}>
-                  🔄 Auto-refresh: ON (every 10s)
+                  {streaming ? '🟢 Live stream: ON' : '🔄 Auto-refresh: ON (every 10s)'}
                 </span>
               )}
               {!autoRefresh && (
@@ -1,16 +1,28 @@
 import React from 'react';
 import { useEffect, useState } from 'react';
-import { fetchSensorData } from '../api/model';
+import { fetchSensorData, subscribePredictions } from '../api/model';
 import {
   LineChart, Line, XAxis, YAxis, Tooltip, Legend, CartesianGrid, ResponsiveContainer,
   BarChart, Bar, AreaChart, Area, PieChart, Pie, Cell
 } from 'recharts';
 
+// Streamed predictions carry the sensor values they were scored from
+const toSensorReading = (prediction) => ({
+  device_id: prediction.machine_id,
+  timestamp: prediction.timestamp,
+  temperature: prediction.temperature,
+  vibration: prediction.vibration,
+  power_consumption: prediction.power,
+  humidity: prediction.humidity,
+  pressure: prediction.pressure
+});
+
 export default function SensorDashboard() {
   const [data, setData] = useState([]);
   const [loading, setLoading] = useState(true);
   const [autoRefresh, setAutoRefresh] = useState(true);
   const [lastUpdated, setLastUpdated] = useState(new Date());
+  const [streaming, setStreaming] = useState(false);
 
   const fetchData = async () => {
     setLoading(true);
@@ -29,16 +41,42 @@ export default function SensorDashboard() {
     fetchData();
   }, []);
 
-  // Auto-refresh functionality
+  // New readings pushed by the backend; replaces polling while the stream is up
   useEffect(() => {
     if (!autoRefresh) return;
 
+    const unsubscribe = subscribePredictions({
+      onSnapshot: () => setStreaming(true),
+      onPredictions: predictions => {
+        setData(current => {
+          const seen = new Set(current.map(item => `${item.device_id}|${item.timestamp}`));
+          const fresh = predictions
+            .map(toSensorReading)
+            .filter(item => !seen.has(`${item.device_id}|${item.timestamp}`))
+            .sort((a, b) => new Date(b.timestamp) - new Date(a.timestamp));
+          return [...fresh, ...current].slice(0, 24).map((item, index) => ({ ...item, id: index + 1 }));
+        });
+        setLastUpdated(new Date());
+      },
+      onError: () => setStreaming(false)
+    });
+
+    return () => {
+      unsubscribe();
+      setStreaming(false);
+    };
+  }, [autoRefresh]);
+
+  // Auto-refresh functionality (fallback when the stream is unavailable)
+  useEffect(() => {
+    if (!autoRefresh || streaming) return;
+
     const interval = setInterval(() => {
       fetchData();
     }, 10000); // Refresh every 10 seconds
 
     return () => clearInterval(interval);
-  }, [autoRefresh]);
+  }, [autoRefresh, streaming]);
 
   // Calculate averages for pie chart - ALL METRICS
   const getAverageData = () => {
@@ -255,7 +293,7 @@ export default function SensorDashboard() {
               alignItems: 'center'
             }}>
               <span>
-                {autoRefresh && <span style={{ color: '#22c55e', fontWeight: 500 }}>🔄 Auto-refresh: ON</span>}
+                {autoRefresh && <span style={{ color: '#22c55e', fontWeight: 500 }}>{streaming ? '🟢 Live stream: ON' : '🔄 Auto-refresh: ON'}</span>}
               </span>
               <span>
                 Last updated: {lastUpdated.toLocaleTimeString()} • {data.length} data points
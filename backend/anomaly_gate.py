@@ -0,0 +1,204 @@
+import threading
+
+import numpy as np
+
+from scoring import SENSOR_DEFAULTS
+
+SENSOR_CHANNELS = list(SENSOR_DEFAULTS)
+
+# Per-device streaming control limits in front of the model
+class AnomalyGate:
+    """
+    Exponentially weighted mean and variance of every sensor channel, per
+    device, updated with each reading as it streams in (outliers clipped to
+    the limits, so a lasting shift is learned gradually and a spike barely). A reading is in
+    control when its device has seen at least warmup readings and every channel
+    is within threshold standard deviations of the device's mean so far.
+
+    When the model scores in-control readings, the gate keeps their risk and
+    the device's mean at that point (the anchor). Later in-control readings are
+    nominal, and reuse that risk instead of reaching the model, while the risk
+    is below max_risk and the mean stays within radius standard deviations of
+    the anchor on every channel. Noise barely moves the mean, but a slow drift
+    does, so a drifting device still reaches the model every radius standard
+    deviations even though its limits follow it.
+
+    Like PredictionCache, cached risks belong to one model: the first call with
+    a different model object clears them, so the gate passes everything
+    through until the new model has scored each device again. The statistics
+    themselves describe the devices and survive a model swap.
+
+    Each reading is folded in once: a device's readings at or before the
+    newest timestamp it has folded in (the same cached query result reaching
+    two concurrent polls, say) are checked against the limits but leave the
+    statistics alone.
+    """
+
+    def __init__(self, alpha=0.05, threshold=3.0, radius=0.5, warmup=30, max_risk=0.5):
+        self.alpha = alpha
+        self.threshold = threshold
+        self.radius = radius
+        self.warmup = warmup
+        self.max_risk = max_risk
+        self._index = {}  # device_id -> row of the state arrays
+        self._count = np.zeros(0, dtype=np.int64)
+        self._mean = np.zeros((0, len(SENSOR_CHANNELS)))
+        self._var = np.zeros((0, len(SENSOR_CHANNELS)))
+        self._anchor = np.zeros((0, len(SENSOR_CHANNELS)))
+        self._risk = np.zeros(0)  # NaN until the model scores an in-control reading
+        self._last = np.zeros(0, dtype=object)  # newest timestamp folded in, "" until the first
+        self._model = None
+        self._lock = threading.Lock()
+        self.gated = 0
+        self.passed = 0
+
+    def _rows(self, device_ids):
+        """State row per device id, growing the arrays for devices seen for the first time"""
+        index = self._index
+        for device_id in dict.fromkeys(device_ids):
+            if device_id not in index:
+                index[device_id] = len(index)
+        size = len(index)
+        if size > len(self._count):
+            grow = max(size, 2 * len(self._count)) - len(self._count)
+            self._count = np.concatenate([self._count, np.zeros(grow, dtype=np.int64)])
+            self._mean = np.concatenate([self._mean, np.zeros((grow, len(SENSOR_CHANNELS)))])
+            self._var = np.concatenate([self._var, np.zeros((grow, len(SENSOR_CHANNELS)))])
+            self._anchor = np.concatenate([self._anchor, np.zeros((grow, len(SENSOR_CHANNELS)))])
+            self._risk = np.concatenate([self._risk, np.full(grow, np.nan)])
+            self._last = np.concatenate([self._last, np.full(grow, "", dtype=object)])
+        return np.fromiter((index[device_id] for device_id in device_ids), dtype=np.int64, count=len(device_ids))
+
+    def _check_model(self, model):
+        if model is not self._model:
+            self._risk[:] = np.nan
+            self._model = model
+
+    def observe(self, model, device_ids, values, timestamps):
+        """
+        Check a batch of readings (values: one row per reading, SENSOR_CHANNELS
+        columns) against each device's limits as they stood before the batch,
+        then fold its new readings into the statistics in timestamp order. Returns
+        (nominal, in_control, risk): nominal readings may take risk instead of
+        the model; in-control readings that aren't nominal should be scored and
+        handed to record_risk().
+        """
+        with self._lock:
+            self._check_model(model)
+            rows = self._rows(device_ids)
+            mean = self._mean[rows]
+            # A channel that never varied still tolerates rounding noise
+            std = np.sqrt(self._var[rows]) + 1e-9 * (1.0 + np.abs(mean))
+            in_control = ((self._count[rows] >= self.warmup)
+                          & (np.abs(values - mean) <= self.threshold * std).all(axis=1))
+            risk = self._risk[rows]
+            nominal = (in_control & (risk < self.max_risk)
+                       & (np.abs(mean - self._anchor[rows]) <= self.radius * std).all(axis=1))
+            gated = int(nominal.sum())
+            self.gated += gated
+            self.passed += len(rows) - gated
+            fresh = self._fresh(rows, timestamps)
+            self._update(rows[fresh], values[fresh], [timestamps[i] for i in np.flatnonzero(fresh)])
+        return nominal, in_control, risk
+
+    def _fresh(self, rows, timestamps):
+        """
+        Mask of the readings newer than their device's newest folded-in one,
+        once per device and timestamp; advances each device's newest. Readings
+        without a timestamp always count.
+        """
+        if not len(rows):
+            return np.zeros(0, dtype=bool)
+        stamps = np.array([timestamp or "" for timestamp in timestamps], dtype=object)
+        fresh = (stamps == "") | (stamps > self._last[rows])
+        order = np.lexsort((stamps.astype(str), rows))
+        ordered_rows, ordered_stamps = rows[order], stamps[order]
+        repeated = (ordered_rows[1:] == ordered_rows[:-1]) & (ordered_stamps[1:] == ordered_stamps[:-1])
+        fresh[order[1:][repeated & (ordered_stamps[1:] != "")]] = False
+        # The last of each device's run in (row, timestamp) order is its newest
+        ends = np.flatnonzero(np.append(ordered_rows[1:] != ordered_rows[:-1], True))
+        devices, newest = ordered_rows[ends], ordered_stamps[ends]
+        self._last[devices] = np.where(newest > self._last[devices], newest, self._last[devices])
+        return fresh
+
+    @staticmethod
+    def _positions(rows, timestamps):
+        """Each reading's position among its device's readings in timestamp order"""
+        order = np.lexsort((np.array([timestamp or "" for timestamp in timestamps]), rows))
+        ordered_rows = rows[order]
+        starts = np.flatnonzero(np.append(True, ordered_rows[1:] != ordered_rows[:-1]))
+        position = np.empty(len(rows), dtype=np.int64)
+        position[order] = np.arange(len(rows)) - np.repeat(starts, np.diff(np.append(starts, len(rows))))
+        return position
+
+    def _update(self, rows, values, timestamps):
+        """EWMA mean/variance update, one pass per reading position so each device's readings go in order"""
+        if not len(rows):
+            return
+        position = self._positions(rows, timestamps)
+        by_position = np.argsort(position, kind="stable")
+        bounds = np.searchsorted(position[by_position], np.arange(position.max() + 2))
+        for start, end in zip(bounds[:-1], bounds[1:]):
+            picked = by_position[start:end]
+            state = rows[picked]  # distinct devices, so the fancy-indexed writes below don't collide
+            x = values[picked]
+            mean = self._mean[state]
+            diff = np.where(np.isfinite(x), x - mean, 0.0)
+            # Once warmed up, an outlier moves the statistics only as far as a reading at the limit would,
+            # so one spike doesn't widen the limits for the readings after it
+            limit = np.where((self._count[state] >= self.warmup)[:, None],
+                             self.threshold * np.sqrt(self._var[state]), np.inf)
+            diff = np.clip(diff, -limit, limit)
+            self._count[state] += 1
+            # Plain running mean and variance until 1/count drops below alpha, then exponential weighting
+            alpha = np.maximum(self.alpha, 1.0 / self._count[state])[:, None]
+            increment = alpha * diff
+            self._mean[state] = mean + increment
+            self._var[state] = (1.0 - alpha) * (self._var[state] + diff * increment)
+
+    def record_risk(self, model, device_ids, risks):
+        """
+        Anchor each device at its current mean with the highest risk the model
+        gave its in-control readings in this batch, so one low score among high
+        ones doesn't resume gating
+        """
+        with self._lock:
+            if model is not self._model or not len(device_ids):
+                return
+            rows = self._rows(device_ids)
+            order = np.argsort(rows, kind="stable")
+            ordered_rows = rows[order]
+            starts = np.flatnonzero(np.append(True, ordered_rows[1:] != ordered_rows[:-1]))
+            devices = ordered_rows[starts]
+            self._anchor[devices] = self._mean[devices]
+            self._risk[devices] = np.maximum.reduceat(np.asarray(risks, dtype=np.float64)[order], starts)
+
+    def reset(self):
+        with self._lock:
+            self._index.clear()
+            self._count = self._count[:0]
+            self._mean = self._mean[:0]
+            self._var = self._var[:0]
+            self._anchor = self._anchor[:0]
+            self._risk = self._risk[:0]
+            self._last = self._last[:0]
+            self._model = None
+            self.gated = 0
+            self.passed = 0
+
+    def stats(self):
+        with self._lock:
+            readings = self.gated + self.passed
+            devices = len(self._index)
+            return {
+                "devices": devices,
+                "warmed_up": int((self._count[:devices] >= self.warmup).sum()),
+                "gated": self.gated,
+                "passed": self.passed,
+                "pass_through_rate": round(self.passed / readings, 4) if readings else None,
+                "alpha": self.alpha,
+                "threshold": self.threshold,
+                "radius": self.radius,
+                "warmup": self.warmup,
+                "max_risk": self.max_risk,
+            }
@@ -2,140 +2,429 @@ from dotenv import load_dotenv
 load_dotenv()  # Load environment variables from .env
 
 import os
+import copy
 import json
-import boto3
-import joblib
+import logging
+import queue
+import threading
+import time
 import numpy as np
-import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from boto3.dynamodb.conditions import Key
-from flask import Flask, jsonify, request
+from decimal import Decimal
+from flask import Flask, Response, g, jsonify, request, stream_with_context
 from flask_cors import CORS
+from werkzeug.exceptions import RequestEntityTooLarge
+from anomaly_gate import SENSOR_CHANNELS, AnomalyGate
+from broadcaster import Broadcaster
+from compiled_forest import compile_model_step
+from compiled_preprocessor import compile_preprocessor, model_input_dtype
+from downsampling import bucket_aggregate, lttb
+from dynamodb_columns import ReadingColumns, query_wire
+from ingest import MicroBatcher
+from lazy import LazyModule, LazyResource, start_warmup
+from metrics import DYNAMODB_REQUESTS, REQUEST_SECONDS, SCORED_ROWS, register_collector, render, span, timed_iter
+from model_registry import LoadedModel, ModelRegistry
+from payloads import (NDJSON_MIMETYPES, FastJSONProvider, columns_to_rows, encode_columns, negotiate_format,
+                      parse_readings, rows_to_columns, stream_results)
+from prediction_cache import PredictionCache, parse_quanta
+from prediction_store import PredictionStore
+from risk_rules import DEFAULT_RISK_RULES, RiskRules
+from scoring import (FEATURE_COLUMNS, MACHINE_TYPE_CODES, SENSOR_DEFAULTS, encode_features, get_model_step,
+                     items_to_frame, preprocessing_steps, score_frame, transform_features, valid_feature_rows,
+                     validate_readings)
+from shadow import ShadowScorer
+from sensor_cache import QueryCache
+from timeseries_store import CHANNELS, TimeSeriesStore, format_seconds, timestamp_seconds
+
+# Log level for the backend (DEBUG adds a line per request); replaces the old unconditional prints
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+logging.basicConfig(level=LOG_LEVEL, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+logger = logging.getLogger("app")
+
+# pandas, boto3 and the pipeline (with sklearn) load on first use or in the warm-up thread
+pd = LazyModule("pandas")
+
+# A multi-device response missing devices whose queries failed names them here as {device_id: error message}
+DEVICE_ERRORS_HEADER = "X-Device-Errors"
 
 app = Flask(__name__)
-CORS(app)  # Enable CORS for API calls from React
+app.json = FastJSONProvider(app)  # jsonify() through orjson when it is installed
+CORS(app, expose_headers=[DEVICE_ERRORS_HEADER])  # Enable CORS for API calls from React
+
+# Per-route latency for /metrics (time to build the response; streamed bodies are timed as spans)
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request_latency(response):
+    started = g.pop("request_started", None)
+    if started is not None:
+        route = request.url_rule.rule if request.url_rule is not None else "unmatched"
+        REQUEST_SECONDS.observe(time.perf_counter() - started, route=route, method=request.method,
+                                status=str(response.status_code))
+    return response
+
+# Upper bound on readings accepted by a single POST /predict/batch request
+PREDICT_BATCH_MAX_ROWS = int(os.getenv("PREDICT_BATCH_MAX_ROWS", 100000))
+# Upper bound on a request body in bytes (0 = no limit); the default leaves room for PREDICT_BATCH_MAX_ROWS
+# JSON readings
+app.config["MAX_CONTENT_LENGTH"] = int(os.getenv("REQUEST_MAX_BYTES", 32 * 1024 * 1024)) or None
+
+@app.errorhandler(RequestEntityTooLarge)
+def request_too_large(e):
+    return jsonify({"error": f"Request body too large: more than {app.config['MAX_CONTENT_LENGTH']} bytes"}), 413
+
+# Posted body, refused from its Content-Length before any of it is read (get_data() alone doesn't check)
+def request_body():
+    limit = app.config["MAX_CONTENT_LENGTH"]
+    if limit is not None and request.content_length is not None and request.content_length > limit:
+        raise RequestEntityTooLarge()
+    return request.get_data()
+
+# Shared read-through cache for DynamoDB sensor queries (seconds; 0 disables caching)
+SENSOR_CACHE_TTL = float(os.getenv("SENSOR_CACHE_TTL", 5))
+SENSOR_CACHE_SIZE = int(os.getenv("SENSOR_CACHE_SIZE", 128))
+sensor_cache = QueryCache(ttl_seconds=SENSOR_CACHE_TTL, max_entries=SENSOR_CACHE_SIZE)
+
+# Device queried when a request does not name any
+DEFAULT_DEVICE_ID = 'ESP8266_IoT'
+
+# Asset registry; device_id links each asset to its DynamoDB partition
+ASSETS = [
+    { "id": 1, "name": "Pump A1", "type": "Hydraulic Pump", "status": "Online", "x_pct": 20, "y_pct": 30, "device_id": "ESP8266_IoT" },
+    { "id": 2, "name": "Motor B2", "type": "Electric Motor", "status": "Warning", "x_pct": 45, "y_pct": 55, "device_id": "Motor_B2" },
+    { "id": 3, "name": "Valve C3", "type": "Control Valve", "status": "Offline", "x_pct": 70, "y_pct": 25, "device_id": "Valve_C3" },
+    { "id": 4, "name": "Fan D4", "type": "Cooling Fan", "status": "Online", "x_pct": 80, "y_pct": 75, "device_id": "Fan_D4" }
+]
+
+# Bounded pool for querying device partitions concurrently
+FLEET_QUERY_WORKERS = int(os.getenv("FLEET_QUERY_WORKERS", 32))
+fleet_executor = ThreadPoolExecutor(max_workers=FLEET_QUERY_WORKERS, thread_name_prefix="dynamodb-query")
+
+# Per-device ring buffers of scored readings; /predict only scores readings newer than these
+PREDICTION_BUFFER_SIZE = int(os.getenv("PREDICTION_BUFFER_SIZE", 10))
+prediction_store = PredictionStore(capacity=PREDICTION_BUFFER_SIZE)
+
+# Server-sent event stream of new predictions, fed by one background poller
+PREDICTION_STREAM_INTERVAL = float(os.getenv("PREDICTION_STREAM_INTERVAL", 5))
+PREDICTION_STREAM_QUEUE_SIZE = int(os.getenv("PREDICTION_STREAM_QUEUE_SIZE", 100))
+PREDICTION_STREAM_DEVICES = os.getenv("PREDICTION_STREAM_DEVICES", DEFAULT_DEVICE_ID)
+prediction_broadcaster = Broadcaster(max_queue=PREDICTION_STREAM_QUEUE_SIZE)
+stream_poller = None
+stream_poller_lock = threading.Lock()
 
-# Global variables to store prediction history
-prediction_history = []
+# Local SQLite history of sensor readings behind /sensors/history (empty path disables it)
+TIMESERIES_DB_PATH = os.getenv("TIMESERIES_DB_PATH", "timeseries.db")
+HISTORY_MAX_POINTS = int(os.getenv("HISTORY_MAX_POINTS", 2000))
+# Default points for downsampled /sensors?from=&to= responses, and the most store rows read to build one
+SENSOR_SERIES_POINTS = int(os.getenv("SENSOR_SERIES_POINTS", 1000))
+SENSOR_SERIES_MAX_ROWS = int(os.getenv("SENSOR_SERIES_MAX_ROWS", 50000))
+history_sync_locks = {}
+history_sync_locks_lock = threading.Lock()
+
+# /sensors field name for each DynamoDB sensor attribute
+SENSOR_FIELDS = {
+    "Temperature": "temperature",
+    "Vibration": "vibration",
+    "Power_Usage": "power_consumption",
+    "Humidity": "humidity",
+    "Pressure": "pressure"
+}
+
+# Value /sensors reports for an attribute missing from a reading
+SENSOR_MISSING_VALUES = {"Temperature": 0, "Vibration": 0, "Power_Usage": 0, "Humidity": 65, "Pressure": 905}
+
+# Model artifact; PIPELINE_MMAP=1 memory-maps its NumPy arrays read-only instead of copying them
+PIPELINE_PATH = os.getenv("PIPELINE_PATH", "pipeline.joblib")
+PIPELINE_MMAP = bool(int(os.getenv("PIPELINE_MMAP", 0)))
+
+# Versioned pipelines (see model_registry.py); PIPELINE_PATH is served while the registry is empty
+MODEL_REGISTRY_DIR = os.getenv("MODEL_REGISTRY_DIR", "model_registry")
+# Seconds between checks for a new ACTIVE registry version (0 = reload only on POST /models/reload)
+MODEL_WATCH_INTERVAL = float(os.getenv("MODEL_WATCH_INTERVAL", 10))
+model_registry = ModelRegistry(MODEL_REGISTRY_DIR)
+
+# Registry versions scored in the shadow of the serving model on live traffic (comma-separated, empty = off)
+SHADOW_MODEL_VERSIONS = [version.strip() for version in os.getenv("SHADOW_MODEL_VERSIONS", "").split(",") if version.strip()]
+SHADOW_WORKERS = int(os.getenv("SHADOW_WORKERS", 2))
+# One JSON line per shadow batch for offline analysis (empty = keep in-memory stats only)
+SHADOW_LOG_PATH = os.getenv("SHADOW_LOG_PATH", "shadow_log.jsonl")
+shadow_scorer = ShadowScorer(workers=SHADOW_WORKERS, log_path=SHADOW_LOG_PATH or None)
+
+# Memoized risk per feature vector for /predict and the stream poller (0 = off); PREDICTION_CACHE_QUANTUM
+# rounds features before lookup, e.g. "Temperature=0.1,Humidity=0.1,Pressure=0.1" (default: exact values)
+PREDICTION_CACHE_SIZE = int(os.getenv("PREDICTION_CACHE_SIZE", 10000))
+prediction_cache = PredictionCache(max_entries=PREDICTION_CACHE_SIZE,
+                                   quanta=parse_quanta(os.getenv("PREDICTION_CACHE_QUANTUM", "")))
+
+# Rules for readings the model can't score (built-in defaults if the file is absent). With RISK_PREFILTER=1,
+# readings inside the file's "healthy" ranges get the rule-based risk without reaching the model
+RISK_RULES_PATH = os.getenv("RISK_RULES_PATH", "risk_rules.json")
+RISK_PREFILTER = bool(int(os.getenv("RISK_PREFILTER", 0)))
+risk_rules = (RiskRules.load(RISK_RULES_PATH, columns=FEATURE_COLUMNS) if os.path.exists(RISK_RULES_PATH)
+              else DEFAULT_RISK_RULES)
+
+# Per-device EWMA control limits in front of the model for /predict and the stream poller (1 = on). A reading
+# within ANOMALY_GATE_Z standard deviations of its device's recent mean reuses the device's last model risk while
+# that is below ANOMALY_GATE_MAX_RISK and the mean has moved less than ANOMALY_GATE_RADIUS deviations since that score
+ANOMALY_GATE = bool(int(os.getenv("ANOMALY_GATE", 0)))
+anomaly_gate = AnomalyGate(alpha=float(os.getenv("ANOMALY_GATE_ALPHA", 0.05)),
+                           threshold=float(os.getenv("ANOMALY_GATE_Z", 3)),
+                           radius=float(os.getenv("ANOMALY_GATE_RADIUS", 0.5)),
+                           warmup=int(os.getenv("ANOMALY_GATE_WARMUP", 30)),
+                           max_risk=float(os.getenv("ANOMALY_GATE_MAX_RISK", 0.5)))
+
+# POST /ingest queues readings (at most INGEST_QUEUE_ROWS) for one worker that scores them in micro-batches of
+# INGEST_BATCH_ROWS, or sooner once the oldest has waited INGEST_MAX_WAIT_MS. INGEST_WRITE_BACK=1 also has the
+# worker write them, with their risk, to DynamoDB
+INGEST_BATCH_ROWS = int(os.getenv("INGEST_BATCH_ROWS", 256))
+INGEST_MAX_WAIT_MS = float(os.getenv("INGEST_MAX_WAIT_MS", 20))
+INGEST_QUEUE_ROWS = int(os.getenv("INGEST_QUEUE_ROWS", 10000))
+INGEST_WRITE_BACK = bool(int(os.getenv("INGEST_WRITE_BACK", 0)))
+
+# /ingest stores readings for devices outside ASSETS only while fewer than INGEST_MAX_DEVICES of them are stored,
+# so posts with arbitrary deviceIds can't grow prediction_store without bound (0 = ASSETS devices only)
+INGEST_MAX_DEVICES = int(os.getenv("INGEST_MAX_DEVICES", 1000))
+
+# Global variables
 unchanged_counter = 0
 
-# Load the machine learning pipeline directly
-try:
-    # Load pipeline directly from joblib file
-    pipeline = joblib.load("pipeline.joblib")
-    print(f"Pipeline loaded successfully from pipeline.joblib")
-    print(f"Pipeline steps: {list(pipeline.named_steps.keys())}")
-    
-    # Optional: Print model info for debugging
-    if hasattr(pipeline, 'named_steps'):
-        # Check for either 'classifier' or 'model' step
-        if 'classifier' in pipeline.named_steps:
-            print(f"Classifier type: {type(pipeline.named_steps['classifier'])}")
-        elif 'model' in pipeline.named_steps:
-            print(f"Model type: {type(pipeline.named_steps['model'])}")
-        if 'preprocessor' in pipeline.named_steps:
-            print(f"Preprocessor type: {type(pipeline.named_steps['preprocessor'])}")
-            
-except Exception as e:
-    print(f"Warning: Could not load ML pipeline: {str(e)}")
-    pipeline = None
+# Start loading the pipeline, pandas and DynamoDB in the background from create_app() (0 = load on first use)
+APP_WARMUP = bool(int(os.getenv("APP_WARMUP", 1)))
+
+# Filled in by current_model()/current_table() on first use; init_worker() opens timeseries_store
+active_model = None  # LoadedModel serving requests
+previous_model = None  # the version it replaced, kept for rollback
+table = None
+timeseries_store = None
 
 # Retrieve AWS credentials and region from environment variables
 aws_access_key_id = os.getenv("AWS_ACCESS_KEY_ID")
 aws_secret_access_key = os.getenv("AWS_SECRET_ACCESS_KEY")
 aws_region = os.getenv("AWS_DEFAULT_REGION", "us-east-1")
 
+# Load the machine learning pipeline directly
+def load_pipeline(path):
+    try:
+        import joblib
+        
+        # Load pipeline directly from joblib file
+        pipeline = joblib.load(path, mmap_mode='r' if PIPELINE_MMAP else None)
+        logger.info(f"Pipeline loaded successfully from {path}")
+        logger.info(f"Pipeline steps: {list(pipeline.named_steps.keys())}")
+        
+        # Optional: Print model info for debugging
+        if hasattr(pipeline, 'named_steps'):
+            # Check for either 'classifier' or 'model' step
+            if 'classifier' in pipeline.named_steps:
+                logger.info(f"Classifier type: {type(pipeline.named_steps['classifier'])}")
+            elif 'model' in pipeline.named_steps:
+                logger.info(f"Model type: {type(pipeline.named_steps['model'])}")
+            if 'preprocessor' in pipeline.named_steps:
+                logger.info(f"Preprocessor type: {type(pipeline.named_steps['preprocessor'])}")
+        return pipeline
+                
+    except Exception as e:
+        logger.warning(f"Could not load ML pipeline from {path}: {str(e)}")
+        raise
+
 # Initialize a boto3 DynamoDB resource using credentials from .env
-try:
-    dynamodb = boto3.resource(
-        'dynamodb',
-        region_name=aws_region,
-        aws_access_key_id=aws_access_key_id,
-        aws_secret_access_key=aws_secret_access_key
-    )
-    table = dynamodb.Table("IoT_Sensor_Data")
-    print(f"✅ Connected to DynamoDB table: {table.table_name}")
-except Exception as e:
-    print(f"Warning: Could not connect to DynamoDB: {str(e)}")
-    table = None
+def connect_table():
+    try:
+        import boto3
+        from botocore.config import Config
+        
+        dynamodb = boto3.resource(
+            'dynamodb',
+            region_name=aws_region,
+            aws_access_key_id=aws_access_key_id,
+            aws_secret_access_key=aws_secret_access_key,
+            # One pooled connection per concurrent device query
+            config=Config(max_pool_connections=FLEET_QUERY_WORKERS)
+        )
+        table = dynamodb.Table("IoT_Sensor_Data")
+        logger.info(f"✅ Connected to DynamoDB table: {table.table_name}")
+        return table
+    except Exception as e:
+        logger.warning(f"Could not connect to DynamoDB: {str(e)}")
+        return None
+
+# boto3 key condition builder, imported on first use
+def Key(name):
+    from boto3.dynamodb.conditions import Key
+    return Key(name)
+
+# Open the local time-series store
+def open_timeseries_store():
+    try:
+        return TimeSeriesStore(TIMESERIES_DB_PATH) if TIMESERIES_DB_PATH else None
+    except Exception as e:
+        logger.warning(f"Could not open time-series store: {str(e)}")
+        return None
 
 # Helper function to format timestamp for DynamoDB query
 def format_timestamp_for_query(dt):
     """Format datetime to match DynamoDB timestamp format: 2025-05-29T10:01:46.235867"""
     return dt.strftime("%Y-%m-%dT%H:%M:%S.%f")
 
-# Function to convert Machine_Type to Machine_Type_Code
-def get_machine_type_code(machine_type):
-    """Convert Machine_Type to the code expected by the model"""
-    mapping = {
-        'Type_A': 0,
-        'Type_B': 1,
-        'Type_C': 2
+# Cached query for the newest readings of one device
+def query_device_readings(device_id, limit, window=None, since=None, before=None):
+    """
+    Return up to `limit` newest readings for device_id as ReadingColumns (newest
+    first), optionally restricted to the last `window` (timedelta), to
+    timestamps strictly after `since` or to timestamps strictly before `before`.
+    Identical queries share one cached result for SENSOR_CACHE_TTL seconds, and
+    concurrent misses share one fetch.
+    """
+    def fetch():
+        condition = Key('deviceId').eq(device_id)
+        if since is not None:
+            condition = condition & Key('timestamp').gt(since)
+        elif before is not None:
+            condition = condition & Key('timestamp').lt(before)
+        elif window is not None:
+            now = datetime.now()  # Use local time
+            condition = condition & Key('timestamp').between(
+                format_timestamp_for_query(now - window), format_timestamp_for_query(now))
+        # Follow LastEvaluatedKey until `limit` items are collected or the partition is exhausted
+        pages = []
+        fetched = 0
+        query_args = {"KeyConditionExpression": condition, "ScanIndexForward": False}
+        while fetched < limit:
+            DYNAMODB_REQUESTS.inc(operation="query")
+            with span("dynamodb_query"):
+                response = query_wire(table, Limit=limit - fetched, **query_args)
+            pages.append(ReadingColumns.from_wire(response.get('Items', [])))
+            fetched += len(pages[-1])
+            if 'LastEvaluatedKey' not in response:
+                break
+            query_args["ExclusiveStartKey"] = response['LastEvaluatedKey']
+        return ReadingColumns.concat(pages)
+
+    key = (device_id, window.total_seconds() if window is not None else None, limit, since, before)
+    return sensor_cache.get(key, fetch)
+
+# Run fetch(device_id) for every device concurrently on the bounded query pool
+def fan_out(device_ids, fetch):
+    """
+    Return ({device_id: fetch(device_id)} for the devices whose fetch succeeded,
+    {device_id: error message} for those whose fetch raised), so one throttled
+    or unreachable partition doesn't fail the rest. A single device is fetched inline.
+    """
+    results, errors = {}, {}
+    if len(device_ids) == 1:
+        calls = {device_ids[0]: lambda: fetch(device_ids[0])}
+    else:
+        calls = {device_id: fleet_executor.submit(fetch, device_id).result for device_id in device_ids}
+    for device_id, call in calls.items():
+        try:
+            results[device_id] = call()
+        except Exception as e:
+            logger.warning("Query for device %s failed: %s", device_id, e)
+            errors[device_id] = str(e)
+    return results, errors
+
+# Name the devices a partial multi-device response is missing
+def with_device_errors(response, errors):
+    if errors:
+        response.headers[DEVICE_ERRORS_HEADER] = json.dumps(errors)
+    return response
+
+def device_errors_message(errors):
+    return "; ".join(f"{device_id}: {message}" for device_id, message in errors.items())
+
+# Devices named by ?devices=a,b (or "all" for every registered asset)
+def requested_device_ids():
+    """Parse the devices query parameter, defaulting to DEFAULT_DEVICE_ID"""
+    devices = request.args.get('devices', '').strip()
+    if not devices:
+        return [DEFAULT_DEVICE_ID]
+    if devices == 'all':
+        return [asset["device_id"] for asset in ASSETS]
+    return list(dict.fromkeys(device.strip() for device in devices.split(',') if device.strip()))
+
+# Response format named by ?format= (json, columnar, msgpack, arrow) or the Accept header
+def requested_format():
+    """Raises ValueError for an unknown or unavailable format"""
+    return negotiate_format(request.args.get('format'), request.accept_mimetypes)
+
+# Serialize equal-length columns in fmt: one object per row for json, one array per field otherwise
+def columns_response(columns, fmt, metadata=None):
+    with span("serialization"):
+        if fmt == "json":
+            rows = columns_to_rows(columns)
+            return jsonify(rows if metadata is None else dict(metadata, points=rows))
+        body, mimetype = encode_columns(columns, fmt, metadata)
+        return Response(body, mimetype=mimetype)
+
+def rows_response(rows, fmt):
+    """Like columns_response for a list of row dicts (json keeps the rows as they are)"""
+    if fmt == "json":
+        with span("serialization"):
+            return jsonify(rows)
+    return columns_response(rows_to_columns(rows), fmt)
+
+# /sensors columns for ReadingColumns, in the order given
+def sensor_columns(readings):
+    columns = {
+        "id": np.arange(1, len(readings) + 1),
+        "device_id": readings.device_ids,
+        "timestamp": readings.timestamps,
     }
-    return mapping.get(machine_type, 0)  # Default to 0 if not found
+    for attribute, field in SENSOR_FIELDS.items():
+        columns[field] = readings.column(attribute, SENSOR_MISSING_VALUES[attribute])
+    return columns
 
 # Endpoint to retrieve recent sensor data from DynamoDB
 @app.route('/sensors', methods=['GET'])
 def get_sensors():
+    # Any range parameter switches to the downsampled series from the local store
+    if any(request.args.get(name) for name in ('from', 'to', 'points')):
+        return get_sensor_series()
+    try:
+        fmt = requested_format()
+    except ValueError as e:
+        return jsonify({"error": f"Invalid format: {str(e)}"}), 400
+    
     try:
         # Attempt to get actual data first
-        if table:
-            # Use local time with extended window to account for timezone differences
-            now = datetime.now()  # Use local time instead of UTC
-            six_hours_ago = now - timedelta(hours=6)  # Look back 6 hours to account for timezone
-            
-            # Format timestamps to match DynamoDB format
-            now_str = format_timestamp_for_query(now)
-            six_hours_ago_str = format_timestamp_for_query(six_hours_ago)
-            
-            print(f"Querying from {six_hours_ago_str} to {now_str}")
-            print(f"Table name: {table.table_name}")
-            print(f"Looking for deviceId: ESP8266_IoT")
+        if current_table():
+            device_ids = requested_device_ids()
+            logger.debug("Looking for deviceIds: %s in %s", device_ids, table.table_name)
             
             try:
-                response = table.query(
-                    KeyConditionExpression=Key('deviceId').eq('ESP8266_IoT') &
-                                          Key('timestamp').between(six_hours_ago_str, now_str),
-                    ScanIndexForward=False,
-                    Limit=24
-                )
-                items = response.get('Items', [])
-                print(f"Query response metadata: {response.get('ResponseMetadata', {})}")
-                print(f"Found {len(items)} sensor readings in DynamoDB")
-                
-                if len(items) > 0:
-                    print(f"Sample item: {items[0]}")
+                # Look back 6 hours (local time) to account for timezone differences
+                readings, errors = fan_out(device_ids, lambda device_id: query_device_readings(
+                    device_id, limit=24, window=timedelta(hours=6)))
+                if errors and not readings:
+                    raise RuntimeError(device_errors_message(errors))
+                readings = ReadingColumns.concat(readings[device_id] for device_id in device_ids
+                                                 if device_id in readings)
+                if len(device_ids) > 1:
+                    readings = readings.newest_first()
+                logger.debug("Found %d sensor readings", len(readings))
                 
             except Exception as query_error:
-                print(f"Query error: {str(query_error)}")
-                print(f"Error type: {type(query_error)}")
+                logger.error(f"Query error: {str(query_error)}")
+                logger.error(f"Error type: {type(query_error)}")
                 # Try a simple scan as fallback
                 try:
-                    print("Trying scan as fallback...")
+                    logger.info("Trying scan as fallback...")
                     scan_response = table.scan(Limit=5)
                     scan_items = scan_response.get('Items', [])
-                    print(f"Scan found {len(scan_items)} items")
+                    logger.info(f"Scan found {len(scan_items)} items")
                     if scan_items:
-                        print(f"Sample scan item: {scan_items[0]}")
+                        logger.debug("Sample scan item: %s", scan_items[0])
                 except Exception as scan_error:
-                    print(f"Scan also failed: {str(scan_error)}")
+                    logger.error(f"Scan also failed: {str(scan_error)}")
                 
                 return jsonify({"error": f"Query failed: {str(query_error)}"}), 500
             
-            if items:  # If we found any real data, use it
-                formatted_items = []
-                for i, item in enumerate(items):
-                    formatted_items.append({
-                        "id": i + 1,
-                        "timestamp": item.get("timestamp"),
-                        "temperature": float(item.get("Temperature", 0)),
-                        "vibration": float(item.get("Vibration", 0)),
-                        "power_consumption": float(item.get("Power_Usage", 0)),
-                        "humidity": float(item.get("Humidity", 65)),
-                        "pressure": float(item.get("Pressure", 905))
-                    })
-                print(f"Returning {len(formatted_items)} real sensor readings")
-                return jsonify(formatted_items)
+            if len(readings):  # If we found any real data, use it
+                logger.debug("Returning %d real sensor readings", len(readings))
+                return with_device_errors(columns_response(sensor_columns(readings), fmt), errors)
         
         # If we reach here, either no table connection or no data found
         # Return simulated data for UI development
@@ -162,18 +451,204 @@ def get_sensors():
                 "pressure": base_pressure
             })
         
-        print("No real sensor data found. Returning simulated data.")
-        return jsonify(simulated_data)
+        logger.debug("No real sensor data found. Returning simulated data.")
+        return rows_response(simulated_data, fmt)
         
     except Exception as e:
-        print(f"Error in get_sensors: {str(e)}")
+        logger.error(f"Error in get_sensors: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+# Copy every reading of one device in [start, end] from DynamoDB into the local store
+def store_device_range(device_id, start, end):
+    """Page through the range oldest first; returns (items fetched, newest timestamp seen)"""
+    query_args = {
+        "KeyConditionExpression": Key('deviceId').eq(device_id) & Key('timestamp').between(start, end),
+        "ScanIndexForward": True
+    }
+    fetched = 0
+    newest = None
+    while True:
+        DYNAMODB_REQUESTS.inc(operation="query")
+        with span("dynamodb_query"):
+            response = query_wire(table, **query_args)
+        readings = ReadingColumns.from_wire(response.get('Items', []))
+        timeseries_store.write_columns(device_id, readings)
+        fetched += len(readings)
+        if len(readings):
+            newest = readings.timestamps[-1] or newest
+        if 'LastEvaluatedKey' not in response:
+            return fetched, newest
+        query_args["ExclusiveStartKey"] = response['LastEvaluatedKey']
+
+def history_sync_lock(device_id):
+    with history_sync_locks_lock:
+        return history_sync_locks.setdefault(device_id, threading.Lock())
+
+# Bring the local store up to date for one device, reading each DynamoDB item once
+def sync_history(device_id, start):
+    """
+    Fetch only what lies outside the device's synced coverage: readings before
+    it (when start is earlier) and readings after its newest synced timestamp.
+    Returns the number of items read from DynamoDB.
+    """
+    with history_sync_lock(device_id):
+        now = format_timestamp_for_query(datetime.now())
+        coverage = timeseries_store.coverage(device_id)
+        if coverage is None:
+            fetched, newest = store_device_range(device_id, start, now)
+            synced_from, synced_to = start, newest or start
+        else:
+            synced_from, synced_to = coverage
+            fetched = 0
+            if start < synced_from:
+                fetched, _ = store_device_range(device_id, start, synced_from)
+                synced_from = start
+            # Advance by data timestamps rather than the server clock, so device clock skew cannot open gaps
+            tail_fetched, newest = store_device_range(device_id, synced_to, now)
+            fetched += tail_fetched
+            synced_to = max(synced_to, newest or synced_to)
+        timeseries_store.set_coverage(device_id, synced_from, synced_to)
+        return fetched
+
+def _time_param(name, default):
+    """ISO timestamp query parameter in the DynamoDB format; raises ValueError if malformed"""
+    value = request.args.get(name)
+    if not value:
+        return default
+    return format_timestamp_for_query(datetime.fromisoformat(value.replace('Z', '')))
+
+def range_params(default_points):
+    """(from, to, points) query parameters, defaulting to the last 24 hours; raises ValueError"""
+    end = _time_param('to', format_timestamp_for_query(datetime.now()))
+    start = _time_param('from', format_timestamp_for_query(datetime.fromisoformat(end) - timedelta(hours=24)))
+    points = int(request.args.get('points', default_points))
+    if start >= end or not 0 < points <= HISTORY_MAX_POINTS:
+        raise ValueError(f"need from < to and 0 < points <= {HISTORY_MAX_POINTS}")
+    return start, end, points
+
+# Downsample one device's stored series into /sensors-shaped columns, oldest first
+def downsample_series(device_id, series, start, end, points, method):
+    """
+    method "lttb" keeps `points` real readings (or rollup means) chosen by
+    Largest-Triangle-Three-Buckets; "minmax" returns one row per time bucket
+    with the mean in each field plus <field>_min and <field>_max. Columns are
+    NumPy arrays (NaN where a bucket has no readings), with bucket times in "epoch".
+    """
+    if method == "minmax":
+        times, counts, mins, maxs, means = bucket_aggregate(
+            series["epoch"], series["count"], series["min"], series["max"], series["mean"],
+            timestamp_seconds(start), timestamp_seconds(end), points)
+    else:
+        selected = lttb(series["epoch"], series["mean"], points)
+        times, counts, means = series["epoch"][selected], series["count"][selected], series["mean"][selected]
+        mins = maxs = None
+    
+    columns = {"device_id": np.full(len(times), device_id, dtype=object), "epoch": times,
+               "count": counts.astype(np.int64)}
+    for attribute, field in SENSOR_FIELDS.items():
+        channel = CHANNELS.index(attribute)
+        columns[field] = means[:, channel]
+        if mins is not None:
+            columns[f"{field}_min"] = mins[:, channel]
+            columns[f"{field}_max"] = maxs[:, channel]
+    return columns
+
+# Downsampled /sensors response for ?from=&to=&points=[&method=lttb|minmax]
+def get_sensor_series():
+    if timeseries_store is None:
+        return jsonify({"error": "Local time-series store is disabled"}), 503
+    try:
+        start, end, points = range_params(SENSOR_SERIES_POINTS)
+        method = request.args.get('method', 'lttb')
+        if method not in ('lttb', 'minmax'):
+            raise ValueError("method must be lttb or minmax")
+        fmt = requested_format()
+    except ValueError as e:
+        return jsonify({"error": f"Invalid sensor range query: {str(e)}"}), 400
+    
+    try:
+        device_ids = requested_device_ids()
+        errors = {}
+        if current_table():
+            # Devices whose sync fails are served from what is already stored rather than failing the chart
+            _, errors = fan_out(device_ids, lambda device_id: sync_history(device_id, start))
+        
+        parts = []
+        for device_id in device_ids:
+            series = timeseries_store.series(device_id, start, end, max_rows=SENSOR_SERIES_MAX_ROWS)
+            parts.append(downsample_series(device_id, series, start, end, points, method))
+        if not parts:
+            return with_device_errors(columns_response({}, fmt), errors)
+        merged = {name: np.concatenate([part[name] for part in parts]) for name in parts[0]}
+        
+        # Newest first, like the raw /sensors response
+        epochs = merged.pop("epoch")
+        order = np.argsort(-epochs, kind="stable")
+        columns = {"id": np.arange(1, len(order) + 1), "device_id": merged.pop("device_id")[order],
+                   "timestamp": [format_seconds(epoch) for epoch in epochs[order].tolist()]}
+        columns.update((name, values[order]) for name, values in merged.items())
+        logger.debug("Returning %d downsampled (%s) sensor readings for %s", len(order), method, device_ids)
+        return with_device_errors(columns_response(columns, fmt), errors)
+    
+    except Exception as e:
+        logger.error(f"Error in get_sensor_series: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+# Endpoint for long-range sensor history, downsampled from the local time-series store
+@app.route('/sensors/history', methods=['GET'])
+def get_sensor_history():
+    if timeseries_store is None:
+        return jsonify({"error": "Local time-series store is disabled"}), 503
+    try:
+        device_id = request.args.get('device', DEFAULT_DEVICE_ID)
+        start, end, points = range_params(500)
+        fmt = requested_format()
+    except ValueError as e:
+        return jsonify({"error": f"Invalid history query: {str(e)}"}), 400
+
+    try:
+        fetched = 0
+        if current_table():
+            try:
+                fetched = sync_history(device_id, start)
+            except Exception as sync_error:
+                # Serve what is already stored rather than failing the chart
+                logger.warning(f"History sync failed for {device_id}: {str(sync_error)}")
+
+        buckets = timeseries_store.downsample(device_id, start, end, points)
+        logger.debug("History for %s: %d buckets, %d readings fetched from DynamoDB", device_id, len(buckets), fetched)
+        metadata = {
+            "device_id": device_id,
+            "from": start,
+            "to": end,
+            "bucket_seconds": (timestamp_seconds(end) - timestamp_seconds(start)) / points
+        }
+        if fmt != "json":
+            # Columnar formats flatten each field's min/max/mean into <field>_min/_max/_mean
+            columns = {"timestamp": [bucket["timestamp"] for bucket in buckets],
+                       "count": np.array([bucket["count"] for bucket in buckets], dtype=np.int64)}
+            for attribute, field in SENSOR_FIELDS.items():
+                for stat in ("min", "max", "mean"):
+                    columns[f"{field}_{stat}"] = np.array([bucket[attribute][stat] for bucket in buckets], dtype=float)
+            return columns_response(columns, fmt, metadata)
+
+        history = []
+        for bucket in buckets:
+            row = {"timestamp": bucket["timestamp"], "count": bucket["count"]}
+            for attribute, field in SENSOR_FIELDS.items():
+                row[field] = bucket[attribute]
+            history.append(row)
+        return jsonify(dict(metadata, points=history))
+
+    except Exception as e:
+        logger.error(f"Error in get_sensor_history: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
 # Debug endpoint to scan the table and see what data exists
 @app.route('/debug/scan-table', methods=['GET'])
 def debug_scan_table():
     try:
-        if not table:
+        if not current_table():
             return jsonify({"status": "error", "message": "DynamoDB connection not available"}), 500
         
         # Scan table to see what data exists (limit to 10 items)
@@ -204,12 +679,13 @@ def debug_scan_table():
 @app.route('/debug/simple-query', methods=['GET'])
 def debug_simple_query():
     try:
-        if not table:
+        if not current_table():
             return jsonify({"status": "error", "message": "DynamoDB connection not available"}), 500
         
         # Try a simple query without timestamp filter first
+        device_id = request.args.get('device', DEFAULT_DEVICE_ID)
         response = table.query(
-            KeyConditionExpression=Key('deviceId').eq('ESP8266_IoT'),
+            KeyConditionExpression=Key('deviceId').eq(device_id),
             ScanIndexForward=False,
             Limit=5
         )
@@ -220,7 +696,7 @@ def debug_simple_query():
             "status": "success",
             "found_items": len(items),
             "items": items,
-            "query_used": "deviceId = 'ESP8266_IoT' (no timestamp filter)"
+            "query_used": f"deviceId = '{device_id}' (no timestamp filter)"
         })
         
     except Exception as e:
@@ -234,7 +710,7 @@ def debug_simple_query():
 @app.route('/debug/aws-connection', methods=['GET'])
 def debug_aws_connection():
     try:
-        if not table:
+        if not current_table():
             return jsonify({"status": "error", "message": "DynamoDB connection not available"}), 500
             
         # Try to fetch a small sample of data with new timestamp format
@@ -245,7 +721,7 @@ def debug_aws_connection():
         six_hours_ago_str = format_timestamp_for_query(six_hours_ago)
         
         response = table.query(
-            KeyConditionExpression=Key('deviceId').eq('ESP8266_IoT') &
+            KeyConditionExpression=Key('deviceId').eq(request.args.get('device', DEFAULT_DEVICE_ID)) &
                                   Key('timestamp').between(six_hours_ago_str, now_str),
             ScanIndexForward=False,
             Limit=2
@@ -277,24 +753,203 @@ def debug_aws_connection():
             "aws_region": aws_region
         }), 500
 
+# Debug endpoint for sensor query cache counters
+@app.route('/debug/cache-stats', methods=['GET'])
+def debug_cache_stats():
+    return jsonify(sensor_cache.stats())
+
 # Get assets endpoint
 @app.route('/assets', methods=['GET'])
 def get_assets():
     # In a real app, this would come from a database
-    assets = [
-        { "id": 1, "name": "Pump A1", "type": "Hydraulic Pump", "status": "Online", "x_pct": 20, "y_pct": 30 },
-        { "id": 2, "name": "Motor B2", "type": "Electric Motor", "status": "Warning", "x_pct": 45, "y_pct": 55 },
-        { "id": 3, "name": "Valve C3", "type": "Control Valve", "status": "Offline", "x_pct": 70, "y_pct": 25 },
-        { "id": 4, "name": "Fan D4", "type": "Cooling Fan", "status": "Online", "x_pct": 80, "y_pct": 75 }
-    ]
-    return jsonify(assets)
+    return jsonify(ASSETS)
+
+# Score new polled or ingested readings in a single batched pipeline call
+def score_readings(readings, device_ids):
+    """Return one prediction dict (without id/note) per reading of a ReadingColumns, in order; device_ids parallels it"""
+    frame = readings.to_frame()
+    if ANOMALY_GATE:
+        risks, from_model = score_gated(frame, device_ids, readings.timestamps)
+    else:
+        risks, from_model = score_with_active_model(frame, cached=True, streamed=True)
+    logger.debug("✅ Model scored %d/%d readings, heuristic used for the rest", from_model.sum(), len(readings))
+
+    temperatures = frame["Temperature"].tolist()
+    vibrations = frame["Vibration"].tolist()
+    power_usages = frame["Power_Usage"].tolist()
+    humidities = frame["Humidity"].tolist()
+    pressures = frame["Pressure"].tolist()
+
+    predictions = []
+    for idx, (timestamp, machine_type) in enumerate(zip(readings.timestamps, readings.machine_types)):
+        predictions.append({
+            "machine_id": device_ids[idx],
+            "timestamp": timestamp if timestamp is not None else format_timestamp_for_query(datetime.now()),
+            "risk": round(float(risks[idx]), 3),
+            "temperature": temperatures[idx],
+            "vibration": vibrations[idx],
+            "power": power_usages[idx],
+            "humidity": humidities[idx],
+            "pressure": pressures[idx],
+            "machine_type": machine_type if machine_type is not None else "Type_A"
+        })
+    return predictions
+
+# Score device readings, sending only those outside their device's control limits to the model
+def score_gated(frame, device_ids, timestamps):
+    """score_with_active_model(frame, cached=True), with nominal readings answered by anomaly_gate"""
+    model = current_model()
+    if model is None or model.windowed:
+        return score_with_active_model(frame, cached=True, streamed=True)
+    values = frame[SENSOR_CHANNELS].to_numpy(dtype=np.float64)
+    nominal, in_control, cached_risk = anomaly_gate.observe(model, device_ids, values, timestamps)
+    if not nominal.any():
+        risk, from_model = score_with_active_model(frame, cached=True)
+    else:
+        risk = np.where(nominal, cached_risk, 0.0)
+        from_model = np.zeros(len(frame), dtype=bool)
+        SCORED_ROWS.inc(int(nominal.sum()), source="anomaly_gate")
+        rest = ~nominal
+        risk[rest], from_model[rest] = score_with_active_model(frame[rest], cached=True)
+    
+    # In-control readings the model (or the prediction cache) scored become their device's anchor
+    scored = np.flatnonzero(in_control & ~nominal & from_model)
+    if len(scored):
+        anomaly_gate.record_risk(model, [device_ids[i] for i in scored], risk[scored])
+    return risk, from_model
+
+# Fetch and score only readings newer than the last polled one, for every device
+def update_predictions(device_ids):
+    """
+    Merge newly scored readings into prediction_store and broadcast them.
+    Returns (the new predictions, {device_id: error message} for devices whose
+    query failed); those are skipped and keep their watermark for the next poll.
+    """
+    def fetch_new(device_id):
+        last_timestamp = prediction_store.last_timestamp(device_id)
+        if last_timestamp is None:
+            return query_device_readings(device_id, limit=PREDICTION_BUFFER_SIZE)
+        return query_device_readings(device_id, limit=PREDICTION_BUFFER_SIZE, since=last_timestamp)
+    
+    new_readings, errors = fan_out(device_ids, fetch_new)
+    model = current_model()
+    if model is not None and model.windowed:
+        errors.update(fill_windows(model, {device_id: new_readings[device_id] for device_id in device_ids
+                                           if len(new_readings.get(device_id, ()))}))
+    device_ids = [device_id for device_id in device_ids if device_id not in errors]
+    readings = ReadingColumns.concat(new_readings[device_id] for device_id in device_ids)
+    if not len(readings):
+        return [], errors
+    
+    # One batched pipeline call across every device, then split back per device
+    logger.debug("Processing %d new sensor readings for predictions", len(readings))
+    item_devices = [device_id for device_id in device_ids for _ in range(len(new_readings[device_id]))]
+    scored = score_readings(readings, item_devices)
+    added = []
+    start = 0
+    for device_id in device_ids:
+        count = len(new_readings[device_id])
+        if count:
+            added.extend(prediction_store.merge(device_id, scored[start:start + count]))
+        start += count
+    
+    if added:
+        prediction_broadcaster.publish("predictions", added)
+    return added, errors
+
+# Seed a windowed model's streaming windows for devices it has not seen, from the readings before their new ones
+def fill_windows(model, new_readings):
+    """
+    new_readings maps device_id to its new ReadingColumns (newest first). After
+    a restart or a model swap a device's windows start empty; pushing the
+    window_context readings that precede its oldest new one first means its new
+    readings are scored against full windows, as they were in training. Returns
+    {device_id: error message} for devices whose earlier readings can't be read.
+    """
+    stage = next(step for step in preprocessing_steps(model.streaming_pipeline)
+                 if type(step).__name__ == "RollingFeatures")
+    cold = [device_id for device_id in new_readings if device_id not in stage.last_time_]
+    if not cold or model.window_context <= 0:
+        return {}
+    context, errors = fan_out(cold, lambda device_id: query_device_readings(
+        device_id, limit=model.window_context, before=new_readings[device_id].timestamps[-1]))
+    frame = ReadingColumns.concat(context.values()).to_frame()
+    with model.window_lock:
+        transform_features(model.streaming_pipeline, frame[valid_feature_rows(frame)])
+    return errors
+
+# Devices /ingest may store readings for: ASSETS devices, ones already stored, and new ones while there is room
+def admitted_ingest_devices(device_ids):
+    known = {asset["device_id"] for asset in ASSETS}
+    stored = set(prediction_store.device_ids())
+    room = INGEST_MAX_DEVICES - len(stored - known)
+    admitted = set()
+    for device_id in dict.fromkeys(device_ids):
+        if device_id in known or device_id in stored:
+            admitted.add(device_id)
+        elif room > 0:
+            admitted.add(device_id)
+            room -= 1
+    return admitted
+
+# Score queued /ingest readings in one pipeline call, then store and publish them like polled ones
+def score_ingested(chunks):
+    """
+    Returns how many readings were stored nowhere: ones over the device cap,
+    and without INGEST_WRITE_BACK, ones whose timestamp their device's buffer
+    already holds or that are older than everything in its full buffer.
+    """
+    readings = ReadingColumns.concat(chunks)
+    scored = score_readings(readings, readings.device_ids)
+    by_device = {}
+    for prediction in scored:
+        by_device.setdefault(prediction["machine_id"], []).append(prediction)
+    admitted = admitted_ingest_devices(by_device)
+    added, kept = [], []
+    for device_id, predictions in by_device.items():
+        if device_id in admitted:
+            added.extend(prediction_store.merge(device_id, predictions, polled=False))
+            kept.extend(predictions)
+    if added:
+        prediction_broadcaster.publish("predictions", added)
+    if INGEST_WRITE_BACK:
+        write_back_predictions(kept)
+        return len(scored) - len(kept)
+    return len(scored) - len(added)
+
+ingest_batcher = MicroBatcher(score_ingested, batch_size=INGEST_BATCH_ROWS, max_wait=INGEST_MAX_WAIT_MS / 1000,
+                              max_rows=INGEST_QUEUE_ROWS, name="ingest")
+
+# Write scored readings, with their risk, to DynamoDB (batch_writer sends 25 items per request)
+def write_back_predictions(predictions):
+    table = current_table()
+    if not table:
+        return
+    with table.batch_writer(overwrite_by_pkeys=["deviceId", "timestamp"]) as batch:
+        for prediction in predictions:
+            batch.put_item(Item={
+                "deviceId": prediction["machine_id"],
+                "timestamp": prediction["timestamp"],
+                "Temperature": Decimal(str(prediction["temperature"])),
+                "Vibration": Decimal(str(prediction["vibration"])),
+                "Power_Usage": Decimal(str(prediction["power"])),
+                "Humidity": Decimal(str(prediction["humidity"])),
+                "Pressure": Decimal(str(prediction["pressure"])),
+                "Machine_Type": prediction["machine_type"],
+                "Risk": Decimal(str(prediction["risk"])),
+            })
+    DYNAMODB_REQUESTS.inc((len(predictions) + 24) // 25, operation="batch_write_item")
 
 # Updated prediction endpoint with proper timestamp handling and correct Machine_Type_Code
 @app.route('/predict', methods=['GET'])
 def get_prediction():
-    global prediction_history
     try:
-        if not table or not pipeline:
+        fmt = requested_format()
+    except ValueError as e:
+        return jsonify({"error": f"Invalid format: {str(e)}"}), 400
+    
+    try:
+        if not current_table() or not current_model():
             # If no DynamoDB or ML pipeline, return simulated predictions
             current_time = datetime.now()  # Use local time
             simulated_predictions = []
@@ -315,88 +970,23 @@ def get_prediction():
                     "note": "Simulated - No DB/Model"
                 })
             
-            return jsonify(simulated_predictions)
+            return rows_response(simulated_predictions, fmt)
         
-        # Get up to 10 latest data points for multiple predictions - no timestamp filter
-        response = table.query(
-            KeyConditionExpression=Key('deviceId').eq('ESP8266_IoT'),
-            ScanIndexForward=False,
-            Limit=10  # Get the 10 most recent entries
-        )
-        items = response.get('Items', [])
+        device_ids = requested_device_ids()
+        _, errors = update_predictions(device_ids)
+        if len(errors) == len(device_ids):
+            return jsonify({"error": device_errors_message(errors), "errors": errors}), 500
         
-        if not items:
-            return jsonify({"error": "No sensor data available"}), 404
-
-        print(f"Processing {len(items)} sensor readings for predictions")
+        stored = [prediction for device_id in device_ids for prediction in prediction_store.latest(device_id)]
+        if len(device_ids) > 1:
+            stored.sort(key=lambda prediction: prediction["timestamp"], reverse=True)
+        if not stored:
+            return with_device_errors(jsonify({"error": "No sensor data available"}), errors), 404
         
-        # Generate predictions for each available sensor reading
-        predictions = []
-        
-        for idx, item in enumerate(items):
-            # Extract sensor data from DynamoDB
-            temperature = float(item.get("Temperature", 70))
-            vibration = float(item.get("Vibration", 1.0))
-            power_usage = float(item.get("Power_Usage", 0.2))
-            humidity = float(item.get("Humidity", 40))
-            pressure = float(item.get("Pressure", 30))
-            machine_type = item.get("Machine_Type", "Type_A")
-            timestamp = item.get("timestamp", format_timestamp_for_query(datetime.now()))
-            
-            # Create DataFrame for model input with Machine_Type_Code
-            data = pd.DataFrame([{
-                "Temperature": temperature,
-                "Vibration": vibration,
-                "Power_Usage": power_usage,
-                "Humidity": humidity,
-                "Pressure": pressure,
-                "Machine_Type_Code": get_machine_type_code(machine_type)  # Convert to code
-            }])
-            
-            # Process with ML model - handle both 'classifier' and 'model' steps
-            try:
-                preprocessor = pipeline.named_steps['preprocessor']
-                transformed_data = preprocessor.transform(data)
-                
-                # Check for either 'classifier' or 'model' step
-                if 'classifier' in pipeline.named_steps:
-                    model = pipeline.named_steps['classifier']
-                elif 'model' in pipeline.named_steps:
-                    model = pipeline.named_steps['model']
-                else:
-                    raise ValueError("No classifier or model step found in pipeline")
-                
-                prediction = model.predict(transformed_data)
-                risk_score = float(prediction[0])
-                print(f"✅ Model prediction successful for item {idx}: {risk_score}")
-                
-            except Exception as e:
-                print(f"Model prediction error for item {idx}: {str(e)}")
-                # Generate a realistic risk score based on sensor values
-                risk_score = 0.1
-                if temperature > 75: risk_score += 0.3
-                if vibration > 2.0: risk_score += 0.2
-                if power_usage > 0.25: risk_score += 0.2
-                if humidity > 70 or humidity < 30: risk_score += 0.1
-                if pressure > 35 or pressure < 25: risk_score += 0.1
-                risk_score = min(1.0, risk_score)
-            
-            # Create prediction object
-            prediction_obj = {
-                "id": idx + 1,
-                "machine_id": "ESP8266_IoT",
-                "timestamp": timestamp,
-                "risk": round(risk_score, 3),
-                "temperature": temperature,
-                "vibration": vibration,
-                "power": power_usage,
-                "humidity": humidity,
-                "pressure": pressure,
-                "machine_type": machine_type,
-                "note": f"Real prediction from sensor data #{idx + 1}"
-            }
-            
-            predictions.append(prediction_obj)
+        predictions = [
+            dict(prediction, id=idx + 1, note=f"Real prediction from sensor data #{idx + 1}")
+            for idx, prediction in enumerate(stored)
+        ]
         
         # If we have fewer than 10 predictions, pad with interpolated ones
         while len(predictions) < 10:
@@ -421,7 +1011,7 @@ def get_prediction():
                 
                 interpolated_pred = {
                     "id": len(predictions) + 1,
-                    "machine_id": "ESP8266_IoT",
+                    "machine_id": last_pred["machine_id"],
                     "timestamp": new_timestamp,
                     "risk": round(new_risk, 3),
                     "temperature": last_pred.get("temperature", 70),
@@ -439,22 +1029,246 @@ def get_prediction():
         # Sort by timestamp (newest first)
         predictions.sort(key=lambda x: x["timestamp"], reverse=True)
         
-        # Update global prediction history
-        prediction_history = predictions[:10]  # Keep only latest 10
-        
-        print(f"Returning {len(predictions)} predictions")
-        return jsonify(predictions)
+        logger.debug("Returning %d predictions", len(predictions))
+        return with_device_errors(rows_response(predictions, fmt), errors)
     
     except Exception as e:
-        print(f"Error in get_prediction: {str(e)}")
+        logger.error(f"Error in get_prediction: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
+def _optional_column(readings, name):
+    """Column values as a list with missing entries as None, or None if the column is absent"""
+    if name not in readings.columns:
+        return None
+    return [None if pd.isna(value) else value for value in readings[name].tolist()]
+
+# ReadingColumns for the given rows of posted readings (deviceId defaults to DEFAULT_DEVICE_ID, timestamp to now)
+def posted_reading_columns(raw, frame, rows):
+    now = format_timestamp_for_query(datetime.now())
+    def pick(name, default):
+        values = _optional_column(raw, name)
+        if values is None:
+            return [default] * len(rows)
+        return [default if values[i] is None else str(values[i]) for i in rows]
+    return ReadingColumns(pick("deviceId", DEFAULT_DEVICE_ID), pick("timestamp", now), pick("Machine_Type", None),
+                          {name: frame[name].to_numpy()[rows] for name in SENSOR_DEFAULTS},
+                          dict.fromkeys(SENSOR_DEFAULTS))
+
+# Asynchronous ingest (JSON array, NDJSON or CSV): queue valid readings for the micro-batching worker, answer 202
+@app.route('/ingest', methods=['POST'])
+def post_ingest():
+    try:
+        raw, _ = parse_readings(request_body(), request.content_type)
+        if len(raw) == 0:
+            return jsonify({"accepted": 0, "invalid": [], "rejected": [],
+                            "queued_rows": ingest_batcher.queued_rows()}), 202
+        if len(raw) > INGEST_QUEUE_ROWS:
+            return jsonify({"error": f"Too many readings: {len(raw)} > {INGEST_QUEUE_ROWS}"}), 413
+        frame, invalid = validate_readings(raw)
+    except ValueError as e:
+        return jsonify({"error": f"Invalid payload: {str(e)}"}), 400
+
+    valid = np.flatnonzero(~invalid)
+    readings = posted_reading_columns(raw, frame, valid)
+    admitted = admitted_ingest_devices(readings.device_ids)
+    kept = [i for i, device_id in enumerate(readings.device_ids) if device_id in admitted]
+    rejected = [int(valid[i]) for i, device_id in enumerate(readings.device_ids) if device_id not in admitted]
+    if rejected:
+        ingest_batcher.reject(len(rejected))
+        readings = readings.take(kept)
+    if len(readings) and not ingest_batcher.put(readings):
+        response = jsonify({"error": "Ingest queue is full, retry later"})
+        response.headers["Retry-After"] = "1"
+        return response, 503
+    return jsonify({"accepted": len(readings), "invalid": np.flatnonzero(invalid).tolist(), "rejected": rejected,
+                    "queued_rows": ingest_batcher.queued_rows()}), 202
+
+# Newest scored reading per device (?devices=, default every device scored so far), without querying DynamoDB
+@app.route('/predict/latest', methods=['GET'])
+def get_latest_predictions():
+    device_ids = requested_device_ids() if request.args.get('devices') else prediction_store.device_ids()
+    return jsonify({device_id: next(iter(prediction_store.latest(device_id)), None) for device_id in device_ids})
+
+# Batch scoring endpoint for arbitrary sensor payloads (JSON array, NDJSON or CSV)
+@app.route('/predict/batch', methods=['POST'])
+def post_prediction_batch():
+    try:
+        readings, fmt = parse_readings(request_body(), request.content_type)
+        if len(readings) == 0:
+            return jsonify([])
+        if len(readings) > PREDICT_BATCH_MAX_ROWS:
+            return jsonify({"error": f"Too many readings: {len(readings)} > {PREDICT_BATCH_MAX_ROWS}"}), 413
+        frame, invalid = validate_readings(readings)
+    except ValueError as e:
+        return jsonify({"error": f"Invalid payload: {str(e)}"}), 400
+
+    try:
+        # One vectorized pipeline call for every valid reading
+        valid = ~invalid
+        risks = np.zeros(len(frame))
+        from_model = np.zeros(len(frame), dtype=bool)
+        if valid.any():
+            risks[valid], from_model[valid] = score_with_active_model(frame[valid])
+    except Exception as e:
+        logger.error(f"Error in post_prediction_batch: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+    logger.debug("Scored %d posted readings (%d invalid)", valid.sum(), invalid.sum())
+
+    # Echo identifying fields so clients can match results to readings
+    device_ids = _optional_column(readings, "deviceId")
+    timestamps = _optional_column(readings, "timestamp")
+    risks = np.round(risks, 3).tolist()
+    from_model = from_model.tolist()
+    invalid = invalid.tolist()
+
+    def make_row(i):
+        row = {"index": i}
+        if device_ids is not None:
+            row["deviceId"] = device_ids[i]
+        if timestamps is not None:
+            row["timestamp"] = timestamps[i]
+        if invalid[i]:
+            row["error"] = "Invalid or non-numeric sensor values"
+        else:
+            row["risk"] = risks[i]
+            row["source"] = "model" if from_model[i] else "heuristic"
+        return row
+
+    ndjson = fmt == "ndjson" or request.accept_mimetypes.best in NDJSON_MIMETYPES
+    mimetype = "application/x-ndjson" if ndjson else "application/json"
+    body = timed_iter(stream_results(make_row, len(frame), ndjson), "serialization")
+    return Response(stream_with_context(body), mimetype=mimetype)
+
+# Devices the background stream poller keeps up to date
+def stream_device_ids():
+    if PREDICTION_STREAM_DEVICES.strip() == 'all':
+        return [asset["device_id"] for asset in ASSETS]
+    return [device.strip() for device in PREDICTION_STREAM_DEVICES.split(',') if device.strip()]
+
+# Background loop that scores new readings once for all stream subscribers
+def poll_predictions():
+    while True:
+        if prediction_broadcaster.subscriber_count():
+            try:
+                update_predictions(stream_device_ids())
+            except Exception as e:
+                logger.error(f"Error in prediction stream poller: {str(e)}")
+        time.sleep(PREDICTION_STREAM_INTERVAL)
+
+def ensure_stream_poller():
+    """Start the background poller on first subscription"""
+    global stream_poller
+    with stream_poller_lock:
+        if stream_poller is None:
+            stream_poller = threading.Thread(target=poll_predictions, name="prediction-stream", daemon=True)
+            stream_poller.start()
+
+def format_sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+# Server-sent events: a snapshot of stored predictions, then each new batch as it is scored
+@app.route('/stream/predictions', methods=['GET'])
+def stream_predictions():
+    if not current_table() or not current_model():
+        return jsonify({"error": "Prediction stream requires DynamoDB and the ML pipeline"}), 503
+    
+    ensure_stream_poller()
+    device_ids = requested_device_ids() if request.args.get('devices') else stream_device_ids()
+    wanted = set(device_ids)
+    
+    def generate():
+        # Subscribe once the body is being sent: a stream closed before its first frame never runs the finally below
+        subscription = prediction_broadcaster.subscribe()
+        try:
+            snapshot = [prediction for device_id in device_ids for prediction in prediction_store.latest(device_id)]
+            yield format_sse("snapshot", snapshot)
+            while True:
+                try:
+                    event, data = subscription.get(timeout=15)
+                except queue.Empty:
+                    yield ": keep-alive\n\n"
+                    continue
+                data = [prediction for prediction in data if prediction["machine_id"] in wanted]
+                if data:
+                    yield format_sse(event, data)
+        finally:
+            prediction_broadcaster.unsubscribe(subscription)
+    
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    return Response(stream_with_context(generate()), mimetype="text/event-stream", headers=headers)
+
+# Debug endpoint for prediction stream counters
+@app.route('/debug/stream-stats', methods=['GET'])
+def debug_stream_stats():
+    return jsonify(prediction_broadcaster.stats())
+
+# Prometheus scrape endpoint: route latency, spans, fallback counts, cache and model state
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    return Response(render(), mimetype="text/plain; version=0.0.4")
+
+def collect_app_metrics():
+    sensor = sensor_cache.stats()
+    predictions = prediction_cache.stats()
+    gate = anomaly_gate.stats()
+    ingest = ingest_batcher.stats()
+    return [
+        ("sensor_cache_requests_total", "counter", "DynamoDB query cache lookups, by result",
+         [({"result": "hit"}, sensor["hits"]), ({"result": "miss"}, sensor["misses"]),
+          ({"result": "coalesced"}, sensor["coalesced"])]),
+        ("prediction_cache_requests_total", "counter", "Prediction cache lookups, by result",
+         [({"result": "hit"}, predictions["hits"]), ({"result": "miss"}, predictions["misses"])]),
+        ("prediction_cache_entries", "gauge", "Feature vectors in the prediction cache",
+         [({}, predictions["entries"])]),
+        ("anomaly_gate_readings_total", "counter", "Device readings checked by the anomaly gate, by outcome",
+         [({"outcome": "gated"}, gate["gated"]), ({"outcome": "passed"}, gate["passed"])]),
+        ("ingest_readings_total", "counter", "Valid readings posted to /ingest, by whether they were stored",
+         [({"outcome": "accepted"}, ingest["accepted"]), ({"outcome": "rejected"}, ingest["rejected"])]),
+        ("ingest_batches_total", "counter", "Ingest micro-batches scored, by what flushed them",
+         [({"flush": reason}, count) for reason, count in ingest["flushes"].items()]),
+        ("ingest_queued_readings", "gauge", "Readings waiting in the ingest queue", [({}, ingest["queued_rows"])]),
+        ("model_info", "gauge", "The model version being served (always 1)",
+         [({"version": str(active_model.version) if active_model is not None else "none"}, 1)]),
+        ("stream_subscribers", "gauge", "Open /stream/predictions connections",
+         [({}, prediction_broadcaster.subscriber_count())]),
+    ]
+
+register_collector(collect_app_metrics)
+
+# Prediction cache: hit rate, size and invalidations
+@app.route('/debug/prediction-cache-stats', methods=['GET'])
+def debug_prediction_cache_stats():
+    return jsonify(prediction_cache.stats())
+
+# Ingest queue: depth, batch sizes, flush reasons and queue-to-scored latency
+@app.route('/debug/ingest-stats', methods=['GET'])
+def debug_ingest_stats():
+    return jsonify(ingest_batcher.stats())
+
+# Anomaly gate: pass-through rate and per-device warm-up
+@app.route('/debug/anomaly-gate-stats', methods=['GET'])
+def debug_anomaly_gate_stats():
+    stats = anomaly_gate.stats()
+    stats["enabled"] = ANOMALY_GATE
+    return jsonify(stats)
+
+# Shadow scoring: per-version latency and disagreement with the serving model
+@app.route('/debug/shadow-stats', methods=['GET'])
+def debug_shadow_stats():
+    stats = shadow_scorer.stats()
+    stats["serving"] = active_model.version if active_model is not None else None
+    stats["shadows"] = [shadow.version for shadow in current_shadow_models()]
+    return jsonify(stats)
+
 # Model info endpoint updated for pipeline.joblib
 @app.route('/model-info', methods=['GET'])
 def get_model_info():
     try:
-        if not pipeline:
+        model = current_model()
+        if not model:
             return jsonify({"error": "ML pipeline not available"}), 503
+        pipeline = model.pipeline
         
         # Handle both 'classifier' and 'model' step names
         model_step = None
@@ -471,8 +1285,14 @@ def get_model_info():
             "model_type": model_type,
             "model_step": model_step,
             "feature_names": None,
-            "pipeline_source": "pipeline.joblib",
-            "model_params": None
+            "pipeline_source": model.path,
+            "model_version": model.version,
+            "inference_engine": "compiled" if model.compiled_model is not None else "sklearn",
+            "preprocessing": "compiled" if model.compiled_preprocessor is not None else "sklearn",
+            "windowed": model.windowed,
+            "model_params": None,
+            "fallback_rules": risk_rules.describe(),
+            "risk_prefilter": RISK_PREFILTER
         }
         
         # Try to get feature names from preprocessor
@@ -498,7 +1318,7 @@ def get_model_info():
 def validate_pipeline(pipeline):
     """Validate that the pipeline has expected components"""
     required_preprocessor = 'preprocessor'
-    model_steps = ['classifier']  # Accept either name
+    model_steps = ['classifier', 'model']  # Accept either name
     
     actual_steps = list(pipeline.named_steps.keys())
     
@@ -511,18 +1331,378 @@ def validate_pipeline(pipeline):
     if not has_model:
         raise ValueError(f"Pipeline missing model step. Expected one of: {model_steps}")
     
-    print("✅ Pipeline validation passed")
+    # Warm-up, /predict/batch and the compile check would push their readings into a stateful stage's windows;
+    # load_model makes the stateful copy polled and ingested readings advance
+    stateful = [name for name, step in pipeline.steps if getattr(step, "stateful", False)]
+    if stateful:
+        raise ValueError(f"Pipeline steps {stateful} are stateful; serve them with stateful=False")
+    
+    logger.info("✅ Pipeline validation passed")
     return True
 
-# Validate pipeline if loaded
-if pipeline:
+# Select the inference engine: "sklearn" (default) or "compiled" (array-backed forest scorer)
+INFERENCE_ENGINE = os.getenv("INFERENCE_ENGINE", "sklearn").lower()
+
+# Compile the pipeline's ColumnTransformer into a NumPy-only encoder at load time (0 = call the transformer)
+COMPILED_PREPROCESSOR = bool(int(os.getenv("COMPILED_PREPROCESSOR", 1)))
+
+# Readings every newly loaded version must score before it serves traffic
+WARM_UP_READINGS = [dict(SENSOR_DEFAULTS, Machine_Type=machine_type) for machine_type in MACHINE_TYPE_CODES]
+
+# Load, validate, compile (with INFERENCE_ENGINE=compiled) and warm one model version
+def load_model(version=None):
+    """
+    Return a LoadedModel ready to serve. version defaults to the registry's
+    active one, or PIPELINE_PATH while the registry is empty. Raises if the
+    pipeline can't be loaded, fails validation or can't score a sample batch.
+    """
+    start = time.perf_counter()
+    if version is None:
+        version = model_registry.active_version()
+    if version is None:
+        path, metadata = PIPELINE_PATH, {}
+    else:
+        path, metadata = model_registry.artifact_path(version), model_registry.metadata(version)
+    
+    pipeline = load_pipeline(path)
     try:
         validate_pipeline(pipeline)
     except Exception as e:
-        print(f"❌ Pipeline validation failed: {e}")
-        pipeline = None
+        logger.error(f"❌ Pipeline validation failed: {e}")
+        raise
+    
+    compiled_model = None
+    if INFERENCE_ENGINE == "compiled":
+        compiled_model = compile_model_step(get_model_step(pipeline))
+    estimator = compiled_model if compiled_model is not None else get_model_step(pipeline)
+    warm_up_frame = items_to_frame(WARM_UP_READINGS)
+    compiled_preprocessor = None
+    if COMPILED_PREPROCESSOR:
+        # float32 features for tree models, which would cast float64 ones down anyway
+        compiled_preprocessor = compile_preprocessor(preprocessing_steps(pipeline), warm_up_frame,
+                                                     dtype=model_input_dtype(estimator))
+    model = LoadedModel(version, pipeline, compiled_model, path=path, metadata=metadata,
+                        compiled_preprocessor=compiled_preprocessor)
+    rolling = [step for step in preprocessing_steps(pipeline) if type(step).__name__ == "RollingFeatures"]
+    if rolling:
+        model.windowed = True
+        model.streaming_pipeline = streaming_pipeline(pipeline)
+        model.window_context = max(max(step.windows) for step in rolling) - 1
+    import joblib
+    # The feature dtype is part of the key, so shadows only share features computed the same way
+    model.preprocessor_key = joblib.hash((preprocessing_steps(pipeline),
+                                          compiled_preprocessor.dtype.str if compiled_preprocessor else None))
+    model.load_seconds = round(time.perf_counter() - start, 3)
+    
+    # Predict directly rather than through score_frame, whose heuristic fallback would hide a broken model
+    start = time.perf_counter()
+    estimator.predict(encode_features(pipeline, warm_up_frame, preprocessor=compiled_preprocessor))
+    model.warm_seconds = round(time.perf_counter() - start, 3)
+    return model
+
+# Copy of a windowed pipeline whose RollingFeatures stages keep their per-device windows between calls
+def streaming_pipeline(pipeline):
+    from sklearn.base import clone
+    
+    streaming = copy.copy(pipeline)
+    streaming.steps = [(name, clone(step).set_params(stateful=True).fit(None)
+                        if type(step).__name__ == "RollingFeatures" else step)
+                       for name, step in pipeline.steps]
+    return streaming
+
+# Heavy resources, each loaded once: on first use or by the warm-up thread
+model_resource = LazyResource("pipeline", load_model)
+model_swap_lock = threading.Lock()
+model_reload_lock = threading.Lock()
+model_reload_thread = None
+model_reload_status = {"state": "idle", "version": None, "error": None, "seconds": None}
+pandas_resource = LazyResource("pandas", pd.load)
+table_resource = LazyResource("dynamodb", connect_table)
+WARMUP_RESOURCES = [model_resource, pandas_resource, table_resource]
+warmup_thread = None
+started_at = time.time()
+
+def current_model():
+    """The LoadedModel being served (or None), loading the active version on first use"""
+    global active_model
+    if active_model is None:
+        loaded = model_resource.get()
+        with model_swap_lock:
+            if active_model is None and loaded is not None:
+                active_model = loaded
+    return active_model
+
+def activate_model(model, pin=False):
+    """
+    Serve model from the next request on; the version it replaces is kept for
+    rollback. With pin, also make it the registry's ACTIVE version, under the
+    same lock so the registry watcher never sees one changed without the other.
+    """
+    global active_model, previous_model
+    with model_swap_lock:
+        if active_model is not None and active_model is not model:
+            previous_model = active_model
+        active_model = model
+        if pin and model.version is not None:
+            model_registry.set_active(model.version)
+    logger.info(f"✅ Serving model version {model.version}")
+
+# Score with one snapshot of the active model, so a concurrent swap can't mix two versions
+def score_with_active_model(frame, cached=False, streamed=False):
+    """
+    (risk, from_model) for every row of frame. With RISK_PREFILTER, readings in
+    the rules' healthy ranges are scored by the rules alone. With cached, rows
+    whose features the same model already scored are answered from
+    prediction_cache and only the rest reach the pipeline. streamed marks new
+    polled or ingested readings, which a windowed model scores against (and
+    adds to) each device's windows from earlier calls.
+    """
+    model = current_model()
+    if model is None:
+        return score_frame(None, frame, rules=risk_rules)
+    if model.windowed:
+        # A reading's features depend on the readings before it: never answer it from the rules or the cache
+        if streamed:
+            with model.window_lock:
+                return score_with_model(model, frame, model.streaming_pipeline)
+        return score_with_model(model, frame)
+    if RISK_PREFILTER:
+        healthy = risk_rules.healthy(frame)
+        if healthy.any():
+            risk = np.zeros(len(frame))
+            from_model = np.zeros(len(frame), dtype=bool)
+            risk[healthy] = risk_rules.score(frame[healthy])
+            SCORED_ROWS.inc(int(healthy.sum()), source="prefilter")
+            rest = ~healthy
+            if rest.any():
+                risk[rest], from_model[rest] = score_model_rows(model, frame[rest], cached)
+            return risk, from_model
+    return score_model_rows(model, frame, cached)
+
+def score_model_rows(model, frame, cached):
+    """(risk, from_model) from model, answered from prediction_cache where possible when cached"""
+    if not cached or PREDICTION_CACHE_SIZE <= 0:
+        return score_with_model(model, frame)
+    
+    keys = prediction_cache.keys(frame)
+    risk, from_model = prediction_cache.lookup(model, keys)
+    if from_model.any():
+        SCORED_ROWS.inc(int(from_model.sum()), source="cache")
+    miss = ~from_model
+    if miss.any():
+        risk[miss], from_model[miss] = score_with_model(model, frame[miss])
+        scored = np.flatnonzero(miss & from_model)
+        prediction_cache.store(model, [keys[i] for i in scored], risk[scored])
+    return risk, from_model
+
+def score_with_model(model, frame, pipeline=None):
+    """score_frame with model (or pipeline, a stand-in for model.pipeline), also handing the batch to any shadow models"""
+    if pipeline is None:
+        pipeline = model.pipeline
+    shadows = current_shadow_models()
+    if not shadows:
+        return score_frame(pipeline, frame, model=model.compiled_model, rules=risk_rules,
+                           preprocessor=model.compiled_preprocessor)
+    
+    # Transform once here so shadows with identical preprocessing reuse the features
+    start = time.perf_counter()
+    valid = valid_feature_rows(frame)
+    try:
+        with span("preprocessing"):
+            transformed = (encode_features(pipeline, frame, valid, model.compiled_preprocessor)
+                           if valid.any() else None)
+    except Exception:
+        transformed = None  # score_frame reports the error and falls back
+    risk, from_model = score_frame(pipeline, frame, model=model.compiled_model, transformed=transformed,
+                                   rules=risk_rules, preprocessor=model.compiled_preprocessor)
+    shadow_scorer.record_latency(model.version, time.perf_counter() - start, len(frame))
+    if transformed is not None and from_model.any():
+        shadow_scorer.submit(model, shadows, frame[from_model], transformed, risk[from_model])
+    return risk, from_model
+
+def load_shadow_models():
+    """LoadedModels for SHADOW_MODEL_VERSIONS; versions that fail to load are skipped"""
+    shadows = []
+    for version in SHADOW_MODEL_VERSIONS:
+        try:
+            shadows.append(load_model(version))
+            logger.info(f"✅ Shadow scoring with model version {version}")
+        except Exception as e:
+            logger.error(f"❌ Shadow model version {version} not loaded: {str(e)}")
+    return shadows
+
+shadow_resource = LazyResource("shadow models", load_shadow_models)
+if SHADOW_MODEL_VERSIONS:
+    WARMUP_RESOURCES.append(shadow_resource)
+
+def current_shadow_models():
+    if not SHADOW_MODEL_VERSIONS:
+        return []
+    return shadow_resource.get() or []
+
+def reload_model(version=None, pin=False):
+    """
+    Load, validate and warm version (default: the registry's active one) on a
+    background thread, then swap it in; requests keep using the current model
+    until the swap. With pin, a successful swap also makes it the registry's
+    ACTIVE version so other workers follow. Returns False if a reload is running.
+    """
+    global model_reload_thread
+    with model_reload_lock:
+        if model_reload_thread is not None and model_reload_thread.is_alive():
+            return False
+        model_reload_status.update(state="loading", version=version, error=None, seconds=None)
+        model_reload_thread = threading.Thread(target=run_model_reload, args=(version, pin), name="model-reload", daemon=True)
+        model_reload_thread.start()
+        return True
+
+def run_model_reload(version, pin):
+    start = time.perf_counter()
+    try:
+        model = load_model(version)
+        activate_model(model, pin=pin)
+        model_reload_status.update(state="ready", version=model.version)
+    except Exception as e:
+        serving = active_model.version if active_model is not None else None
+        logger.error(f"❌ Model reload failed, still serving version {serving}: {str(e)}")
+        model_reload_status.update(state="failed", error=str(e))
+    model_reload_status["seconds"] = round(time.perf_counter() - start, 3)
+
+# One watcher tick: reload when the registry's ACTIVE version is not the one being served
+def check_model_registry():
+    # Leave the first load to current_model()/warm-up
+    if model_resource.state in ("cold", "loading"):
+        return
+    with model_swap_lock:
+        version = model_registry.active_version()
+        serving = active_model.version if active_model is not None else None
+    failed = model_reload_status["state"] == "failed" and model_reload_status["version"] == version
+    if version is not None and version != serving and not failed:
+        logger.info(f"Model registry now names version {version}, reloading")
+        reload_model(version)
+
+# Background loop that reloads whenever the registry's ACTIVE version changes
+def watch_model_registry():
+    while True:
+        time.sleep(MODEL_WATCH_INTERVAL)
+        try:
+            check_model_registry()
+        except Exception as e:
+            logger.error(f"Error in model registry watcher: {str(e)}")
+
+model_watcher_thread = None
+
+# Start watch_model_registry in a serving process (gunicorn post_fork or __main__), never in a preloading master:
+# a worker forked while the watcher held model_swap_lock would inherit the lock held forever
+def start_model_watcher():
+    global model_watcher_thread
+    if MODEL_WATCH_INTERVAL > 0 and (model_watcher_thread is None or not model_watcher_thread.is_alive()):
+        model_watcher_thread = threading.Thread(target=watch_model_registry, name="model-registry-watcher", daemon=True)
+        model_watcher_thread.start()
+
+def current_table():
+    """The DynamoDB table (or None), connecting on first use"""
+    global table
+    if table is None:
+        table = table_resource.get()
+    return table
+
+def warm_up():
+    """Load every heavy resource now, on the calling thread"""
+    for resource in WARMUP_RESOURCES:
+        resource.get()
+
+def finish_warmup():
+    """Wait for the warm-up thread and any model reload, so nothing is mid-load when the process forks"""
+    if warmup_thread is not None:
+        warmup_thread.join()
+    if model_reload_thread is not None:
+        model_reload_thread.join()
+
+# Model registry: published versions, the one being served and the last reload
+@app.route('/models', methods=['GET'])
+def get_models():
+    try:
+        versions = [model_registry.metadata(version) for version in model_registry.versions()]
+        return jsonify({
+            "registry": MODEL_REGISTRY_DIR,
+            "registry_active": model_registry.active_version(),
+            "versions": versions,
+            "active": active_model.info() if active_model is not None else None,
+            "previous": previous_model.info() if previous_model is not None else None,
+            "reload": dict(model_reload_status)
+        })
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+# Load a version ({"version": "v3"}, default: the registry's ACTIVE one) in the background and swap it in
+@app.route('/models/reload', methods=['POST'])
+def post_models_reload():
+    body = request.get_json(silent=True) or {}
+    version = body.get("version")
+    if version is not None and version not in model_registry.versions():
+        return jsonify({"error": f"Unknown model version: {version}"}), 404
+    if not reload_model(version, pin=version is not None):
+        return jsonify({"error": "A model reload is already running", "reload": dict(model_reload_status)}), 409
+    return jsonify({"status": "reloading", "version": version}), 202
+
+# Swap back to the version the last reload replaced (already in memory, so immediate)
+@app.route('/models/rollback', methods=['POST'])
+def post_models_rollback():
+    global active_model, previous_model
+    with model_swap_lock:
+        if previous_model is None:
+            return jsonify({"error": "No previous model version in this process; POST /models/reload with a version instead"}), 409
+        # ACTIVE can't name the PIPELINE_PATH model, so the watcher (and every other worker) would undo the rollback
+        if previous_model.version is None and MODEL_WATCH_INTERVAL > 0:
+            return jsonify({"error": f"The previous model is {PIPELINE_PATH}, which has no registry version; "
+                                     f"publish it and POST /models/reload with its version instead"}), 409
+        active_model, previous_model = previous_model, active_model
+        restored, replaced = active_model, previous_model
+        if restored.version is not None:
+            model_registry.set_active(restored.version)
+    logger.info(f"↩️ Rolled back from model version {replaced.version} to {restored.version}")
+    return jsonify({"status": "rolled back", "version": restored.version, "previous": replaced.version})
+
+# Readiness probe: 200 once every resource has finished loading (even if it came up empty);
+# with APP_WARMUP=0 there is nothing to wait for, so always 200
+@app.route('/ready', methods=['GET'])
+def get_ready():
+    resources = {resource.name: resource.status() for resource in WARMUP_RESOURCES}
+    ready = not APP_WARMUP or all(status["state"] in ("ready", "failed") for status in resources.values())
+    return jsonify({
+        "ready": ready,
+        "uptime_seconds": round(time.time() - started_at, 3),
+        "resources": resources
+    }), 200 if ready else 503
+
+def init_worker():
+    """
+    Open this process's SQLite handle and drop any DynamoDB connection pool
+    inherited from a parent, then restart the warm-up. Neither connection can be
+    shared across fork(), so the gunicorn post_fork hook calls this again in
+    every worker; a pipeline preloaded by the master is kept and shared.
+    """
+    global table, timeseries_store, warmup_thread
+    table = None
+    table_resource.reset()
+    timeseries_store = open_timeseries_store()
+    if APP_WARMUP:
+        warmup_thread = start_warmup(WARMUP_RESOURCES)
+
+# Application factory: the entry point for WSGI servers (see gunicorn.conf.py)
+def create_app():
+    """
+    Return the Flask app without blocking on the model or AWS. The pipeline,
+    pandas and DynamoDB load in a background warm-up thread (see /ready), and
+    any request needing one sooner loads it on first use.
+    """
+    init_worker()
+    return app
 
 if __name__ == '__main__':
+    create_app()
+    start_model_watcher()
     port = int(os.getenv("FLASK_PORT", 5000))
     debug_mode = bool(int(os.getenv("FLASK_DEBUG", 1)))
     app.run(debug=debug_mode, host='0.0.0.0', port=port)
\ No newline at end of file
@@ -0,0 +1,171 @@
+"""
+Offline backfill: score the whole IoT_Sensor_Data table into Parquet files.
+
+Usage:
+    python backfill.py --output-dir backfill_output [--segments 16] [--workers 4]
+    python backfill.py --fixture readings.jsonl --output-dir /tmp/out   # local stand-in
+
+The table is read with a DynamoDB parallel scan (Segment/TotalSegments), one
+segment at a time per worker process. Pages are buffered until --chunk-size rows,
+scored with one batched pipeline call and written as one Parquet part file, so
+memory stays bounded by a chunk. After each part file is written the segment's
+checkpoint records the scan position; re-running the same command resumes
+from there and skips finished segments.
+"""
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from decimal import Decimal
+
+import joblib
+
+from scoring import items_to_frame, score_frame
+
+TABLE_NAME = "IoT_Sensor_Data"
+
+# Per-process state, set up once by init_worker
+worker_table = None
+worker_pipeline = None
+
+def load_fixture(path):
+    """Read DynamoDB-shaped items from a JSON lines file (numbers become Decimal, like boto3)"""
+    with open(path) as f:
+        return [json.loads(line, parse_float=Decimal, parse_int=Decimal) for line in f if line.strip()]
+
+def open_table(table_name, fixture=None):
+    if fixture:
+        from stub_table import StubTable
+        return StubTable(load_fixture(fixture), table_name=table_name)
+
+    import boto3
+    from dotenv import load_dotenv
+    load_dotenv()
+    dynamodb = boto3.resource(
+        'dynamodb',
+        region_name=os.getenv("AWS_DEFAULT_REGION", "us-east-1"),
+        aws_access_key_id=os.getenv("AWS_ACCESS_KEY_ID"),
+        aws_secret_access_key=os.getenv("AWS_SECRET_ACCESS_KEY")
+    )
+    return dynamodb.Table(table_name)
+
+def init_worker(table_name, fixture, pipeline_path):
+    global worker_table, worker_pipeline
+    worker_table = open_table(table_name, fixture)
+    try:
+        worker_pipeline = joblib.load(pipeline_path)
+    except Exception as e:
+        print(f"Warning: Could not load ML pipeline ({str(e)}); scoring with the heuristic only")
+        worker_pipeline = None
+
+def checkpoint_path(output_dir, segment):
+    return os.path.join(output_dir, "checkpoints", f"segment-{segment:05d}.json")
+
+def read_checkpoint(output_dir, segment):
+    try:
+        with open(checkpoint_path(output_dir, segment)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {"segment": segment, "last_key": None, "parts": 0, "rows": 0, "done": False}
+
+def write_atomic(path, write):
+    """Write via a temporary file and rename so a crash never leaves a partial file"""
+    tmp_path = f"{path}.tmp"
+    write(tmp_path)
+    os.replace(tmp_path, path)
+
+def write_checkpoint(output_dir, checkpoint):
+    def write(path):
+        with open(path, "w") as f:
+            json.dump(checkpoint, f)
+    write_atomic(checkpoint_path(output_dir, checkpoint["segment"]), write)
+
+def write_part(output_dir, segment, part, items):
+    """Score one chunk and write it as a Parquet part file"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    frame = items_to_frame(items)
+    risks, from_model = score_frame(worker_pipeline, frame)
+    frame["Machine_Type"] = [item.get("Machine_Type") for item in items]
+    frame["risk"] = risks
+    frame["source"] = ["model" if scored else "heuristic" for scored in from_model]
+
+    path = os.path.join(output_dir, f"segment-{segment:05d}-part-{part:06d}.parquet")
+    table = pa.Table.from_pandas(frame, preserve_index=False)
+    write_atomic(path, lambda tmp_path: pq.write_table(table, tmp_path, compression="zstd"))
+
+def backfill_segment(output_dir, segment, total_segments, chunk_size, page_size):
+    """Scan one segment to completion, resuming from its checkpoint"""
+    checkpoint = read_checkpoint(output_dir, segment)
+    if checkpoint["done"]:
+        return checkpoint
+
+    scan_args = {"Segment": segment, "TotalSegments": total_segments, "Limit": page_size}
+    if checkpoint["last_key"]:
+        scan_args["ExclusiveStartKey"] = checkpoint["last_key"]
+
+    chunk = []
+    while True:
+        response = worker_table.scan(**scan_args)
+        chunk.extend(response.get('Items', []))
+        last_key = response.get('LastEvaluatedKey')
+
+        # Flush on page boundaries only, so the checkpoint key matches what was written
+        if chunk and (len(chunk) >= chunk_size or last_key is None):
+            write_part(output_dir, segment, checkpoint["parts"], chunk)
+            checkpoint["parts"] += 1
+            checkpoint["rows"] += len(chunk)
+            checkpoint["last_key"] = last_key
+            chunk = []
+            write_checkpoint(output_dir, checkpoint)
+
+        if last_key is None:
+            break
+        scan_args["ExclusiveStartKey"] = last_key
+
+    checkpoint["done"] = True
+    write_checkpoint(output_dir, checkpoint)
+    return checkpoint
+
+def run_backfill(output_dir, segments=16, workers=4, chunk_size=50000, page_size=1000,
+                 table_name=TABLE_NAME, fixture=None, pipeline_path="pipeline.joblib"):
+    """Backfill every segment with a pool of worker processes; returns the segment checkpoints"""
+    os.makedirs(os.path.join(output_dir, "checkpoints"), exist_ok=True)
+    pending = [segment for segment in range(segments) if not read_checkpoint(output_dir, segment)["done"]]
+    print(f"Backfilling {len(pending)}/{segments} segments with {workers} workers into {output_dir}")
+
+    results = []
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker,
+                             initargs=(table_name, fixture, pipeline_path)) as executor:
+        futures = [executor.submit(backfill_segment, output_dir, segment, segments, chunk_size, page_size)
+                   for segment in pending]
+        for future in as_completed(futures):
+            checkpoint = future.result()
+            results.append(checkpoint)
+            print(f"Segment {checkpoint['segment']}: {checkpoint['rows']} rows in {checkpoint['parts']} parts")
+
+    total_rows = sum(read_checkpoint(output_dir, segment)["rows"] for segment in range(segments))
+    print(f"✅ Backfill complete: {total_rows} rows in {time.perf_counter() - start:.1f}s")
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--output-dir", required=True)
+    parser.add_argument("--segments", type=int, default=16, help="total parallel scan segments")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 4, help="worker processes")
+    parser.add_argument("--chunk-size", type=int, default=50000, help="rows per scored Parquet part")
+    parser.add_argument("--page-size", type=int, default=1000, help="scan Limit per request")
+    parser.add_argument("--table", default=TABLE_NAME)
+    parser.add_argument("--pipeline", default="pipeline.joblib")
+    parser.add_argument("--fixture", help="JSON lines file of items to scan instead of DynamoDB")
+    args = parser.parse_args()
+
+    run_backfill(args.output_dir, segments=args.segments, workers=args.workers, chunk_size=args.chunk_size,
+                 page_size=args.page_size, table_name=args.table, fixture=args.fixture,
+                 pipeline_path=args.pipeline)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Benchmark: scoring streamed device readings with and without the anomaly gate.
+
+Usage: python bench_anomaly_gate.py [--devices 50] [--polls 60] [--per-poll 10]
+
+Simulates the stream poller: every poll scores --per-poll new readings from
+each of --devices devices with score_readings(), as update_predictions() does,
+against a 100-tree forest from a temporary registry. Each device runs at its
+own operating point with sensor noise. About 2% of readings spike on one
+channel, and one device in ten overheats slowly from halfway through. The
+same traffic is scored with ANOMALY_GATE off and on. The script reports time
+per poll, the gate's pass-through rate, and how far gated risks are from what
+the model returns for the same readings. Run with INFERENCE_ENGINE=compiled to
+time the compiled forest instead of sklearn.
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from dynamodb_columns import ReadingColumns
+from model_registry import ModelRegistry
+from verify_helpers import build_pipeline
+
+CHANNELS = ["Temperature", "Vibration", "Power_Usage", "Humidity", "Pressure"]
+NOISE = np.array([0.8, 0.08, 0.008, 1.5, 0.4])
+SPIKES = np.array([15.0, 1.2, 0.08, 25.0, 8.0])
+
+def fleet_pipeline(path):
+    """A 100-tree forest fitted on readings across the fleet's operating ranges"""
+    rng = np.random.default_rng(0)
+    count = 5000
+    frame = pd.DataFrame({
+        "Temperature": rng.uniform(55, 95, count), "Vibration": rng.uniform(0.5, 3.5, count),
+        "Power_Usage": rng.uniform(0.12, 0.32, count), "Humidity": rng.uniform(20, 80, count),
+        "Pressure": rng.uniform(20, 40, count), "Machine_Type_Code": rng.integers(0, 3, count),
+    })
+    failing = (frame["Temperature"] > 78) | (frame["Vibration"] > 2.2) | (frame["Power_Usage"] > 0.27)
+    return build_pipeline(path, frame, failing)
+
+def make_traffic(devices, polls, per_poll, seed=0):
+    """One (ReadingColumns, device_ids) per poll; each device's readings newest first, like a query returns them"""
+    rng = np.random.default_rng(seed)
+    device_ids = [f"Sensor_{i:03d}" for i in range(devices)]
+    operating = np.column_stack([rng.uniform(62, 72, devices), rng.uniform(0.8, 1.6, devices),
+                                 rng.uniform(0.17, 0.22, devices), rng.uniform(38, 55, devices),
+                                 rng.uniform(28, 32, devices)])
+    overheating = np.arange(devices) % 10 == 9
+    start = pd.Timestamp("2025-05-29T00:00:00")
+    traffic = []
+    for poll in range(polls):
+        items = []
+        for d, device_id in enumerate(device_ids):
+            readings = []
+            for r in range(per_poll):
+                step = poll * per_poll + r
+                values = operating[d] + rng.normal(0, NOISE)
+                if rng.random() < 0.02:
+                    channel = rng.integers(len(CHANNELS))
+                    values[channel] += SPIKES[channel]
+                if overheating[d] and poll >= polls // 2:
+                    values[0] += 0.08 * (step - polls // 2 * per_poll)
+                readings.append(dict(zip(CHANNELS, values.round(4).tolist()), deviceId=device_id,
+                                     timestamp=(start + pd.Timedelta(seconds=4 * step)).isoformat(),
+                                     Machine_Type=("Type_A", "Type_B", "Type_C")[d % 3]))
+            items.extend(reversed(readings))
+        traffic.append((ReadingColumns.from_items(items), [item["deviceId"] for item in items]))
+    return traffic
+
+def run(app, traffic, gate):
+    """Risks for every reading and seconds per poll, from a cold gate and prediction cache"""
+    app.ANOMALY_GATE = gate
+    app.anomaly_gate.reset()
+    app.prediction_cache.invalidate()
+    risks, seconds = [], []
+    for readings, device_ids in traffic:
+        start = time.perf_counter()
+        predictions = app.score_readings(readings, device_ids)
+        seconds.append(time.perf_counter() - start)
+        risks.append([prediction["risk"] for prediction in predictions])
+    return np.concatenate(risks), np.array(seconds)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--devices", type=int, default=50)
+    parser.add_argument("--polls", type=int, default=60)
+    parser.add_argument("--per-poll", type=int, default=10)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        root = os.path.join(workdir, "registry")
+        ModelRegistry(root).publish(fleet_pipeline(os.path.join(workdir, "forest.joblib")))
+        os.environ.update(MODEL_REGISTRY_DIR=root, MODEL_WATCH_INTERVAL="0", APP_WARMUP="0", SHADOW_MODEL_VERSIONS="",
+                          TIMESERIES_DB_PATH=os.path.join(workdir, "app.db"))
+        import app
+        app.create_app()
+        traffic = make_traffic(args.devices, args.polls, args.per_poll)
+        model_risks, off = run(app, traffic, gate=False)
+        gated_risks, on = run(app, traffic, gate=True)
+        stats = app.anomaly_gate.stats()
+
+    warm = len(traffic) // 2  # polls after every device has warmed up
+    print(f"{args.devices} devices x {args.per_poll} readings per poll, {args.polls} polls "
+          f"({len(model_risks):,} readings)")
+    print(f"  gate off  {off.mean() * 1000:7.2f} ms/poll  (second half {off[warm:].mean() * 1000:.2f})")
+    print(f"  gate on   {on.mean() * 1000:7.2f} ms/poll  (second half {on[warm:].mean() * 1000:.2f}), "
+          f"{off.sum() / on.sum():.1f}x faster")
+    print(f"  pass-through rate {stats['pass_through_rate']:.1%} "
+          f"({stats['passed']:,} to the model, {stats['gated']:,} gated)")
+    difference = np.abs(gated_risks - model_risks)
+    high = model_risks >= 0.5
+    print(f"  gated vs model risk: mean |diff| {difference.mean():.4f}, max {difference.max():.3f}; "
+          f"{int((high & (difference > 0.1)).sum())} of {int(high.sum())} high-risk readings "
+          f"(model >= 0.5) off by more than 0.1")
+
+if __name__ == "__main__":
+    main()
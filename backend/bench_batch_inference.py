@@ -0,0 +1,120 @@
+"""
+Microbenchmark: per-row vs batched scoring of DynamoDB-shaped readings.
+
+Usage: python bench_batch_inference.py [--sizes 10 1000 100000] [--per-row-cap 2000]
+
+The per-row path reproduces the original get_prediction loop (one DataFrame,
+one preprocessor.transform and one model.predict per item). For large sizes the
+per-row path is timed on the first --per-row-cap items and extrapolated.
+"""
+import argparse
+import time
+from decimal import Decimal
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from scoring import get_machine_type_code, get_model_step, items_to_frame, score_frame
+
+def make_items(count, seed=0):
+    """Synthetic readings shaped like boto3 resource output (numbers as Decimal)"""
+    rng = np.random.default_rng(seed)
+    machine_types = np.array(["Type_A", "Type_B", "Type_C"])
+    temperature = rng.normal(70, 8, count)
+    vibration = rng.normal(1.5, 0.6, count)
+    power = rng.normal(0.22, 0.04, count)
+    humidity = rng.normal(45, 10, count)
+    pressure = rng.normal(30, 4, count)
+    types = machine_types[rng.integers(0, 3, count)]
+    return [
+        {
+            "deviceId": "ESP8266_IoT",
+            "timestamp": f"2025-05-29T10:{i // 60 % 60:02d}:{i % 60:02d}.{i:06d}",
+            "Temperature": Decimal(f"{temperature[i]:.2f}"),
+            "Vibration": Decimal(f"{vibration[i]:.3f}"),
+            "Power_Usage": Decimal(f"{power[i]:.4f}"),
+            "Humidity": Decimal(f"{humidity[i]:.2f}"),
+            "Pressure": Decimal(f"{pressure[i]:.2f}"),
+            "Machine_Type": str(types[i]),
+        }
+        for i in range(count)
+    ]
+
+def score_per_row(pipeline, items):
+    """The original one-item-at-a-time loop from get_prediction"""
+    risks = []
+    for item in items:
+        temperature = float(item.get("Temperature", 70))
+        vibration = float(item.get("Vibration", 1.0))
+        power_usage = float(item.get("Power_Usage", 0.2))
+        humidity = float(item.get("Humidity", 40))
+        pressure = float(item.get("Pressure", 30))
+        data = pd.DataFrame([{
+            "Temperature": temperature,
+            "Vibration": vibration,
+            "Power_Usage": power_usage,
+            "Humidity": humidity,
+            "Pressure": pressure,
+            "Machine_Type_Code": get_machine_type_code(item.get("Machine_Type", "Type_A"))
+        }])
+        try:
+            transformed_data = pipeline.named_steps['preprocessor'].transform(data)
+            risk_score = float(get_model_step(pipeline).predict(transformed_data)[0])
+        except Exception:
+            risk_score = 0.1
+            if temperature > 75: risk_score += 0.3
+            if vibration > 2.0: risk_score += 0.2
+            if power_usage > 0.25: risk_score += 0.2
+            if humidity > 70 or humidity < 30: risk_score += 0.1
+            if pressure > 35 or pressure < 25: risk_score += 0.1
+            risk_score = min(1.0, risk_score)
+        risks.append(risk_score)
+    return np.array(risks)
+
+def score_batched(pipeline, items):
+    risks, _ = score_frame(pipeline, items_to_frame(items))
+    return risks
+
+def best_of(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pipeline", default="pipeline.joblib")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 1000, 100000])
+    parser.add_argument("--per-row-cap", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    pipeline = joblib.load(args.pipeline)
+
+    # Quietly check whether the bundled model accepts the preprocessor output
+    probe = items_to_frame(make_items(1))
+    try:
+        get_model_step(pipeline).predict(pipeline.named_steps['preprocessor'].transform(probe))
+        print("Model step accepts preprocessor output")
+    except Exception as e:
+        print(f"Note: model step rejects preprocessor output ({e}); both paths time the heuristic fallback")
+
+    print(f"{'rows':>8} {'per-row (s)':>12} {'batched (s)':>12} {'speedup':>9}")
+    for size in args.sizes:
+        items = make_items(size)
+        sample = items[:min(size, args.per_row_cap)]
+        per_row = best_of(lambda: score_per_row(pipeline, sample), 1 if len(sample) > 100 else args.repeat)
+        per_row *= size / len(sample)
+        batched = best_of(lambda: score_batched(pipeline, items), args.repeat)
+
+        if not np.allclose(score_per_row(pipeline, items[:100]), score_batched(pipeline, items[:100])):
+            print(f"WARNING: per-row and batched risks differ for size {size}")
+        marker = "*" if len(sample) < size else " "
+        print(f"{size:>8} {per_row:>11.4f}{marker} {batched:>12.4f} {per_row / batched:>8.1f}x")
+    print("* extrapolated from --per-row-cap items")
+
+if __name__ == "__main__":
+    main()
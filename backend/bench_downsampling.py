@@ -0,0 +1,85 @@
+"""
+Benchmark: server-side downsampling for /sensors?from=&to=&points=.
+
+Usage: python bench_downsampling.py [--sizes 10000 100000 1000000] [--points 1000]
+
+First times the NumPy kernels (lttb, bucket_aggregate) on in-memory series of
+each size, then times GET /sensors end to end against a local store holding a
+day of 1 Hz readings (served raw) and a year of per-minute readings (served
+from hourly rollups), reporting latency and response size.
+"""
+import argparse
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from downsampling import bucket_aggregate, lttb
+from timeseries_store import CHANNELS
+
+def timed(function, repeat=3):
+    """Best wall time of `repeat` calls, and the last result"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+def bench_kernels(sizes, points):
+    print(f"{'readings':>10} {'lttb (ms)':>10} {'minmax (ms)':>12}")
+    rng = np.random.default_rng(0)
+    for size in sizes:
+        x = np.arange(size, dtype=np.float64)
+        y = np.cumsum(rng.normal(size=(size, len(CHANNELS))), axis=0)
+        ones = np.ones(size)
+        lttb_time, selected = timed(lambda: lttb(x, y, points))
+        minmax_time, buckets = timed(lambda: bucket_aggregate(x, ones, y, y, y, 0.0, float(size), points))
+        assert len(selected) == min(points, size) and len(buckets[0]) == min(points, size)
+        print(f"{size:>10} {lttb_time * 1000:>10.1f} {minmax_time * 1000:>12.1f}")
+
+def seed(store, device_id, end, count, step_seconds):
+    rng = np.random.default_rng(1)
+    for offset in range(0, count, 100000):
+        size = min(100000, count - offset)
+        values = np.cumsum(rng.normal(size=(size, len(CHANNELS))), axis=0) + 50
+        store.write(device_id, [
+            {"timestamp": (end - timedelta(seconds=step_seconds * (count - 1 - offset - i))).strftime("%Y-%m-%dT%H:%M:%S.%f"),
+             **dict(zip(CHANNELS, row))}
+            for i, row in enumerate(values.tolist())
+        ])
+
+def bench_endpoint(points):
+    import app
+    app.create_app()
+    app.table_resource.set(None)  # no DynamoDB: serve from the local store only
+    client = app.app.test_client()
+    end = datetime(2025, 6, 1)
+    seed(app.timeseries_store, "day_1hz", end, 24 * 3600, 1)
+    seed(app.timeseries_store, "year_1min", end, 365 * 24 * 60, 60)
+
+    print(f"\n{'GET /sensors':<34} {'method':>7} {'rows':>6} {'KB':>7} {'ms':>8}")
+    for device_id, days in (("day_1hz", 1), ("year_1min", 365)):
+        start = (end - timedelta(days=days)).isoformat()
+        for method in ("lttb", "minmax"):
+            url = f"/sensors?devices={device_id}&from={start}&to={end.isoformat()}&points={points}&method={method}"
+            elapsed, response = timed(lambda: client.get(url))
+            label = f"{device_id} ({days} day{'s' if days > 1 else ''})"
+            print(f"{label:<34} {method:>7} {len(response.get_json()):>6} "
+                  f"{len(response.data) / 1024:>7.0f} {elapsed * 1000:>8.1f}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument("--points", type=int, default=1000)
+    args = parser.parse_args()
+
+    bench_kernels(args.sizes, args.points)
+    with tempfile.TemporaryDirectory() as workdir:
+        os.environ["TIMESERIES_DB_PATH"] = os.path.join(workdir, "bench.db")
+        bench_endpoint(args.points)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+Benchmark: /sensors and /predict latency for 1 vs N devices against a StubTable
+with a simulated DynamoDB round trip.
+
+Usage: python bench_fleet_fanout.py [--devices 50] [--latency 0.03]
+"""
+import argparse
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import joblib
+
+import app
+from model_registry import LoadedModel
+from stub_table import StubTable
+
+def seed(device_ids, per_device):
+    now = datetime.now()
+    for device_id in device_ids:
+        for i in range(per_device):
+            yield {
+                "deviceId": device_id,
+                "timestamp": app.format_timestamp_for_query(now - timedelta(minutes=i)),
+                "Temperature": Decimal(70 + i % 10),
+                "Vibration": Decimal("1.2"),
+                "Power_Usage": Decimal("0.21"),
+                "Humidity": Decimal(40 + i % 8),
+                "Pressure": Decimal(30),
+                "Machine_Type": "Type_A",
+            }
+
+def timed_get(client, url):
+    start = time.perf_counter()
+    response = client.get(url)
+    elapsed = time.perf_counter() - start
+    assert response.status_code == 200, response.get_data(as_text=True)
+    return elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--devices", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.03, help="simulated seconds per DynamoDB request")
+    args = parser.parse_args()
+
+    device_ids = [f"device-{i:03d}" for i in range(args.devices)]
+    app.table = StubTable(seed(device_ids, 30), latency=args.latency)
+    app.sensor_cache.ttl_seconds = 0  # measure the queries, not the cache
+    # /predict only queries when a model is served; the bundled pipeline fails its warm-up batch
+    if app.current_model() is None:
+        app.activate_model(LoadedModel(None, joblib.load("pipeline.joblib"), path="pipeline.joblib"))
+    client = app.app.test_client()
+
+    print(f"{'route':<10} {'devices':>8} {'latency (s)':>12} {'queries':>8}")
+    for route in ("/sensors", "/predict"):
+        for count in (1, args.devices):
+            app.prediction_store.clear()
+            queries_before = app.table.query_count
+            elapsed = timed_get(client, f"{route}?devices={','.join(device_ids[:count])}")
+            print(f"{route:<10} {count:>8} {elapsed:>12.3f} {app.table.query_count - queries_before:>8}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""
+Benchmark: bursty sensor traffic through POST /ingest vs POST /predict/batch.
+
+Usage: python bench_ingest.py [--bursts 30] [--clients 16] [--rows 8] [--interval 0.25]
+
+Serves the app the way bench_load.py does: a child process behind a threaded
+werkzeug server, with a 100-tree RandomForest from a temporary registry.
+Every --interval seconds, --clients gateways each post --rows readings at
+once. The same bursts go to /predict/batch, which scores each request
+synchronously, and to /ingest, which queues them for the micro-batching
+worker. The script reports HTTP latency percentiles and readings/s for both.
+For /ingest it also reports queue-to-scored latency and batch sizes from
+/debug/ingest-stats. Readings/s counts until every accepted reading has been
+scored.
+"""
+import argparse
+import http.client
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from bench_load import free_port, request, wait_ready
+
+def burst_bodies(clients, rows, bursts):
+    """bodies[burst][client]: rows readings from that client's device, as JSON"""
+    rng = np.random.default_rng(0)
+    start = datetime(2025, 6, 1)
+    return [[json.dumps([{"deviceId": f"Gateway_{client:02d}",
+                          "timestamp": (start + timedelta(seconds=burst * rows + i)).strftime("%Y-%m-%dT%H:%M:%S.%f"),
+                          "Temperature": round(float(rng.normal(70, 8)), 1),
+                          "Vibration": round(float(rng.uniform(0, 100)), 2),
+                          "Power_Usage": round(float(rng.uniform(0.1, 0.4)), 3),
+                          "Humidity": round(float(rng.normal(45, 5)), 1),
+                          "Pressure": round(float(rng.normal(30, 2)), 1),
+                          "Machine_Type": ("Type_A", "Type_B", "Type_C")[client % 3]} for i in range(rows)]).encode()
+             for client in range(clients)] for burst in range(bursts)]
+
+def run_bursts(port, path, bodies, interval):
+    """Send each burst's bodies concurrently, one burst every interval; returns (seconds, status) per request"""
+    results = []
+    lock = threading.Lock()
+
+    def send(body):
+        result = request(port, "POST", path, body)
+        with lock:
+            results.append(result)
+
+    threads = []
+    for burst in bodies:
+        started = time.perf_counter()
+        for body in burst:
+            threads.append(threading.Thread(target=send, args=(body,)))
+            threads[-1].start()
+        time.sleep(max(0.0, interval - (time.perf_counter() - started)))
+    for thread in threads:
+        thread.join()
+    return results
+
+def ingest_stats(port):
+    connection = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+    try:
+        connection.request("GET", "/debug/ingest-stats")
+        return json.loads(connection.getresponse().read())
+    finally:
+        connection.close()
+
+def report(name, results, rows, seconds):
+    latencies = np.array([elapsed for elapsed, _ in results]) * 1000
+    statuses = [status for _, status in results]
+    accepted = sum(1 for status in statuses if status is not None and 200 <= status < 300)
+    print(f"{name:<16}{len(results):>9}{len(results) - accepted:>8}{np.percentile(latencies, 50):>10.2f}"
+          f"{np.percentile(latencies, 95):>10.2f}{np.percentile(latencies, 99):>10.2f}"
+          f"{accepted * rows / seconds:>14,.0f}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--bursts", type=int, default=30)
+    parser.add_argument("--clients", type=int, default=16, help="concurrent requests per burst")
+    parser.add_argument("--rows", type=int, default=8, help="readings per request")
+    parser.add_argument("--interval", type=float, default=0.25, help="seconds between bursts")
+    args = parser.parse_args()
+
+    bodies = burst_bodies(args.clients, args.rows, args.bursts)
+    warmup = burst_bodies(args.clients, args.rows, 2)
+    with tempfile.TemporaryDirectory() as workdir:
+        port = free_port()
+        server = subprocess.Popen([sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                                "bench_load.py"),
+                                   "--serve", "--port", str(port), "--workdir", workdir,
+                                   "--readings-per-device", "10", "--write-interval", "0"],
+                                  cwd=os.path.dirname(os.path.abspath(__file__)))
+        try:
+            wait_ready(port, server)
+            run_bursts(port, "/predict/batch", warmup, args.interval)
+            start = time.perf_counter()
+            batch = run_bursts(port, "/predict/batch", bodies, args.interval)
+            batch_seconds = time.perf_counter() - start
+
+            run_bursts(port, "/ingest", warmup, args.interval)
+            while ingest_stats(port)["queued_rows"]:
+                time.sleep(0.01)
+            before = ingest_stats(port)
+            start = time.perf_counter()
+            ingest = run_bursts(port, "/ingest", bodies, args.interval)
+            while True:
+                stats = ingest_stats(port)
+                if stats["handled_rows"] >= stats["accepted"]:
+                    break
+                time.sleep(0.005)
+            ingest_seconds = time.perf_counter() - start
+        finally:
+            server.terminate()
+            server.wait()
+
+    print(f"{args.bursts} bursts of {args.clients} concurrent requests x {args.rows} readings, "
+          f"every {args.interval * 1000:.0f} ms")
+    print(f"{'endpoint':<16}{'requests':>9}{'errors':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'readings/s':>14}")
+    report("/predict/batch", batch, args.rows, batch_seconds)
+    report("/ingest", ingest, args.rows, ingest_seconds)
+    batches = stats["batches"] - before["batches"]
+    handled = stats["handled_rows"] - before["handled_rows"]
+    latency = stats["latency_ms"]
+    print(f"ingest worker: {batches} batches of {handled / batches:.1f} readings on average "
+          f"(flushed by size {stats['flushes']['size'] - before['flushes']['size']}, "
+          f"by deadline {stats['flushes']['deadline'] - before['flushes']['deadline']}), "
+          f"{stats['rejected'] - before['rejected']} readings refused")
+    print(f"queue-to-scored latency (recent chunks): p50 {latency['p50']:.1f} ms, p95 {latency['p95']:.1f} ms, "
+          f"p99 {latency['p99']:.1f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Microbenchmark: per-item Decimal decoding vs bulk wire-format decoding.
+
+Usage: python bench_item_decoding.py [--sizes 10000 1000000] [--page-size 5000]
+
+Readings arrive as query pages of --page-size wire-format items, like the
+low-level client returns them (a 1 MB DynamoDB page holds a few thousand
+readings). Both paths end with the /sensors float columns, the model input
+frame and the history-store rows:
+  per-item  the resource layer's TypeDeserializer (one Decimal per number),
+            then float(item.get(...)) per field, items_to_frame() and
+            TimeSeriesStore.write()'s old row loop
+  bulk      ReadingColumns.from_wire(), then column(), to_frame() and
+            write_columns()'s row build
+The outputs are compared, so a speedup can't come from decoding differently.
+"""
+import argparse
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from dynamodb_columns import ReadingColumns
+from scoring import items_to_frame
+from timeseries_store import CHANNELS, _nullable, timestamp_seconds, timestamps_seconds
+
+# /sensors fields and the value reported when a reading lacks one (as in app.py)
+SENSOR_MISSING_VALUES = {"Temperature": 0, "Vibration": 0, "Power_Usage": 0, "Humidity": 65, "Pressure": 905}
+
+def make_page(count, seed):
+    """One page of wire-format items, a few of them without Humidity"""
+    rng = np.random.default_rng(seed)
+    start = datetime(2025, 5, 29) + timedelta(seconds=seed * count)
+    machine_types = ("Type_A", "Type_B", "Type_C")
+    page = []
+    for i in range(count):
+        item = {
+            "deviceId": {"S": "ESP8266_IoT"},
+            "timestamp": {"S": (start + timedelta(seconds=i)).strftime("%Y-%m-%dT%H:%M:%S.%f")},
+            "Temperature": {"N": f"{rng.normal(70, 8):.2f}"},
+            "Vibration": {"N": f"{rng.normal(1.5, 0.6):.3f}"},
+            "Power_Usage": {"N": f"{rng.normal(0.22, 0.04):.4f}"},
+            "Humidity": {"N": f"{rng.normal(45, 10):.2f}"},
+            "Pressure": {"N": f"{rng.normal(30, 4):.2f}"},
+            "Machine_Type": {"S": machine_types[i % 3]},
+        }
+        if i % 1000 == 999:
+            del item["Humidity"]
+        page.append(item)
+    return page
+
+def _old_to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+def decode_per_item(page, deserializer):
+    """The resource layer, then the per-item loops in get_sensors, items_to_frame and TimeSeriesStore.write"""
+    items = [{name: deserializer.deserialize(value) for name, value in item.items()} for item in page]
+    sensors = {attribute: np.array([float(item.get(attribute, missing)) for item in items])
+               for attribute, missing in SENSOR_MISSING_VALUES.items()}
+    frame = items_to_frame(items)
+    rows = [(item["deviceId"], item["timestamp"], timestamp_seconds(item["timestamp"]),
+             *(_old_to_float(item.get(channel)) for channel in CHANNELS), item.get("Machine_Type"))
+            for item in items]
+    return sensors, frame, rows
+
+def decode_bulk(page):
+    readings = ReadingColumns.from_wire(page)
+    sensors = {attribute: readings.column(attribute, missing) for attribute, missing in SENSOR_MISSING_VALUES.items()}
+    frame = readings.to_frame()
+    epochs = timestamps_seconds(readings.timestamps)
+    rows = list(zip(readings.device_ids, readings.timestamps, epochs.tolist(),
+                    *(_nullable(readings.values[channel]) for channel in CHANNELS), readings.machine_types))
+    return sensors, frame, rows
+
+def same_output(a, b):
+    sensors_a, frame_a, rows_a = a
+    sensors_b, frame_b, rows_b = b
+    return (all(np.array_equal(sensors_a[name], sensors_b[name]) for name in sensors_a)
+            and frame_a.equals(frame_b) and rows_a == rows_b)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 1000000])
+    parser.add_argument("--page-size", type=int, default=5000)
+    parser.add_argument("--distinct-pages", type=int, default=10, help="pages generated and cycled through")
+    args = parser.parse_args()
+
+    from boto3.dynamodb.types import TypeDeserializer
+    deserializer = TypeDeserializer()
+    pages = [make_page(args.page_size, seed) for seed in range(args.distinct_pages)]
+    for page in pages[:2]:
+        if not same_output(decode_per_item(page, deserializer), decode_bulk(page)):
+            raise SystemExit("Bulk decoding differs from the per-item path")
+    print("Outputs identical on the sample pages")
+
+    print(f"{'items':>9}{'per-item s':>12}{'bulk s':>10}{'speedup':>9}{'bulk items/s':>15}")
+    for size in args.sizes:
+        count = max(1, size // args.page_size)
+        timings = {}
+        for label, decode in (("per-item", lambda page: decode_per_item(page, deserializer)), ("bulk", decode_bulk)):
+            start = time.perf_counter()
+            for i in range(count):
+                decode(pages[i % len(pages)])
+            timings[label] = time.perf_counter() - start
+        items = count * args.page_size
+        print(f"{items:>9}{timings['per-item']:>12.3f}{timings['bulk']:>10.3f}"
+              f"{timings['per-item'] / timings['bulk']:>8.1f}x{items / timings['bulk']:>15,.0f}")
+
+if __name__ == "__main__":
+    main()
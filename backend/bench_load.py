@@ -0,0 +1,299 @@
+"""
+Load test: latency, throughput and memory of the running backend.
+
+Usage: python bench_load.py [--concurrency 8] [--requests 500] [--output results.json]
+                            [--save-baseline baseline.json | --baseline baseline.json]
+
+Starts the app in a child process behind a threaded werkzeug server, against a
+StubTable seeded with synthetic IoT_Sensor_Data readings for every asset
+(a writer thread keeps adding fresh ones), and a 100-tree RandomForest served
+from a temporary registry. Then drives each scenario over real HTTP from
+--concurrency client threads:
+  sensors  GET /sensors?devices=all
+  predict  GET /predict?devices=all
+  batch    POST /predict/batch with --batch-rows readings
+and reports p50/p95/p99/mean latency, throughput and the server's peak RSS
+as JSON (stdout, or --output). Seeds are fixed, so runs on one machine are
+comparable: --save-baseline stores the results, and --baseline compares
+against them and exits 1 if any scenario's p95 or throughput is more than
+--tolerance worse. Baselines are machine-specific; don't compare across hosts.
+"""
+import argparse
+import http.client
+import json
+import logging
+import os
+import platform
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import numpy as np
+
+SCENARIOS = ("sensors", "predict", "batch")
+MACHINE_TYPES = ("Type_A", "Type_B", "Type_C")
+
+def make_reading(rng, device_id, timestamp):
+    """One IoT_Sensor_Data item, with the Decimal values boto3 returns"""
+    return {
+        "deviceId": device_id,
+        "timestamp": timestamp.strftime("%Y-%m-%dT%H:%M:%S.%f"),
+        "Temperature": Decimal(str(round(rng.normal(70, 8), 1))),
+        "Vibration": Decimal(str(round(rng.uniform(0, 100), 2))),
+        "Power_Usage": Decimal(str(round(rng.uniform(0.1, 0.4), 3))),
+        "Humidity": Decimal(str(round(rng.normal(45, 5), 1))),
+        "Pressure": Decimal(str(round(rng.normal(30, 2), 1))),
+        "Machine_Type": MACHINE_TYPES[rng.integers(len(MACHINE_TYPES))],
+    }
+
+def seed_items(device_ids, per_device, rng):
+    now = datetime.now()
+    return [make_reading(rng, device_id, now - timedelta(seconds=5 * i))
+            for device_id in device_ids for i in range(per_device)]
+
+def batch_body(rows):
+    rng = np.random.default_rng(1)
+    readings = []
+    for item in seed_items(["ESP8266_IoT"], rows, rng):
+        readings.append({key: float(value) if isinstance(value, Decimal) else value for key, value in item.items()})
+    return json.dumps(readings).encode()
+
+def serve(args):
+    """Child process: run the app on args.port until terminated"""
+    os.environ.update(MODEL_REGISTRY_DIR=os.path.join(args.workdir, "registry"), MODEL_WATCH_INTERVAL="0",
+                      APP_WARMUP="0", LOG_LEVEL=os.getenv("LOG_LEVEL", "WARNING"),
+                      SHADOW_LOG_PATH=os.path.join(args.workdir, "shadow_log.jsonl"),
+                      TIMESERIES_DB_PATH=os.path.join(args.workdir, "app.db"))
+    from model_registry import ModelRegistry
+    from stub_table import StubTable
+    from verify_helpers import build_pipeline, uniform_frame
+
+    # A 100-tree forest that flags hot, strongly vibrating machines
+    frame = uniform_frame(2000)
+    ModelRegistry(os.environ["MODEL_REGISTRY_DIR"]).publish(build_pipeline(
+        os.path.join(args.workdir, "forest.joblib"), frame, (frame["Temperature"] > 75) & (frame["Vibration"] > 50)))
+
+    import app
+    app.create_app()
+    rng = np.random.default_rng(0)
+    device_ids = [asset["device_id"] for asset in app.ASSETS]
+    table = StubTable(seed_items(device_ids, args.readings_per_device, rng), latency=args.dynamodb_latency)
+    app.table_resource.set(table)
+    app.warm_up()
+
+    def write_readings():
+        while True:
+            time.sleep(args.write_interval)
+            for device_id in device_ids:
+                table.put_item(Item=make_reading(rng, device_id, datetime.now()))
+
+    if args.write_interval > 0:
+        threading.Thread(target=write_readings, daemon=True).start()
+
+    from werkzeug.serving import make_server
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)  # no access log line per request
+    make_server("127.0.0.1", args.port, app.app, threaded=True).serve_forever()
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def request(port, method, path, body=None):
+    """Issue one request; returns (seconds, status)"""
+    headers = {"Content-Type": "application/json"} if body is not None else {}
+    start = time.perf_counter()
+    connection = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+    try:
+        connection.request(method, path, body=body, headers=headers)
+        response = connection.getresponse()
+        response.read()
+        status = response.status
+    except (OSError, http.client.HTTPException):
+        status = None
+    finally:
+        connection.close()
+    return time.perf_counter() - start, status
+
+def wait_ready(port, process, timeout=120):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            sys.exit(f"Server exited with code {process.returncode}")
+        if request(port, "GET", "/ready")[1] == 200:
+            return
+        time.sleep(0.1)
+    sys.exit("Server did not become ready")
+
+def memory_kb(pid):
+    """(current, peak) resident set size of pid in kB, from /proc (None elsewhere)"""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            fields = dict(line.split(":", 1) for line in f if ":" in line)
+        return int(fields["VmRSS"].split()[0]), int(fields["VmHWM"].split()[0])
+    except (OSError, KeyError, ValueError):
+        return None, None
+
+def run_scenario(port, method, path, body, args):
+    """Drive one endpoint from args.concurrency threads; returns its result dict"""
+    for _ in range(args.warmup):
+        request(port, method, path, body)
+
+    remaining = [args.requests]
+    lock = threading.Lock()
+    latencies, errors = [], [0]
+    deadline = time.perf_counter() + args.duration if args.duration else None
+
+    def worker():
+        while True:
+            with lock:
+                if deadline is None:
+                    if remaining[0] <= 0:
+                        return
+                    remaining[0] -= 1
+            if deadline is not None and time.perf_counter() >= deadline:
+                return
+            seconds, status = request(port, method, path, body)
+            with lock:
+                latencies.append(seconds)
+                if status != 200:
+                    errors[0] += 1
+
+    threads = [threading.Thread(target=worker) for _ in range(args.concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    milliseconds = np.array(latencies) * 1000
+    return {
+        "method": method,
+        "path": path,
+        "requests": len(latencies),
+        "errors": errors[0],
+        "seconds": round(elapsed, 3),
+        "throughput_rps": round(len(latencies) / elapsed, 2),
+        "latency_ms": {
+            "p50": round(float(np.percentile(milliseconds, 50)), 3),
+            "p95": round(float(np.percentile(milliseconds, 95)), 3),
+            "p99": round(float(np.percentile(milliseconds, 99)), 3),
+            "mean": round(float(milliseconds.mean()), 3),
+            "max": round(float(milliseconds.max()), 3),
+        },
+    }
+
+def compare(results, baseline, tolerance):
+    """Lines describing regressions against baseline (empty if none)"""
+    regressions = []
+    for name, result in results["scenarios"].items():
+        reference = baseline.get("scenarios", {}).get(name)
+        if reference is None:
+            continue
+        p95, reference_p95 = result["latency_ms"]["p95"], reference["latency_ms"]["p95"]
+        if p95 > reference_p95 * (1 + tolerance):
+            regressions.append(f"{name}: p95 {p95:.2f} ms vs baseline {reference_p95:.2f} ms")
+        rps, reference_rps = result["throughput_rps"], reference["throughput_rps"]
+        if rps < reference_rps * (1 - tolerance):
+            regressions.append(f"{name}: throughput {rps:.1f}/s vs baseline {reference_rps:.1f}/s")
+        if result["errors"] > reference["errors"]:
+            regressions.append(f"{name}: {result['errors']} errors vs baseline {reference['errors']}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="comma-separated subset of " + ", ".join(SCENARIOS))
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=500, help="requests per scenario")
+    parser.add_argument("--duration", type=float, default=0, help="seconds per scenario instead of --requests")
+    parser.add_argument("--warmup", type=int, default=20, help="untimed requests before each scenario")
+    parser.add_argument("--batch-rows", type=int, default=500)
+    parser.add_argument("--readings-per-device", type=int, default=2000)
+    parser.add_argument("--dynamodb-latency", type=float, default=0.005, help="simulated seconds per DynamoDB request")
+    parser.add_argument("--write-interval", type=float, default=1.0, help="seconds between new readings per device (0 = none)")
+    parser.add_argument("--output", help="write the JSON results here instead of stdout")
+    parser.add_argument("--save-baseline", help="also write the results to this baseline file")
+    parser.add_argument("--baseline", help="compare against this baseline file; exit 1 on a regression")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative slowdown against --baseline")
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--workdir", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.serve:
+        serve(args)
+        return
+
+    scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenario(s): {', '.join(sorted(unknown))}")
+    requests = {
+        "sensors": ("GET", "/sensors?devices=all", None),
+        "predict": ("GET", "/predict?devices=all", None),
+        "batch": ("POST", "/predict/batch", batch_body(args.batch_rows)),
+    }
+
+    results = {
+        "config": {name: getattr(args, name) for name in
+                   ("concurrency", "requests", "duration", "warmup", "batch_rows", "readings_per_device",
+                    "dynamodb_latency", "write_interval")},
+        "environment": {"python": platform.python_version(), "platform": platform.platform(),
+                        "cpus": os.cpu_count()},
+        "scenarios": {},
+    }
+    with tempfile.TemporaryDirectory() as workdir:
+        port = free_port()
+        server = subprocess.Popen([sys.executable, os.path.abspath(__file__), "--serve", "--port", str(port),
+                                   "--workdir", workdir] + sys.argv[1:],
+                                  cwd=os.path.dirname(os.path.abspath(__file__)))
+        try:
+            wait_ready(port, server)
+            _, startup_peak = memory_kb(server.pid)
+            results["server_rss_mb"] = {"after_startup": round(startup_peak / 1024, 1) if startup_peak else None}
+            for name in scenarios:
+                method, path, body = requests[name]
+                print(f"{name}: {method} {path} ...", file=sys.stderr)
+                result = run_scenario(port, method, path, body, args)
+                current, _ = memory_kb(server.pid)
+                result["server_rss_mb"] = round(current / 1024, 1) if current else None
+                results["scenarios"][name] = result
+            _, peak = memory_kb(server.pid)
+            results["server_rss_mb"]["peak"] = round(peak / 1024, 1) if peak else None
+        finally:
+            server.terminate()
+            server.wait()
+
+    print(f"{'scenario':<10}{'requests':>10}{'errors':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'req/s':>10}",
+          file=sys.stderr)
+    for name, result in results["scenarios"].items():
+        latency = result["latency_ms"]
+        print(f"{name:<10}{result['requests']:>10}{result['errors']:>8}{latency['p50']:>10.2f}"
+              f"{latency['p95']:>10.2f}{latency['p99']:>10.2f}{result['throughput_rps']:>10.1f}", file=sys.stderr)
+    print(f"server peak RSS: {results['server_rss_mb']['peak']} MB", file=sys.stderr)
+
+    text = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            f.write(text + "\n")
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION  {line}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions beyond {args.tolerance:.0%} of {args.baseline}", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
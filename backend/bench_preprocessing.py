@@ -0,0 +1,91 @@
+"""
+Benchmark: the fitted ColumnTransformer vs CompiledPreprocessor, per batch.
+
+Usage: python bench_preprocessing.py [--sizes 1 10 100 1000 10000 100000]
+
+Fits a pipeline shaped like the bundled one: StandardScaler on the four
+sensors, a drop-first OneHotEncoder on Machine_Type_Code and a 100-tree
+forest. Its preprocessing is timed on frames shaped like the serving ones
+(FEATURE_COLUMNS plus deviceId/timestamp, with a few invalid rows masked out
+the way score_frame does) three ways:
+  sklearn   transform_features(pipeline, frame[valid])
+  compiled  CompiledPreprocessor.transform(frame, valid), float64, new output array
+  pooled    the same into a pooled float32 buffer, as score_frame does for tree models
+For each it reports the median time per batch and the peak memory allocated
+during one batch (tracemalloc, which NumPy reports to). It also times
+score_frame end to end with and without the compiled preprocessor.
+"""
+import argparse
+import time
+import tracemalloc
+
+import numpy as np
+
+from compiled_preprocessor import CompiledPreprocessor
+from scoring import FEATURE_COLUMNS, score_frame, transform_features
+from verify_helpers import build_pipeline, bundled_preprocessor, sensor_frame
+
+def forest_pipeline():
+    """The bundled pipeline's preprocessing with a forest fitted on its output"""
+    frame = sensor_frame(5000, seed=1)
+    failing = (frame["Temperature"] > 80) | (frame["Vibration"] > 2.3) | (frame["Power_Usage"] > 0.28)
+    return build_pipeline(frame=frame, labels=failing, preprocessor=bundled_preprocessor())
+
+def measure(function, min_seconds=0.2):
+    """(median seconds per call, peak bytes allocated during one call)"""
+    function()
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    base = tracemalloc.get_traced_memory()[0]
+    function()
+    peak = tracemalloc.get_traced_memory()[1] - base
+    tracemalloc.stop()
+
+    times = []
+    deadline = time.perf_counter() + min_seconds
+    while len(times) < 5 or (time.perf_counter() < deadline and len(times) < 10000):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return float(np.median(times)), peak
+
+def format_bytes(count):
+    for unit in ("B", "KB", "MB"):
+        if count < 1024 or unit == "MB":
+            return f"{count:.0f} {unit}" if unit == "B" else f"{count:.1f} {unit}"
+        count /= 1024
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 10, 100, 1000, 10000, 100000])
+    args = parser.parse_args()
+
+    pipeline = forest_pipeline()
+    preprocessor = pipeline.named_steps['preprocessor']
+    compiled = CompiledPreprocessor(preprocessor)
+    pooled = CompiledPreprocessor(preprocessor, dtype=np.float32)
+
+    print(f"{'rows':>8}  {'sklearn':>19}  {'compiled':>19}  {'pooled float32':>19}  {'speedup':>7}  "
+          f"{'score_frame ms':>21}")
+    for size in args.sizes:
+        frame = sensor_frame(size, invalid=0.01 if size >= 100 else 0.0)
+        valid = np.isfinite(frame[FEATURE_COLUMNS].to_numpy(dtype=np.float64)).all(axis=1)
+        expected = transform_features(pipeline, frame[valid])
+        assert np.array_equal(compiled.transform(frame, valid), expected)
+
+        def run_pooled():
+            buffer = pooled.take_buffer(int(valid.sum()))
+            pooled.transform(frame, valid, out=buffer)
+            pooled.give_buffer(buffer)
+
+        results = [measure(lambda: transform_features(pipeline, frame[valid])),
+                   measure(lambda: compiled.transform(frame, valid)),
+                   measure(run_pooled)]
+        end_to_end = [measure(lambda: score_frame(pipeline, frame), min_seconds=0.5)[0],
+                      measure(lambda: score_frame(pipeline, frame, preprocessor=pooled), min_seconds=0.5)[0]]
+        cells = "  ".join(f"{seconds * 1000:>8.3f} ms {format_bytes(peak):>8}" for seconds, peak in results)
+        print(f"{size:>8}  {cells}  {results[0][0] / results[2][0]:>6.1f}x  "
+              f"{end_to_end[0] * 1000:>9.2f} -> {end_to_end[1] * 1000:>8.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+Benchmark: per-reading cost of rolling features as the window grows.
+
+Usage: python bench_rolling_features.py [--windows 10 100 1000 10000] [--readings 20000]
+
+Compares RollingFeatures.update (O(1) online updates) with recomputing the same
+statistics over the full window with NumPy for every new reading.
+"""
+import argparse
+import time
+
+import numpy as np
+
+from rolling_features import RollingFeatures
+from scoring import SENSOR_DEFAULTS
+
+CHANNELS = list(SENSOR_DEFAULTS)
+
+def recompute(history, window):
+    """Naive reference: recompute every statistic from the last `window` values"""
+    features = []
+    for channel in range(history.shape[1]):
+        values = history[-window:, channel]
+        n = len(values)
+        positions = np.arange(n)
+        slope = np.polyfit(positions, values, 1)[0] if n > 1 else 0.0
+        weights = (1 - 2.0 / (window + 1)) ** positions[::-1]
+        features.extend([values.mean(), values.std(ddof=1) if n > 1 else 0.0, slope,
+                         (weights * values).sum() / weights.sum(), (values[-1] - values[0]) / max(n - 1, 1)])
+    return features
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--windows", type=int, nargs="+", default=[10, 100, 1000, 10000])
+    parser.add_argument("--readings", type=int, default=20000)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"{'window':>8} {'online (us/reading)':>20} {'recompute (us/reading)':>23}")
+    for window in args.windows:
+        stream = rng.normal(50, 5, size=(window + args.readings, len(CHANNELS)))
+        readings = [dict(zip(CHANNELS, row)) for row in stream]
+
+        stage = RollingFeatures(windows=(window,), stateful=True)
+        for reading in readings[:window]:  # fill the window first
+            stage.update("device", reading)
+        start = time.perf_counter()
+        for reading in readings[window:]:
+            stage.update("device", reading)
+        online = (time.perf_counter() - start) / args.readings
+
+        sample = min(args.readings, 2000)
+        start = time.perf_counter()
+        for i in range(window, window + sample):
+            recompute(stream[:i + 1], window)
+        naive = (time.perf_counter() - start) / sample
+
+        print(f"{window:>8} {online * 1e6:>20.2f} {naive * 1e6:>23.2f}")
+
+if __name__ == "__main__":
+    main()
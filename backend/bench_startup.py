@@ -0,0 +1,70 @@
+"""
+Benchmark: process start to first served request.
+
+Usage: python bench_startup.py [--repeat 3]
+
+Each mode runs in a fresh interpreter (so nothing is already imported) and
+reports the median over --repeat runs:
+  eager   create_app() then warm_up() before serving, like the old startup
+  lazy    APP_WARMUP=0: pandas, the pipeline and DynamoDB load on first use
+  warmup  the default: they load on a background thread while requests are served
+Times are seconds since the child started: `import app` done, create_app()
+returned, first GET /assets and POST /predict/batch answered, /ready is 200.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+MODES = ("eager", "lazy", "warmup")
+READING = {"deviceId": "ESP8266_IoT", "Temperature": 82.5, "Vibration": 2.1, "Power_Usage": 0.25,
+           "Humidity": 48.0, "Pressure": 31.0, "Machine_Type": "Type_B"}
+
+def child(mode):
+    start = time.perf_counter()
+    marks = {}
+    import app
+    marks["import"] = time.perf_counter() - start
+    app.create_app()
+    if mode == "eager":
+        app.warm_up()
+    marks["create_app"] = time.perf_counter() - start
+    client = app.app.test_client()
+    assert client.get('/assets').status_code == 200
+    marks["first /assets"] = time.perf_counter() - start
+    assert client.post('/predict/batch', json=[READING]).status_code == 200
+    marks["first /predict/batch"] = time.perf_counter() - start
+    while client.get('/ready').status_code != 200:
+        time.sleep(0.005)
+    marks["ready"] = time.perf_counter() - start
+    print(json.dumps(marks))
+
+def run(mode, workdir):
+    env = dict(os.environ, APP_WARMUP="0" if mode in ("eager", "lazy") else "1",
+               TIMESERIES_DB_PATH=os.path.join(workdir, f"{mode}.db"))
+    output = subprocess.run([sys.executable, __file__, "--child", mode], env=env,
+                            capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--child", choices=MODES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child(args.child)
+        return
+
+    with tempfile.TemporaryDirectory() as workdir:
+        results = {mode: [run(mode, workdir) for _ in range(args.repeat)] for mode in MODES}
+    marks = list(results["eager"][0])
+    print(f"{'seconds':<8}" + "".join(f"{mark:>22}" for mark in marks))
+    for mode, runs in results.items():
+        print(f"{mode:<8}" + "".join(f"{statistics.median(r[mark] for r in runs):>22.3f}" for mark in marks))
+
+if __name__ == "__main__":
+    main()
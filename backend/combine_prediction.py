@@ -1,5 +1,7 @@
+import os
 import joblib
 from sklearn.pipeline import Pipeline
+from model_registry import ModelRegistry
 
 # Load your already saved preprocessor and model.
 # Make sure these files are in the same folder as this script or provide the correct relative paths.
@@ -16,4 +18,10 @@ pipeline = Pipeline([
 
 # Save the combined pipeline as a single file.
 joblib.dump(pipeline, "pipeline.joblib")
-print("✅ Combined pipeline saved as pipeline.joblib")
\ No newline at end of file
+print("✅ Combined pipeline saved as pipeline.joblib")
+
+# Publish it as the next model registry version; running servers load it on their
+# next registry check (MODEL_WATCH_INTERVAL) or on POST /models/reload
+registry = ModelRegistry(os.getenv("MODEL_REGISTRY_DIR", "model_registry"))
+version = registry.publish("pipeline.joblib", built_by="combine_prediction.py")
+print(f"✅ Published pipeline.joblib as model version {version}")
\ No newline at end of file
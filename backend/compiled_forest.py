@@ -0,0 +1,104 @@
+import logging
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Array-backed scorer for a fitted sklearn RandomForestClassifier
+class CompiledForest:
+    """
+    Flat NumPy export of every tree in a fitted forest.
+
+    All trees are concatenated into one set of node arrays (feature, threshold,
+    left/right child, normalized leaf value) so a batch is scored with a single
+    vectorized walk instead of sklearn's per-call validation and thread dispatch.
+    predict/predict_proba reproduce RandomForestClassifier bit for bit.
+    """
+
+    def __init__(self, forest):
+        if getattr(forest, "n_outputs_", 1) != 1:
+            raise ValueError("CompiledForest only supports single-output classifiers")
+        if not hasattr(forest, "estimators_") or not hasattr(forest, "classes_"):
+            raise ValueError(f"Cannot compile {type(forest).__name__}: not a fitted forest classifier")
+
+        features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+        offset = 0
+        max_depth = 0
+        for estimator in forest.estimators_:
+            tree = estimator.tree_
+            node_ids = np.arange(tree.node_count)
+            is_leaf = tree.children_left == -1
+
+            # Leaves point at themselves so extra walk steps are no-ops
+            features.append(np.where(is_leaf, 0, tree.feature).astype(np.intp))
+            thresholds.append(tree.threshold.astype(np.float64))
+            lefts.append(np.where(is_leaf, node_ids, tree.children_left) + offset)
+            rights.append(np.where(is_leaf, node_ids, tree.children_right) + offset)
+
+            # Same normalization DecisionTreeClassifier.predict_proba applies per leaf
+            value = tree.value[:, 0, :forest.n_classes_].astype(np.float64)
+            normalizer = value.sum(axis=1)[:, np.newaxis]
+            normalizer[normalizer == 0.0] = 1.0
+            values.append(value / normalizer)
+
+            roots.append(offset)
+            offset += tree.node_count
+            max_depth = max(max_depth, tree.max_depth)
+
+        self.feature = np.concatenate(features)
+        self.threshold = np.concatenate(thresholds)
+        self.left = np.concatenate(lefts).astype(np.intp)
+        self.right = np.concatenate(rights).astype(np.intp)
+        self.value = np.concatenate(values)
+        self.roots = np.array(roots, dtype=np.intp)
+        self.max_depth = max_depth
+        self.classes_ = forest.classes_
+        self.n_features_in_ = forest.n_features_in_
+
+    @property
+    def n_estimators(self):
+        return len(self.roots)
+
+    def _check_input(self, X):
+        # sklearn evaluates splits on float32 inputs
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim != 2:
+            raise ValueError(f"Expected a 2D array, got {X.ndim}D input")
+        if X.shape[1] != self.n_features_in_:
+            raise ValueError(
+                f"X has {X.shape[1]} features, but CompiledForest is expecting "
+                f"{self.n_features_in_} features as input."
+            )
+        return X
+
+    def apply(self, X):
+        """Leaf node index (into the flat arrays) reached by each sample in each tree"""
+        X = self._check_input(X)
+        rows = np.arange(X.shape[0])[:, np.newaxis]
+        nodes = np.repeat(self.roots[np.newaxis, :], X.shape[0], axis=0)
+        for _ in range(self.max_depth):
+            go_left = X[rows, self.feature[nodes]] <= self.threshold[nodes]
+            nodes = np.where(go_left, self.left[nodes], self.right[nodes])
+        return nodes
+
+    def predict_proba(self, X):
+        leaves = self.apply(X)
+        proba = np.zeros((leaves.shape[0], len(self.classes_)), dtype=np.float64)
+        # Accumulate tree by tree, in estimator order, like the forest does
+        for tree_index in range(leaves.shape[1]):
+            proba += self.value[leaves[:, tree_index]]
+        proba /= self.n_estimators
+        return proba
+
+    def predict(self, X):
+        return self.classes_.take(np.argmax(self.predict_proba(X), axis=1), axis=0)
+
+# Compile the model step of a pipeline, or return None if it is not a supported forest
+def compile_model_step(model):
+    try:
+        compiled = CompiledForest(model)
+        logger.info(f"✅ Compiled {compiled.n_estimators} trees ({len(compiled.feature)} nodes) for array-backed inference")
+        return compiled
+    except Exception as e:
+        logger.warning(f"Could not compile model for array-backed inference: {str(e)}")
+        return None
@@ -0,0 +1,227 @@
+import logging
+import threading
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Largest integer category the one-hot lookup tables index directly
+MAX_LOOKUP_CATEGORY = 1 << 16
+
+def _scaler_ops(step):
+    """In-place (ufunc, vector) steps reproducing a fitted scaler's transform, in sklearn's order"""
+    name = type(step).__name__
+    if name == "StandardScaler":
+        ops = []
+        if step.with_mean:
+            ops.append((np.subtract, np.asarray(step.mean_, dtype=np.float64)))
+        if step.with_std:
+            ops.append((np.divide, np.asarray(step.scale_, dtype=np.float64)))
+        return ops
+    if name == "MinMaxScaler":
+        ops = [(np.multiply, np.asarray(step.scale_, dtype=np.float64)),
+               (np.add, np.asarray(step.min_, dtype=np.float64))]
+        if step.clip:
+            ops.append((np.clip, step.feature_range))
+        return ops
+    if name == "FunctionTransformer" and step.func is None:
+        return []  # what a fitted ColumnTransformer holds for 'passthrough'
+    raise ValueError(f"Cannot compile {name}")
+
+def _encoder_lookups(encoder):
+    """Per input column: lookup table from integer category to output offset (-1 unknown, -2 dropped)"""
+    if encoder.sparse_output or getattr(encoder, "_infrequent_enabled", False):
+        raise ValueError("Cannot compile a sparse or infrequent-category OneHotEncoder")
+    lookups, width = [], 0
+    for index, categories in enumerate(encoder.categories_):
+        categories = np.asarray(categories)
+        if (categories.dtype.kind not in "iuf" or not np.all(categories == np.round(categories))
+                or categories.min() < 0 or categories.max() >= MAX_LOOKUP_CATEGORY):
+            raise ValueError("Cannot compile a OneHotEncoder with non-integer categories")
+        dropped = encoder.drop_idx_[index] if encoder.drop_idx_ is not None else None
+        lookup = np.full(int(categories.max()) + 1, -1, dtype=np.intp)
+        for position, category in enumerate(categories.astype(np.intp)):
+            if position == dropped:
+                lookup[category] = -2
+            else:
+                lookup[category] = width
+                width += 1
+        lookups.append(lookup)
+    return lookups, width
+
+# NumPy-only replacement for a fitted ColumnTransformer of scalers and one-hot encoders
+class CompiledPreprocessor:
+    """
+    Compiled from a fitted ColumnTransformer whose transformers are
+    StandardScaler, MinMaxScaler, OneHotEncoder (integer categories, dense
+    output), 'passthrough' or Pipelines of those. Numeric blocks keep the
+    scalers' offset and scale vectors and apply them in sklearn's order, so
+    the output matches transform() bit for bit. Categorical columns go through
+    a lookup table from category to output column.
+
+    transform() reads the needed columns straight out of a DataFrame (or any
+    mapping of name -> array), with an optional row mask, into an output array
+    of dtype. Float64 scratch buffers are pooled between calls, and so are
+    output buffers for callers that hand them back (take_buffer/give_buffer).
+    float32 output is the float64 result rounded once, which is what tree
+    models would cast transform()'s output to anyway.
+    """
+
+    def __init__(self, transformer, dtype=np.float64, max_buffers=4):
+        if type(transformer).__name__ != "ColumnTransformer":
+            raise ValueError(f"Cannot compile {type(transformer).__name__}: not a ColumnTransformer")
+        if not hasattr(transformer, "transformers_") or not hasattr(transformer, "feature_names_in_"):
+            raise ValueError("Cannot compile a ColumnTransformer not fitted on named columns")
+        if getattr(transformer, "sparse_output_", False) or transformer.transformer_weights:
+            raise ValueError("Cannot compile a ColumnTransformer with sparse output or transformer weights")
+
+        names = list(transformer.feature_names_in_)
+        self.dtype = np.dtype(dtype)
+        self.numeric = []      # (input columns, output slice, in-place ops)
+        self.categorical = []  # (input column, lookup table, first output column, output slice, ignore unknown)
+        for name, step, columns in transformer.transformers_:
+            output = transformer.output_indices_[name]
+            if step == "drop" or output.start == output.stop:
+                continue
+            if isinstance(columns, str):
+                columns = [columns]
+            elif all(isinstance(column, (int, np.integer)) for column in columns):
+                columns = [names[column] for column in columns]
+            else:
+                columns = list(columns)
+            steps = [] if step == "passthrough" else [s for _, s in step.steps] if hasattr(step, "steps") else [step]
+            steps = [s for s in steps if s is not None and s != "passthrough"]
+
+            if steps and type(steps[-1]).__name__ == "OneHotEncoder":
+                if len(steps) > 1:
+                    raise ValueError(f"Cannot compile transformer {name!r}: steps before a OneHotEncoder")
+                lookups, width = _encoder_lookups(steps[-1])
+                if width != output.stop - output.start:
+                    raise ValueError(f"Cannot compile transformer {name!r}: {width} != {output.stop - output.start} outputs")
+                start = output.start
+                for column, lookup in zip(columns, lookups):
+                    width = int((lookup >= 0).sum())
+                    self.categorical.append((column, lookup, start, slice(start, start + width),
+                                             steps[-1].handle_unknown != "error"))
+                    start += width
+            else:
+                ops = [op for s in steps for op in _scaler_ops(s)]
+                if len(columns) != output.stop - output.start:
+                    raise ValueError(f"Cannot compile transformer {name!r}: outputs don't match its columns")
+                self.numeric.append((columns, output, ops))
+
+        self.n_features_out = sum(output.stop - output.start for _, output, _ in self.numeric) + \
+            sum(output.stop - output.start for _, _, _, output, _ in self.categorical)
+        self.n_scratch = max((len(columns) for columns, _, _ in self.numeric), default=0)
+        self.max_buffers = max_buffers
+        self._lock = threading.Lock()
+        self._outputs = []
+        self._scratch = []
+
+    def _take(self, pool, rows, width, dtype):
+        with self._lock:
+            buffer = pool.pop() if pool else None
+        if buffer is None or len(buffer) < rows:
+            # Round up so a slowly growing batch size doesn't reallocate every call
+            buffer = np.empty((1 << max(rows - 1, 63).bit_length(), width), dtype=dtype)
+        return buffer
+
+    def _give(self, pool, buffer):
+        with self._lock:
+            if len(pool) < self.max_buffers:
+                pool.append(buffer)
+
+    def take_buffer(self, rows):
+        """A pooled output buffer with room for rows rows; hand it back with give_buffer() once done with it"""
+        return self._take(self._outputs, rows, self.n_features_out, self.dtype)
+
+    def give_buffer(self, buffer):
+        self._give(self._outputs, buffer)
+
+    def transform(self, frame, rows=None, out=None):
+        """
+        Features for frame (or its rows where the boolean mask rows is True),
+        as transformer.transform would return them, in dtype. With out, they are
+        written to its first rows and that view is returned.
+        """
+        if rows is not None and rows.all():
+            rows = None
+        count = len(frame) if rows is None else int(np.count_nonzero(rows))
+        if out is None:
+            out = np.empty((count, self.n_features_out), dtype=self.dtype)
+        else:
+            out = out[:count]
+
+        scratch = self._take(self._scratch, count, self.n_scratch, np.float64)
+        try:
+            for columns, output, ops in self.numeric:
+                block = scratch[:count, :len(columns)]
+                for j, column in enumerate(columns):
+                    values = np.asarray(frame[column])
+                    if rows is None:
+                        block[:, j] = values
+                    elif values.dtype == np.float64:
+                        np.compress(rows, values, out=block[:, j])
+                    else:
+                        block[:, j] = values[rows]  # compress() won't write other dtypes into float64
+                for op, vector in ops:
+                    if op is np.clip:
+                        np.clip(block, vector[0], vector[1], out=block)
+                    else:
+                        op(block, vector, out=block)
+                out[:, output] = block
+
+            for column, lookup, start, output, ignore_unknown in self.categorical:
+                values = np.asarray(frame[column]) if rows is None else np.asarray(frame[column])[rows]
+                known = (values >= 0) & (values < len(lookup))
+                if values.dtype.kind == "f":
+                    known &= values == np.floor(values)
+                offsets = np.full(count, -1, dtype=np.intp)
+                offsets[known] = lookup[values[known].astype(np.intp)]
+                if not ignore_unknown and (offsets == -1).any():
+                    unknown = np.unique(values[offsets == -1]).tolist()
+                    raise ValueError(f"Found unknown categories {unknown} in column {column!r} during transform")
+                out[:, output] = 0
+                hot = np.flatnonzero(offsets >= 0)
+                out[hot, start + offsets[hot]] = 1
+        except KeyError as e:
+            raise ValueError(f"Column {e} is missing from the input") from None
+        finally:
+            self._give(self._scratch, scratch)
+        return out
+
+# Compile a pipeline's preprocessing, or return None if it is not a supported ColumnTransformer
+def compile_preprocessor(steps, sample, dtype=np.float64):
+    """
+    CompiledPreprocessor for steps (a pipeline's preprocessing_steps), checked
+    against the fitted transformer on the sample frame; None if that isn't
+    possible or the outputs differ.
+    """
+    try:
+        if len(steps) != 1:
+            raise ValueError(f"Cannot compile {len(steps)} preprocessing steps")
+        compiled = CompiledPreprocessor(steps[0], dtype=dtype)
+        expected = steps[0].transform(sample)
+        if not isinstance(expected, np.ndarray):
+            raise ValueError(f"Cannot compile a transformer that returns {type(expected).__name__}")
+        if not np.array_equal(compiled.transform(sample), expected.astype(compiled.dtype)):
+            raise ValueError("Compiled features differ from the transformer's")
+        logger.info(f"✅ Compiled preprocessing into {compiled.n_features_out} {compiled.dtype} features")
+        return compiled
+    except Exception as e:
+        logger.warning(f"Could not compile preprocessing, using the fitted transformer: {str(e)}")
+        return None
+
+def model_input_dtype(model):
+    """float32 for models made of sklearn trees, which cast their input to float32 anyway; float64 otherwise"""
+    from compiled_forest import CompiledForest
+    if isinstance(model, CompiledForest):
+        return np.float32
+    try:
+        from sklearn.tree import BaseDecisionTree
+    except ImportError:
+        return np.float64
+    estimators = np.ravel(np.asarray(getattr(model, "estimators_", [model]), dtype=object))
+    if len(estimators) and all(isinstance(estimator, BaseDecisionTree) for estimator in estimators):
+        return np.float32
+    return np.float64
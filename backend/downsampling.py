@@ -0,0 +1,79 @@
+"""
+Vectorized downsampling of sensor series for charts.
+
+lttb() picks representative readings (Largest-Triangle-Three-Buckets) so the
+shape of the curve survives; bucket_aggregate() summarises fixed time buckets
+as count/min/max/mean so no spike is lost. Both take NumPy arrays sorted by time.
+"""
+import numpy as np
+
+def lttb(x, y, threshold):
+    """
+    Indices of `threshold` points chosen by Largest-Triangle-Three-Buckets.
+
+    y may have several channels (shape (n, channels)); each is scaled to [0, 1]
+    and a point's score is the sum of its triangle areas over all channels, so
+    one set of timestamps serves every channel. First and last points are kept.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    # Channels-first, so each bucket's per-channel areas sum along contiguous rows
+    y = np.asarray(y, dtype=np.float64).reshape(n, -1).T
+    low, high = y.min(axis=1), y.max(axis=1)
+    if np.isnan(low).any() or np.isnan(high).any():
+        with np.errstate(invalid="ignore"):
+            low, high = np.nanmin(y, axis=1), np.nanmax(y, axis=1)
+        y = np.where(np.isnan(y), low[:, None], y)
+    y = np.ascontiguousarray((y - low[:, None]) / np.where(high > low, high - low, 1.0)[:, None])
+    x = (x - x[0]) / max(x[-1] - x[0], 1e-12)
+
+    # Points 1..n-2 split into threshold - 2 buckets; bucket i is edges[i]:edges[i + 1]
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    sizes = np.diff(edges)
+    mean_x = np.add.reduceat(x[:n - 1], edges[:-1]) / sizes
+    mean_y = np.add.reduceat(y[:, :n - 1], edges[:-1], axis=1) / sizes
+    # The third triangle corner is the next bucket's mean point (the last point for the final bucket)
+    next_x = np.append(mean_x[1:], x[-1])
+    next_y = np.hstack((mean_y[:, 1:], y[:, -1:]))
+
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    previous = 0
+    for i in range(threshold - 2):
+        lo, hi = edges[i], edges[i + 1]
+        px, py = x[previous], y[:, previous:previous + 1]
+        areas = np.abs((px - next_x[i]) * (y[:, lo:hi] - py) - (px - x[lo:hi]) * (next_y[:, i:i + 1] - py))
+        previous = lo + int(np.argmax(areas.sum(axis=0)))
+        selected[i + 1] = previous
+    return selected
+
+def bucket_aggregate(x, count, mins, maxs, means, start, end, buckets):
+    """
+    Combine rows into `buckets` equal time buckets over [start, end).
+
+    Rows may be raw readings (count 1, min = max = mean) or rollups; means are
+    weighted by count and NaN values are ignored. Returns (bucket start times,
+    count, min, max, mean) for the non-empty buckets only.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    if len(x) == 0:
+        empty = np.empty((0, np.shape(means)[1] if np.ndim(means) == 2 else 0))
+        return np.empty(0), np.empty(0), empty, empty, empty
+
+    width = (end - start) / buckets
+    index = np.clip(((x - start) // width).astype(np.int64), 0, buckets - 1)
+    firsts = np.flatnonzero(np.r_[True, index[1:] != index[:-1]])
+
+    count = np.asarray(count, dtype=np.float64)
+    weights = np.where(np.isnan(means), 0.0, count[:, None])
+    sums = np.add.reduceat(np.nan_to_num(means) * weights, firsts, axis=0)
+    totals = np.add.reduceat(weights, firsts, axis=0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = sums / totals
+    return (start + index[firsts] * width,
+            np.add.reduceat(count, firsts),
+            np.fmin.reduceat(mins, firsts, axis=0),
+            np.fmax.reduceat(maxs, firsts, axis=0),
+            mean)
@@ -0,0 +1,163 @@
+"""
+Bulk decoding of IoT_Sensor_Data items into NumPy columns.
+
+The boto3 Table resource runs every attribute of every item through
+TypeDeserializer, building one Decimal per number, and callers then convert
+each back to float. At history scale that is most of the request. query_wire()
+goes through the low-level client instead, so items stay in the DynamoDB
+wire format ({"Temperature": {"N": "71.5"}}). ReadingColumns.from_wire()
+then parses each sensor attribute of a whole page with one NumPy call.
+"""
+import numpy as np
+
+from lazy import LazyModule
+from scoring import DEFAULT_MACHINE_TYPE, FEATURE_COLUMNS, KEY_COLUMNS, SENSOR_DEFAULTS, get_machine_type_code
+
+pd = LazyModule("pandas")
+
+SENSOR_ATTRIBUTES = list(SENSOR_DEFAULTS)
+
+def _to_float(value):
+    """float() that maps unparseable sensor values to NaN instead of raising"""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+def _wire_float(value):
+    """Float of one wire-format attribute value; NaN if it is absent or not a number"""
+    if value is None:
+        return np.nan
+    if "N" in value:
+        return float(value["N"])
+    return _to_float(value.get("S"))  # numbers written as strings still parse, like float(item[...])
+
+def _wire_string(value):
+    return value.get("S") if value is not None else None
+
+def query_wire(table, KeyConditionExpression, **query_args):
+    """
+    table.query() through the table's low-level client, skipping the resource
+    layer's deserializer: Items and LastEvaluatedKey stay in the wire format
+    (pass LastEvaluatedKey back as ExclusiveStartKey unchanged). In-memory
+    tables such as StubTable provide query_wire themselves.
+    """
+    if hasattr(table, "query_wire"):
+        return table.query_wire(KeyConditionExpression=KeyConditionExpression, **query_args)
+    from boto3.dynamodb.conditions import ConditionExpressionBuilder
+    from boto3.dynamodb.types import TypeSerializer
+
+    expression = ConditionExpressionBuilder().build_expression(KeyConditionExpression, is_key_condition=True)
+    serializer = TypeSerializer()
+    return table.meta.client.query(
+        TableName=table.name,
+        KeyConditionExpression=expression.condition_expression,
+        ExpressionAttributeNames=expression.attribute_name_placeholders,
+        ExpressionAttributeValues={placeholder: serializer.serialize(value)
+                                   for placeholder, value in expression.attribute_value_placeholders.items()},
+        **query_args)
+
+# Sensor readings as columns rather than one dict per item
+class ReadingColumns:
+    """
+    deviceId, timestamp and Machine_Type as lists (None where absent), and per
+    sensor attribute a float64 array (NaN where the value is absent or not a
+    number) with a mask of the readings that lack it (None if none do).
+    Callers fill in their own defaults with column().
+    """
+
+    def __init__(self, device_ids, timestamps, machine_types, values, absent):
+        self.device_ids = device_ids
+        self.timestamps = timestamps
+        self.machine_types = machine_types
+        self.values = values
+        self.absent = absent
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    @classmethod
+    def from_items(cls, items):
+        """Decode resource-layer items (Decimal numbers), as the Table resource returns them"""
+        count = len(items)
+        values, absent = {}, {}
+        for name in SENSOR_ATTRIBUTES:
+            try:
+                values[name] = np.fromiter((item[name] for item in items), dtype=np.float64, count=count)
+                absent[name] = None
+            except (KeyError, TypeError, ValueError):
+                # Some readings lack the attribute or hold a non-number: decode those one by one
+                values[name] = np.fromiter((_to_float(item.get(name)) for item in items), dtype=np.float64,
+                                           count=count)
+                absent[name] = np.fromiter((name not in item for item in items), dtype=bool, count=count)
+        return cls([item.get("deviceId") for item in items], [item.get("timestamp") for item in items],
+                   [item.get("Machine_Type") for item in items], values, absent)
+
+    @classmethod
+    def from_wire(cls, items):
+        """Decode wire-format items, as query_wire() returns them"""
+        count = len(items)
+        values, absent = {}, {}
+        for name in SENSOR_ATTRIBUTES:
+            try:
+                # One C-level parse of the page's number strings
+                values[name] = np.array([item[name]["N"] for item in items], dtype=np.float64)
+                absent[name] = None
+            except (KeyError, TypeError, ValueError):
+                values[name] = np.fromiter((_wire_float(item.get(name)) for item in items), dtype=np.float64,
+                                           count=count)
+                absent[name] = np.fromiter((name not in item for item in items), dtype=bool, count=count)
+        strings = {}
+        for name in ("deviceId", "timestamp", "Machine_Type"):
+            try:
+                strings[name] = [item[name]["S"] for item in items]
+            except (KeyError, TypeError):
+                strings[name] = [_wire_string(item.get(name)) for item in items]
+        return cls(strings["deviceId"], strings["timestamp"], strings["Machine_Type"], values, absent)
+
+    @classmethod
+    def concat(cls, parts):
+        """One ReadingColumns holding every part's readings, in order"""
+        parts = list(parts)
+        if len(parts) == 1:
+            return parts[0]
+        counts = [len(part) for part in parts]
+        values, absent = {}, {}
+        for name in SENSOR_ATTRIBUTES:
+            values[name] = np.concatenate([part.values[name] for part in parts]) if parts else np.empty(0)
+            masks = [part.absent[name] for part in parts]
+            absent[name] = None if all(mask is None for mask in masks) else np.concatenate(
+                [mask if mask is not None else np.zeros(count, dtype=bool) for mask, count in zip(masks, counts)])
+        return cls([device_id for part in parts for device_id in part.device_ids],
+                   [timestamp for part in parts for timestamp in part.timestamps],
+                   [machine_type for part in parts for machine_type in part.machine_types], values, absent)
+
+    def take(self, indices):
+        """The readings at indices (a list of positions), in that order"""
+        indices = list(indices)
+        return ReadingColumns(
+            [self.device_ids[i] for i in indices], [self.timestamps[i] for i in indices],
+            [self.machine_types[i] for i in indices],
+            {name: values[indices] for name, values in self.values.items()},
+            {name: mask[indices] if mask is not None else None for name, mask in self.absent.items()})
+
+    def newest_first(self):
+        """Sorted by timestamp, newest first; readings with equal timestamps keep their order"""
+        return self.take(sorted(range(len(self)), key=lambda i: self.timestamps[i] or "", reverse=True))
+
+    def column(self, name, default):
+        """float64 values of a sensor attribute, with default where a reading lacks it"""
+        mask = self.absent[name]
+        if mask is None or not mask.any():
+            return self.values[name]
+        return np.where(mask, default, self.values[name])
+
+    def to_frame(self):
+        """The model input: FEATURE_COLUMNS + KEY_COLUMNS, with SENSOR_DEFAULTS filled in like items_to_frame()"""
+        columns = {name: self.column(name, default) for name, default in SENSOR_DEFAULTS.items()}
+        columns["Machine_Type_Code"] = np.fromiter(
+            (get_machine_type_code(DEFAULT_MACHINE_TYPE if machine_type is None else machine_type)
+             for machine_type in self.machine_types), dtype=np.int64, count=len(self))
+        columns["deviceId"] = self.device_ids
+        columns["timestamp"] = self.timestamps
+        return pd.DataFrame(columns, columns=FEATURE_COLUMNS + KEY_COLUMNS)
@@ -0,0 +1,38 @@
+"""
+Production server settings.
+
+Usage (from backend/):
+    gunicorn -c gunicorn.conf.py "app:create_app()"
+
+preload_app runs create_app() once in the master, which starts the warm-up
+thread; pre_fork waits for it, so the pipeline is loaded a single time and
+shared copy-on-write by every forked worker. post_fork then gives each worker
+its own boto3 connection pool and SQLite handle, warms the pool up and starts
+the worker's model registry watcher (never started in the master). gthread
+workers keep long-lived /stream/predictions connections from blocking other
+requests (each open stream holds one thread).
+"""
+import gc
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.getenv('FLASK_PORT', 5000)}"
+workers = int(os.getenv("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+worker_class = "gthread"
+threads = int(os.getenv("GUNICORN_THREADS", 8))
+preload_app = True
+timeout = 60
+keepalive = 5
+
+def pre_fork(server, worker):
+    # No thread may be mid-load at fork(): only the forking thread survives in the child
+    import app
+    app.finish_warmup()
+    # Move everything loaded so far out of the collector's reach, so GC passes in
+    # the workers don't write to (and un-share) the preloaded pipeline's pages
+    gc.freeze()
+
+def post_fork(server, worker):
+    import app
+    app.init_worker()
+    app.start_model_watcher()
@@ -0,0 +1,142 @@
+import logging
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Bounded queue of posted readings, drained by one worker thread in micro-batches
+class MicroBatcher:
+    """
+    put() queues a chunk of rows (anything with len(), e.g. ReadingColumns)
+    and returns at once. A worker thread hands queued chunks to
+    handle(chunks) in micro-batches of about batch_size rows. It flushes a
+    smaller batch once the oldest queued chunk has waited max_wait seconds.
+    Chunks are never split, so one larger than batch_size is its own batch.
+
+    At most max_rows rows wait in the queue. put() refuses a chunk that
+    doesn't fit, so a burst faster than the worker can score is pushed back
+    to clients (who retry) instead of growing memory.
+
+    handle() may return how many of the rows it was given it refused; those
+    move from the accepted to the rejected count, as do rows counted with reject().
+    """
+
+    def __init__(self, handle, batch_size=256, max_wait=0.02, max_rows=10000, name="micro-batcher"):
+        self.handle = handle
+        self.batch_size = batch_size
+        self.max_wait = max_wait
+        self.max_rows = max_rows
+        self.name = name
+        self._chunks = deque()  # (monotonic time queued, chunk), oldest first
+        self._rows = 0
+        self._busy = False
+        self._condition = threading.Condition()
+        self._thread = None
+        self._latencies = deque(maxlen=10000)  # seconds from put() to handled, per chunk
+        self.accepted = 0
+        self.rejected = 0
+        self.batches = 0
+        self.batch_rows = 0
+        self.flushes = {"size": 0, "deadline": 0}
+        self.errors = 0
+
+    def put(self, chunk):
+        """Queue chunk for the worker; False if the queue has no room for it"""
+        rows = len(chunk)
+        with self._condition:
+            if self._rows + rows > self.max_rows:
+                self.rejected += rows
+                return False
+            self._chunks.append((time.monotonic(), chunk))
+            self._rows += rows
+            self.accepted += rows
+            self._condition.notify()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+        return True
+
+    def reject(self, rows):
+        """Count rows refused before reaching put()"""
+        with self._condition:
+            self.rejected += rows
+
+    def queued_rows(self):
+        with self._condition:
+            return self._rows
+
+    def _next_batch(self):
+        """Wait for a full batch or the oldest chunk's deadline; returns (batch, rows, reason)"""
+        with self._condition:
+            while not self._chunks:
+                self._condition.wait()
+            deadline = self._chunks[0][0] + self.max_wait
+            while self._rows < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._condition.wait(remaining)
+            reason = "size" if self._rows >= self.batch_size else "deadline"
+            batch, rows = [], 0
+            while self._chunks and rows < self.batch_size:
+                queued_at, chunk = self._chunks.popleft()
+                batch.append((queued_at, chunk))
+                rows += len(chunk)
+            self._rows -= rows
+            self._busy = True
+        return batch, rows, reason
+
+    def _run(self):
+        while True:
+            batch, rows, reason = self._next_batch()
+            refused = 0
+            try:
+                refused = int(self.handle([chunk for _, chunk in batch]) or 0)
+            except Exception as e:
+                logger.error(f"Error handling a micro-batch of {rows} rows: {str(e)}")
+                with self._condition:
+                    self.errors += 1
+            done = time.monotonic()
+            with self._condition:
+                self._latencies.extend(done - queued_at for queued_at, _ in batch)
+                self.accepted -= refused
+                self.rejected += refused
+                self.batches += 1
+                self.batch_rows += rows
+                self.flushes[reason] += 1
+                self._busy = False
+                self._condition.notify_all()
+
+    def drain(self, timeout=None):
+        """Wait until every queued chunk has been handled; False on timeout"""
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        with self._condition:
+            while self._chunks or self._busy:
+                remaining = deadline - time.monotonic() if deadline is not None else None
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._condition.wait(remaining)
+        return True
+
+    def stats(self):
+        with self._condition:
+            latencies = np.array(self._latencies) * 1000
+            return {
+                "queued_rows": self._rows,
+                "max_rows": self.max_rows,
+                "batch_size": self.batch_size,
+                "max_wait_ms": self.max_wait * 1000,
+                "accepted": self.accepted,
+                "rejected": self.rejected,
+                "batches": self.batches,
+                "handled_rows": self.batch_rows,
+                "mean_batch_rows": round(self.batch_rows / self.batches, 1) if self.batches else None,
+                "flushes": dict(self.flushes),
+                "errors": self.errors,
+                # Time from put() until the chunk's batch was handled, over the most recent chunks
+                "latency_ms": {f"p{q}": round(float(np.percentile(latencies, q)), 3) for q in (50, 95, 99)}
+                              if len(latencies) else None,
+            }
@@ -0,0 +1,95 @@
+import importlib
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Stand-in for `import name` that defers the import to first attribute access
+class LazyModule:
+    """
+    `pd = LazyModule("pandas")` binds pd without importing pandas; the first
+    pd.<attr> lookup imports it (under the interpreter's import lock, so
+    concurrent first uses are safe) and later lookups go straight to the module.
+    """
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def load(self):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return self._module
+
+    def __getattr__(self, attr):
+        return getattr(self.load(), attr)
+
+# Heavy object built once, on first use or ahead of time by a warm-up thread
+class LazyResource:
+    """
+    get() runs loader() on the first call and returns the cached result after
+    that; callers arriving while a load is in progress wait for it rather than
+    loading twice. A loader that raises leaves the resource "failed" with value
+    None. status() reports state (cold/loading/ready/failed) and load time.
+    """
+
+    def __init__(self, name, loader):
+        self.name = name
+        self._loader = loader
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._value = None
+        self.state = "cold"
+        self.seconds = None
+        self.error = None
+
+    def get(self):
+        if self._loaded:
+            return self._value
+        with self._lock:
+            if not self._loaded:
+                self.state = "loading"
+                start = time.perf_counter()
+                try:
+                    self._value = self._loader()
+                    self.state = "ready"
+                except Exception as e:
+                    logger.warning(f"Could not load {self.name}: {str(e)}")
+                    self._value = None
+                    self.error = str(e)
+                    self.state = "failed"
+                self.seconds = round(time.perf_counter() - start, 3)
+                self._loaded = True
+        return self._value
+
+    def set(self, value):
+        """Use value as if loader() had returned it (e.g. a stub in scripts)"""
+        with self._lock:
+            self._value = value
+            self._loaded = True
+            self.state = "ready"
+            self.seconds = 0.0
+            self.error = None
+
+    def reset(self):
+        """Forget the loaded value so the next get() loads again"""
+        with self._lock:
+            self._loaded = False
+            self._value = None
+            self.state = "cold"
+            self.seconds = None
+            self.error = None
+
+    def status(self):
+        return {"state": self.state, "seconds": self.seconds, "error": self.error}
+
+def start_warmup(resources, name="warmup"):
+    """Load resources one after another on a daemon thread; returns the thread"""
+    def warm():
+        for resource in resources:
+            resource.get()
+
+    thread = threading.Thread(target=warm, name=name, daemon=True)
+    thread.start()
+    return thread
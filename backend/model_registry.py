@@ -0,0 +1,185 @@
+"""
+Versioned pipeline artifacts on disk.
+
+    <root>/v1/pipeline.joblib
+    <root>/v1/metadata.json    version, created, source, sha256, size_bytes, plus publish() extras
+    <root>/v2/...
+    <root>/ACTIVE              version the servers should run (the newest when absent)
+
+Versions are never modified after publish(), so any earlier one stays
+available for rollback. Servers pick up a changed ACTIVE on /models/reload or
+from their registry watcher.
+
+Usage:
+    python model_registry.py publish pipeline.joblib [--note "retrained on May data"]
+    python model_registry.py list
+    python model_registry.py activate v2
+"""
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+ARTIFACT_NAME = "pipeline.joblib"
+METADATA_NAME = "metadata.json"
+ACTIVE_NAME = "ACTIVE"
+
+def _version_number(version):
+    return int(version[1:])
+
+class ModelRegistry:
+    def __init__(self, root):
+        self.root = root
+
+    def versions(self):
+        """Published versions, oldest first"""
+        try:
+            names = os.listdir(self.root)
+        except FileNotFoundError:
+            return []
+        versions = [name for name in names if name[:1] == "v" and name[1:].isdigit()
+                    and os.path.exists(os.path.join(self.root, name, METADATA_NAME))]
+        return sorted(versions, key=_version_number)
+
+    def latest(self):
+        versions = self.versions()
+        return versions[-1] if versions else None
+
+    def artifact_path(self, version):
+        return os.path.join(self.root, version, ARTIFACT_NAME)
+
+    def metadata(self, version):
+        with open(os.path.join(self.root, version, METADATA_NAME)) as f:
+            return json.load(f)
+
+    def publish(self, source_path, **extra):
+        """Copy a pipeline file in as the next version; returns the new version name"""
+        os.makedirs(self.root, exist_ok=True)
+        staging = tempfile.mkdtemp(prefix=".publish-", dir=self.root)
+        try:
+            artifact = os.path.join(staging, ARTIFACT_NAME)
+            shutil.copyfile(source_path, artifact)
+            digest = hashlib.sha256()
+            with open(artifact, "rb") as f:
+                for block in iter(lambda: f.read(1 << 20), b""):
+                    digest.update(block)
+            metadata = {
+                "created": datetime.now().isoformat(timespec="seconds"),
+                "source": os.path.abspath(source_path),
+                "sha256": digest.hexdigest(),
+                "size_bytes": os.path.getsize(artifact),
+                **extra
+            }
+            # Renaming the finished directory into place makes the version appear
+            # all at once; if another publisher took the number, try the next one
+            while True:
+                latest = self.latest()
+                version = f"v{_version_number(latest) + 1 if latest else 1}"
+                with open(os.path.join(staging, METADATA_NAME), "w") as f:
+                    json.dump({"version": version, **metadata}, f, indent=2)
+                try:
+                    os.rename(staging, os.path.join(self.root, version))
+                    return version
+                except OSError:
+                    if not os.path.exists(os.path.join(self.root, version)):
+                        raise
+                    time.sleep(0.01)
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+
+    def active_version(self):
+        """The version named in ACTIVE, or the newest one; None for an empty registry"""
+        try:
+            with open(os.path.join(self.root, ACTIVE_NAME)) as f:
+                version = f.read().strip()
+            if version in self.versions():
+                return version
+        except FileNotFoundError:
+            pass
+        return self.latest()
+
+    def set_active(self, version):
+        if version not in self.versions():
+            raise KeyError(f"Unknown model version: {version}")
+        path = os.path.join(self.root, ACTIVE_NAME)
+        with open(path + ".tmp", "w") as f:
+            f.write(version)
+        os.replace(path + ".tmp", path)
+
+# One loaded, validated and warmed registry version
+class LoadedModel:
+    """
+    Everything a request needs to score with one version. Requests take a
+    reference to the active LoadedModel and use only that, so swapping in
+    another version never mixes one version's pipeline with another's compiled model.
+    """
+
+    def __init__(self, version, pipeline, compiled_model=None, path=None, metadata=None, compiled_preprocessor=None):
+        self.version = version
+        self.pipeline = pipeline
+        self.compiled_model = compiled_model
+        self.compiled_preprocessor = compiled_preprocessor
+        self.path = path
+        self.metadata = metadata or {}
+        self.loaded_at = datetime.now().isoformat(timespec="seconds")
+        self.load_seconds = None
+        self.warm_seconds = None
+        # Hash of the fitted preprocessing steps; equal keys mean identical transformed features
+        self.preprocessor_key = None
+        # True when a reading's features depend on the other readings scored with it (RollingFeatures)
+        self.windowed = False
+        # For windowed models: the pipeline with stateful copies of those stages, which polled and ingested
+        # readings advance under window_lock, and how many earlier readings fill its longest window
+        self.streaming_pipeline = None
+        self.window_context = 0
+        self.window_lock = threading.Lock()
+
+    def info(self):
+        return {
+            "version": self.version,
+            "path": self.path,
+            "loaded_at": self.loaded_at,
+            "load_seconds": self.load_seconds,
+            "warm_seconds": self.warm_seconds,
+            "inference_engine": "compiled" if self.compiled_model is not None else "sklearn",
+            "preprocessing": "compiled" if self.compiled_preprocessor is not None else "sklearn",
+            "windowed": self.windowed,
+            "metadata": self.metadata
+        }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--root", default=os.getenv("MODEL_REGISTRY_DIR", "model_registry"))
+    commands = parser.add_subparsers(dest="command", required=True)
+    publish = commands.add_parser("publish", help="add a pipeline file as the next version")
+    publish.add_argument("path")
+    publish.add_argument("--note")
+    publish.add_argument("--activate", action="store_true", help="also make it the ACTIVE version")
+    commands.add_parser("list", help="show every version, marking the active one")
+    activate = commands.add_parser("activate", help="point ACTIVE at a version (rollback or pin)")
+    activate.add_argument("version")
+    args = parser.parse_args()
+
+    registry = ModelRegistry(args.root)
+    if args.command == "publish":
+        version = registry.publish(args.path, **({"note": args.note} if args.note else {}))
+        if args.activate:
+            registry.set_active(version)
+        print(f"✅ Published {args.path} as {version}")
+    elif args.command == "activate":
+        registry.set_active(args.version)
+        print(f"✅ {args.version} is now the active version")
+    else:
+        active = registry.active_version()
+        for version in registry.versions():
+            metadata = registry.metadata(version)
+            marker = "*" if version == active else " "
+            print(f"{marker} {version:<6} {metadata['created']}  {metadata['sha256'][:12]}  {metadata.get('note', '')}")
+
+if __name__ == "__main__":
+    main()
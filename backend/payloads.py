@@ -0,0 +1,170 @@
+import io
+import json
+from decimal import Decimal
+
+import numpy as np
+from flask.json.provider import DefaultJSONProvider
+
+from lazy import LazyModule
+
+try:
+    import orjson
+except ImportError:  # stdlib json is used instead, several times slower on large responses
+    orjson = None
+try:
+    import msgpack
+except ImportError:  # ?format=msgpack is rejected without it
+    msgpack = None
+
+pd = LazyModule("pandas")
+
+NDJSON_MIMETYPES = ("application/x-ndjson", "application/ndjson", "application/jsonl", "application/x-jsonlines")
+CSV_MIMETYPES = ("text/csv", "application/csv")
+
+# Response formats for ?format=: json is one object per row, the others one array per field
+RESPONSE_MIMETYPES = {
+    "json": "application/json",
+    "columnar": "application/json",
+    "msgpack": "application/msgpack",
+    "arrow": "application/vnd.apache.arrow.stream",
+}
+ACCEPT_FORMATS = {"application/msgpack": "msgpack", "application/x-msgpack": "msgpack",
+                  "application/vnd.apache.arrow.stream": "arrow"}
+
+def _default(value):
+    """Encode what orjson/json can't natively: NumPy values, Decimal (from boto3), then Flask's types"""
+    if isinstance(value, np.ndarray):
+        return _column_list(value)
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, Decimal):
+        return float(value)
+    return DefaultJSONProvider.default(value)
+
+def dumps(obj, sort_keys=False):
+    """Compact JSON bytes; NumPy arrays are encoded directly and NaN becomes null"""
+    if orjson is not None:
+        option = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+        if sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        return orjson.dumps(obj, default=_default, option=option)
+    return json.dumps(obj, default=_default, sort_keys=sort_keys, separators=(",", ":")).encode()
+
+# jsonify() through dumps(), so every JSON response gets the fast encoder
+class FastJSONProvider(DefaultJSONProvider):
+    def dumps(self, obj, **kwargs):
+        return dumps(obj, sort_keys=kwargs.get("sort_keys", self.sort_keys)).decode()
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(dumps(obj, sort_keys=self.sort_keys), mimetype=self.mimetype)
+
+def negotiate_format(requested, accept_mimetypes):
+    """
+    Response format from ?format= or else the Accept header (default json).
+    Raises ValueError for an unknown format or one whose package is missing.
+    """
+    fmt = requested
+    if not fmt:
+        best = accept_mimetypes.best_match(list(ACCEPT_FORMATS) + ["application/json"])
+        fmt = ACCEPT_FORMATS.get(best, "json")
+    if fmt not in RESPONSE_MIMETYPES:
+        raise ValueError(f"format must be one of {', '.join(RESPONSE_MIMETYPES)}")
+    if fmt == "msgpack" and msgpack is None:
+        raise ValueError("format=msgpack needs the msgpack package")
+    return fmt
+
+def _column_list(values):
+    """Column values as a list, with NaN in float arrays as None"""
+    if not isinstance(values, np.ndarray):
+        return list(values)
+    if values.dtype.kind == "f":
+        missing = np.isnan(values)
+        if missing.any():
+            return np.where(missing, None, values).tolist()
+    return values.tolist()
+
+def rows_to_columns(rows):
+    """[{field: value}, ...] -> {field: [values]}, over the union of fields (missing ones are None)"""
+    fields = list(dict.fromkeys(field for row in rows for field in row))
+    return {field: [row.get(field) for row in rows] for field in fields}
+
+def columns_to_rows(columns):
+    """{field: values} -> [{field: value}, ...], the json format"""
+    fields = list(columns)
+    return [dict(zip(fields, values)) for values in zip(*(_column_list(values) for values in columns.values()))]
+
+def _arrow_array(pa, values):
+    array = pa.array(values, from_pandas=True)  # NaN -> null
+    # Fields like device_id repeat a few strings: ship each once
+    if pa.types.is_string(array.type) and 2 * len(array.unique()) <= len(array):
+        array = array.dictionary_encode()
+    return array
+
+# Encode a dict of equal-length columns (lists or NumPy arrays) in a columnar format
+def encode_columns(columns, fmt, metadata=None):
+    """
+    (body bytes, mimetype). With metadata (a dict), columnar/msgpack bodies are
+    metadata plus "points": columns, and Arrow streams carry it as JSON-encoded
+    schema metadata. Missing values are null in every format.
+    """
+    if fmt == "arrow":
+        import pyarrow as pa
+
+        table = pa.table({name: _arrow_array(pa, values) for name, values in columns.items()})
+        if metadata:
+            table = table.replace_schema_metadata({key: dumps(value) for key, value in metadata.items()})
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        return sink.getvalue().to_pybytes(), RESPONSE_MIMETYPES[fmt]
+
+    if fmt == "msgpack":
+        columns = {name: _column_list(values) for name, values in columns.items()}
+    body = columns if metadata is None else dict(metadata, points=columns)
+    if fmt == "msgpack":
+        return msgpack.packb(body, default=_default), RESPONSE_MIMETYPES[fmt]
+    return dumps(body), RESPONSE_MIMETYPES[fmt]
+
+# Parse a posted body of sensor readings into a DataFrame
+def parse_readings(body, content_type):
+    """
+    Parse a JSON array, NDJSON or CSV request body.
+
+    Returns (readings DataFrame, format name). A JSON object of the form
+    {"readings": [...]} is accepted as well as a bare array.
+    """
+    mimetype = (content_type or "application/json").split(";")[0].strip().lower()
+
+    if mimetype in CSV_MIMETYPES:
+        return pd.read_csv(io.BytesIO(body)), "csv"
+
+    if mimetype in NDJSON_MIMETYPES:
+        records = [json.loads(line) for line in body.splitlines() if line.strip()]
+        fmt = "ndjson"
+    else:
+        records = json.loads(body)
+        if isinstance(records, dict):
+            records = records.get("readings")
+        if not isinstance(records, list):
+            raise ValueError("Expected a JSON array of readings")
+        fmt = "json"
+
+    if not all(isinstance(record, dict) for record in records):
+        raise ValueError("Each reading must be a JSON object")
+    return pd.DataFrame.from_records(records), fmt
+
+# Stream per-reading results as a JSON array or NDJSON, one chunk at a time
+def stream_results(make_row, count, ndjson, chunk_size=1000):
+    """Yield serialized chunks of make_row(0) .. make_row(count - 1)"""
+    if ndjson:
+        for start in range(0, count, chunk_size):
+            stop = min(start + chunk_size, count)
+            yield b"".join(dumps(make_row(i)) + b"\n" for i in range(start, stop))
+        return
+
+    yield b"["
+    for start in range(0, count, chunk_size):
+        stop = min(start + chunk_size, count)
+        yield (b"," if start else b"") + b",".join(dumps(make_row(i)) for i in range(start, stop))
+    yield b"]"
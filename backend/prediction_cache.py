@@ -0,0 +1,120 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from scoring import FEATURE_COLUMNS
+
+def parse_quanta(spec):
+    """
+    "Temperature=0.1,Pressure=0.5" -> one step per FEATURE_COLUMNS entry
+    (0 = exact). Raises ValueError on an unknown column or a bad step.
+    """
+    quanta = dict.fromkeys(FEATURE_COLUMNS, 0.0)
+    for part in filter(None, (part.strip() for part in spec.split(","))):
+        name, _, step = part.partition("=")
+        if name.strip() not in quanta:
+            raise ValueError(f"Unknown feature column: {name.strip()}")
+        quanta[name.strip()] = float(step)
+        if quanta[name.strip()] < 0:
+            raise ValueError(f"Negative quantization step for {name.strip()}")
+    return np.array([quanta[name] for name in FEATURE_COLUMNS])
+
+# Memoized model output per feature vector, for the model currently being served
+class PredictionCache:
+    """
+    Bounded LRU from feature vector (FEATURE_COLUMNS, each rounded to its
+    quantization step) to the model's risk.
+
+    Entries belong to one model: the first lookup with a different model object
+    (a reload or rollback swapped it) clears the cache, so a result is never
+    served for a version that didn't produce it. Rows with missing or
+    non-numeric features are never cached.
+    """
+
+    def __init__(self, max_entries=10000, quanta=None):
+        self.max_entries = max_entries
+        self.quanta = quanta if quanta is not None else np.zeros(len(FEATURE_COLUMNS))
+        self._entries = OrderedDict()  # feature vector bytes -> risk
+        self._model = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def keys(self, frame):
+        """One hashable key per row of frame, None for rows that can't be cached"""
+        values = frame[FEATURE_COLUMNS].to_numpy(dtype=np.float64)
+        valid = np.isfinite(values).all(axis=1)
+        if self.quanta.any():
+            steps = np.where(self.quanta > 0, self.quanta, 1.0)
+            values = np.where(self.quanta > 0, np.round(values / steps), values)
+        # Each row's raw bytes as one bytes object: far cheaper to build than a tuple of floats
+        values = np.ascontiguousarray(values)
+        keys = values.view(f"V{values.shape[1] * values.itemsize}").ravel().tolist()
+        if not valid.all():
+            for i in np.flatnonzero(~valid):
+                keys[i] = None
+        return keys
+
+    def _check_model(self, model):
+        if model is not self._model:
+            if self._entries:
+                self.invalidations += 1
+            self._entries.clear()
+            self._model = model
+
+    def lookup(self, model, keys):
+        """(risk, hit) arrays for keys; risk is NaN where hit is False"""
+        risk = np.full(len(keys), np.nan)
+        hit = np.zeros(len(keys), dtype=bool)
+        with self._lock:
+            self._check_model(model)
+            entries = self._entries
+            for i, key in enumerate(keys):
+                if key is None:
+                    continue
+                value = entries.get(key)
+                if value is not None:
+                    entries.move_to_end(key)
+                    risk[i] = value
+                    hit[i] = True
+            found = int(hit.sum())
+            self.hits += found
+            self.misses += len(keys) - found
+        return risk, hit
+
+    def store(self, model, keys, risks):
+        """Remember model's risks for keys (parallel sequences); ignored if another model took over meanwhile"""
+        with self._lock:
+            if model is not self._model:
+                return
+            for key, value in zip(keys, risks):
+                if key is not None:
+                    self._entries[key] = float(value)
+                    self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self):
+        with self._lock:
+            if self._entries:
+                self.invalidations += 1
+            self._entries.clear()
+            self._model = None
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "quantization": {name: float(step) for name, step in zip(FEATURE_COLUMNS, self.quanta) if step > 0}
+            }
@@ -0,0 +1,79 @@
+import bisect
+import threading
+from collections import deque
+
+# Bounded per-device history of scored readings, used to score only new data on each poll
+class PredictionStore:
+    """
+    One ring buffer of predictions per device, in timestamp order, plus a
+    watermark: the newest timestamp a poll of DynamoDB has scored.
+
+    Predictions are merged by timestamp. One whose timestamp is already stored
+    is ignored, so concurrent polls that scored the same readings, or a poll
+    returning readings that were pushed to /ingest, cannot insert duplicates.
+    Only polls move the watermark, so readings pushed out of band cannot make
+    the next poll skip unscored readings in DynamoDB.
+    """
+
+    def __init__(self, capacity=10):
+        self.capacity = capacity
+        self._buffers = {}  # deviceId -> deque of prediction dicts, oldest first
+        self._watermarks = {}  # deviceId -> newest timestamp scored by a poll
+        self._lock = threading.Lock()
+
+    def last_timestamp(self, device_id):
+        """Timestamp of the newest reading polled and scored for device_id, or None if it has not been polled"""
+        with self._lock:
+            return self._watermarks.get(device_id)
+
+    def merge(self, device_id, predictions, polled=True):
+        """
+        Add predictions (any order) whose timestamps aren't stored yet, and that
+        aren't older than every stored one in a full buffer; returns the ones
+        added, oldest first. polled=False (pushed readings) leaves the watermark alone.
+        """
+        with self._lock:
+            buffer = self._buffers.setdefault(device_id, deque(maxlen=self.capacity))
+            predictions = sorted(predictions, key=lambda p: p["timestamp"])
+            if polled and predictions:
+                watermark = self._watermarks.get(device_id)
+                if watermark is None or predictions[-1]["timestamp"] > watermark:
+                    self._watermarks[device_id] = predictions[-1]["timestamp"]
+            added = []
+            for prediction in predictions:
+                timestamp = prediction["timestamp"]
+                if not buffer or timestamp > buffer[-1]["timestamp"]:
+                    buffer.append(prediction)
+                    added.append(prediction)
+                    continue
+                timestamps = [stored["timestamp"] for stored in buffer]
+                position = bisect.bisect_left(timestamps, timestamp)
+                if position < len(timestamps) and timestamps[position] == timestamp:
+                    continue
+                if len(buffer) == self.capacity:
+                    if position == 0:
+                        continue
+                    buffer.popleft()
+                    position -= 1
+                buffer.insert(position, prediction)
+                added.append(prediction)
+            return added
+
+    def device_ids(self):
+        """Devices with stored predictions"""
+        with self._lock:
+            return [device_id for device_id, buffer in self._buffers.items() if buffer]
+
+    def latest(self, device_id):
+        """Stored predictions for device_id, newest first"""
+        with self._lock:
+            return list(reversed(self._buffers.get(device_id, ())))
+
+    def clear(self, device_id=None):
+        with self._lock:
+            if device_id is None:
+                self._buffers.clear()
+                self._watermarks.clear()
+            else:
+                self._buffers.pop(device_id, None)
+                self._watermarks.pop(device_id, None)
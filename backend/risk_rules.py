@@ -0,0 +1,121 @@
+"""
+Rule-based risk scoring over whole columns, loaded from a JSON rule file.
+
+A rule file looks like:
+
+    {
+      "base": 0.1,
+      "max": 1.0,
+      "rules": [
+        {"column": "Temperature", "above": 75, "add": 0.3},
+        {"column": "Humidity", "outside": [30, 70], "add": 0.1}
+      ],
+      "healthy": {"Temperature": [null, 70], "Humidity": [35, 65]}
+    }
+
+Each rule adds `add` to the base risk of every reading its condition holds for
+(above, below, outside [low, high] or inside [low, high]); the total is capped
+at max. "healthy" is optional: ranges (null = unbounded) a reading must fall
+within on every listed column to count as clearly healthy, for the pre-filter.
+Readings with a NaN in a column never match that column's conditions.
+"""
+import json
+
+import numpy as np
+
+_CONDITIONS = {
+    "above": lambda values, bound: values > bound,
+    "below": lambda values, bound: values < bound,
+    "outside": lambda values, bounds: (values < bounds[0]) | (values > bounds[1]),
+    "inside": lambda values, bounds: (values >= bounds[0]) & (values <= bounds[1]),
+}
+
+# The fallback rules get_prediction used to apply one reading at a time
+DEFAULT_RULES = {
+    "base": 0.1,
+    "max": 1.0,
+    "rules": [
+        {"column": "Temperature", "above": 75, "add": 0.3},
+        {"column": "Vibration", "above": 2.0, "add": 0.2},
+        {"column": "Power_Usage", "above": 0.25, "add": 0.2},
+        {"column": "Humidity", "outside": [30, 70], "add": 0.1},
+        {"column": "Pressure", "outside": [25, 35], "add": 0.1},
+    ],
+}
+
+def _bounds(value, name):
+    if not isinstance(value, (list, tuple)) or len(value) != 2:
+        raise ValueError(f"{name} needs [low, high]")
+    low = -np.inf if value[0] is None else float(value[0])
+    high = np.inf if value[1] is None else float(value[1])
+    if low > high:
+        raise ValueError(f"{name} has low > high: {value}")
+    return low, high
+
+# Threshold rules evaluated with boolean masks over a whole DataFrame
+class RiskRules:
+    def __init__(self, base, cap, rules, healthy):
+        self.base = base
+        self.cap = cap
+        self.rules = rules      # [(column, condition name, bound(s), add)]
+        self.healthy_ranges = healthy  # {column: (low, high)}
+        self.columns = list(dict.fromkeys([rule[0] for rule in rules] + list(healthy)))
+
+    @classmethod
+    def from_dict(cls, spec, columns=None):
+        """Build from a parsed rule file; raises ValueError on a malformed rule or (given columns) an unknown column"""
+        def check_column(column):
+            if not isinstance(column, str) or (columns is not None and column not in columns):
+                raise ValueError(f"Unknown rule column: {column}")
+            return column
+
+        rules = []
+        for rule in spec.get("rules", []):
+            conditions = [name for name in _CONDITIONS if name in rule]
+            if len(conditions) != 1:
+                raise ValueError(f"Rule needs exactly one of {', '.join(_CONDITIONS)}: {rule}")
+            condition = conditions[0]
+            bound = float(rule[condition]) if condition in ("above", "below") else _bounds(rule[condition], condition)
+            rules.append((check_column(rule.get("column")), condition, bound, float(rule.get("add", 0.0))))
+        healthy = {check_column(column): _bounds(value, f"healthy {column}")
+                   for column, value in spec.get("healthy", {}).items()}
+        return cls(float(spec.get("base", 0.0)), float(spec.get("max", 1.0)), rules, healthy)
+
+    @classmethod
+    def load(cls, path, columns=None):
+        with open(path) as f:
+            return cls.from_dict(json.load(f), columns)
+
+    def _values(self, frame):
+        return {column: frame[column].to_numpy(dtype=np.float64) for column in self.columns}
+
+    def score(self, frame):
+        """Risk for every row of frame"""
+        values = self._values(frame)
+        risk = np.full(len(frame), self.base)
+        for column, condition, bound, add in self.rules:
+            risk[_CONDITIONS[condition](values[column], bound)] += add
+        return np.minimum(risk, self.cap)
+
+    def healthy(self, frame):
+        """Mask of rows inside every healthy range (all False if the rule file defines none)"""
+        if not self.healthy_ranges:
+            return np.zeros(len(frame), dtype=bool)
+        values = self._values(frame)
+        mask = np.ones(len(frame), dtype=bool)
+        for column, bounds in self.healthy_ranges.items():
+            mask &= _CONDITIONS["inside"](values[column], bounds)
+        return mask
+
+    def describe(self):
+        """The rules in rule-file form"""
+        bound = lambda value: [None if np.isinf(v) else v for v in value] if isinstance(value, tuple) else value
+        return {
+            "base": self.base,
+            "max": self.cap,
+            "rules": [{"column": column, condition: bound(value), "add": add}
+                      for column, condition, value, add in self.rules],
+            "healthy": {column: bound(bounds) for column, bounds in self.healthy_ranges.items()},
+        }
+
+DEFAULT_RISK_RULES = RiskRules.from_dict(DEFAULT_RULES)
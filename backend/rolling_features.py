@@ -0,0 +1,195 @@
+"""
+Rolling-window trend features for sensor readings, updated in O(1) per reading.
+
+RollingFeatures is a scikit-learn transformer, so the same code builds training
+features and serving features:
+
+    Pipeline([
+        ('rolling', RollingFeatures(windows=(10, 60))),
+        ('preprocessor', preproc),   # must select the new columns to use them
+        ('model', model)
+    ])
+
+With stateful=False (training, and what published pipelines must use) every
+transform() call starts from empty windows and walks each device's readings in
+timestamp order, so a reading's features depend only on the batch it is scored
+with. The app scores /predict/batch this way, on the posted batch as a whole.
+
+With stateful=True the per-device windows persist between calls, so each call
+only needs the readings that are new since the previous one. Each device's
+windows only advance past the newest timestamp they have seen; an older or
+repeated reading gets the current windows' features without being pushed. The
+app keeps such a copy of a served pipeline's stages for polled and ingested
+readings, so a poll that brings one new reading still scores it against its
+device's history.
+"""
+import math
+from collections import deque
+
+import numpy as np
+import pandas as pd
+from sklearn.base import BaseEstimator, TransformerMixin
+
+from scoring import SENSOR_DEFAULTS
+
+ROLLING_STATS = ("mean", "std", "slope", "ewma", "roc")
+
+# Sliding window with constant-time mean, variance, slope and rate of change
+class RollingWindow:
+    """
+    Keeps the last `size` values of one channel.
+
+    Mean and variance use Welford's update with a matching removal step, and the
+    least-squares slope uses a position-weighted running sum, so push() costs the
+    same for any window size. Running sums are recomputed from the window every
+    `size` pushes to stop floating-point drift (amortized O(1)).
+    """
+    __slots__ = ("size", "alpha", "values", "mean", "m2", "sum_jx", "ewma", "_pushes")
+
+    def __init__(self, size):
+        self.size = size
+        self.alpha = 2.0 / (size + 1)  # EWMA with span equal to the window
+        self.values = deque()
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.sum_jx = 0.0  # sum of position * value, oldest value at position 0
+        self.ewma = None
+        self._pushes = 0
+
+    def push(self, x):
+        if len(self.values) == self.size:
+            self._pop()
+        n = len(self.values)
+        self.values.append(x)
+        self.sum_jx += n * x
+        delta = x - self.mean
+        self.mean += delta / (n + 1)
+        self.m2 += delta * (x - self.mean)
+        self.ewma = x if self.ewma is None else self.alpha * x + (1.0 - self.alpha) * self.ewma
+
+        self._pushes += 1
+        if self._pushes >= self.size:
+            self._recompute()
+
+    def _pop(self):
+        x = self.values.popleft()
+        n = len(self.values)
+        if n == 0:
+            self.mean = self.m2 = self.sum_jx = 0.0
+            return
+        old_mean = self.mean
+        self.mean = (old_mean * (n + 1) - x) / n
+        self.m2 -= (x - old_mean) * (x - self.mean)
+        # Every remaining value moves one position towards the front
+        self.sum_jx -= n * self.mean
+
+    def _recompute(self):
+        values = np.fromiter(self.values, dtype=np.float64, count=len(self.values))
+        self.mean = float(values.mean())
+        self.m2 = float(((values - self.mean) ** 2).sum())
+        self.sum_jx = float(np.arange(len(values)) @ values)
+        self._pushes = 0
+
+    def stats(self):
+        """(mean, std, slope, ewma, roc) of the current window"""
+        n = len(self.values)
+        if n < 2:
+            return self.mean, 0.0, 0.0, self.ewma if self.ewma is not None else 0.0, 0.0
+        std = math.sqrt(max(self.m2, 0.0) / (n - 1))
+        centered = self.sum_jx - (n - 1) / 2.0 * n * self.mean
+        slope = centered * 12.0 / (n * (n * n - 1))
+        roc = (self.values[-1] - self.values[0]) / (n - 1)
+        return self.mean, std, slope, self.ewma, roc
+
+# Scikit-learn stage adding per-device rolling statistics for each sensor channel
+class RollingFeatures(BaseEstimator, TransformerMixin):
+    """
+    Append <channel>_<stat>_<window> columns for stat in ROLLING_STATS.
+
+    Rows are processed per device (device_column) in time order (time_column);
+    frames without those columns are treated as one device in row order. Output
+    rows keep the input order.
+    """
+
+    def __init__(self, windows=(10, 60), channels=None, device_column="deviceId",
+                 time_column="timestamp", stateful=False):
+        self.windows = windows
+        self.channels = channels
+        self.device_column = device_column
+        self.time_column = time_column
+        self.stateful = stateful
+
+    def _channels(self):
+        return list(self.channels) if self.channels is not None else list(SENSOR_DEFAULTS)
+
+    def fit(self, X, y=None):
+        self.state_ = {}
+        self.last_time_ = {}
+        return self
+
+    def get_feature_names_out(self, input_features=None):
+        names = [] if input_features is None else list(input_features)
+        return np.array(names + [
+            f"{channel}_{stat}_{window}"
+            for channel in self._channels() for window in self.windows for stat in ROLLING_STATS
+        ], dtype=object)
+
+    def _device_windows(self, state, device_id):
+        windows = state.get(device_id)
+        if windows is None:
+            windows = state[device_id] = [[RollingWindow(size) for size in self.windows]
+                                          for _ in self._channels()]
+        return windows
+
+    def update(self, device_id, reading):
+        """Push one reading (dict of channel values) and return its features as a flat list"""
+        if not hasattr(self, "state_"):
+            self.state_ = {}
+        features = []
+        for channel, windows in zip(self._channels(), self._device_windows(self.state_, device_id)):
+            value = float(reading[channel])
+            for window in windows:
+                window.push(value)
+                features.extend(window.stats())
+        return features
+
+    def transform(self, X):
+        if not hasattr(self, "state_"):
+            self.state_ = {}
+        if not hasattr(self, "last_time_"):
+            self.last_time_ = {}
+        state = self.state_ if self.stateful else {}
+        channels = self._channels()
+        values = X[channels].to_numpy(dtype=np.float64)
+
+        devices = X[self.device_column].to_numpy() if self.device_column in X.columns else np.zeros(len(X))
+        keys = pd.DataFrame({"device": devices})
+        times = None
+        if self.time_column in X.columns:
+            times = keys["time"] = X[self.time_column].to_numpy()
+        order = keys.sort_values(list(keys.columns), kind="mergesort").index.to_numpy()
+
+        width = len(self.windows) * len(ROLLING_STATS)
+        features = np.empty((len(X), len(channels) * width))
+        for row in order:
+            device = devices[row]
+            device_windows = self._device_windows(state, device)
+            push = True
+            if self.stateful and times is not None:
+                # Windows only move forward: a reading at or before the newest one seen is not pushed again
+                last = self.last_time_.get(device)
+                push = last is None or times[row] > last
+                if push:
+                    self.last_time_[device] = times[row]
+            column = 0
+            for channel_index, windows in enumerate(device_windows):
+                value = values[row, channel_index]
+                for window in windows:
+                    if push:
+                        window.push(value)
+                    features[row, column:column + len(ROLLING_STATS)] = window.stats()
+                    column += len(ROLLING_STATS)
+
+        names = self.get_feature_names_out()
+        rolling = pd.DataFrame(features, columns=names, index=X.index)
+        return pd.concat([X, rolling], axis=1)
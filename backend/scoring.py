@@ -0,0 +1,192 @@
+import logging
+
+import numpy as np
+
+from lazy import LazyModule
+from metrics import FALLBACK_ROWS, SCORED_ROWS, span
+from risk_rules import DEFAULT_RISK_RULES
+
+logger = logging.getLogger(__name__)
+
+# Imported on first use, so modules that only need the constants below stay light
+pd = LazyModule("pandas")
+
+# Sensor attributes read from DynamoDB items, with the defaults used when a reading is missing one
+SENSOR_DEFAULTS = {
+    "Temperature": 70.0,
+    "Vibration": 1.0,
+    "Power_Usage": 0.2,
+    "Humidity": 40.0,
+    "Pressure": 30.0,
+}
+DEFAULT_MACHINE_TYPE = "Type_A"
+
+# Column order of the frame handed to the pipeline
+FEATURE_COLUMNS = list(SENSOR_DEFAULTS) + ["Machine_Type_Code"]
+
+# Identifying columns carried alongside the features for stateful stages such as RollingFeatures
+KEY_COLUMNS = ["deviceId", "timestamp"]
+
+MACHINE_TYPE_CODES = {
+    'Type_A': 0,
+    'Type_B': 1,
+    'Type_C': 2
+}
+
+# Function to convert Machine_Type to Machine_Type_Code
+def get_machine_type_code(machine_type):
+    """Convert Machine_Type to the code expected by the model"""
+    return MACHINE_TYPE_CODES.get(machine_type, 0)  # Default to 0 if not found
+
+def _to_float(value):
+    """float() that maps unparseable sensor values to NaN instead of raising"""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+# Build a single columnar model input from all items returned by one query
+def items_to_frame(items):
+    """Convert a list of DynamoDB items into one DataFrame with FEATURE_COLUMNS + KEY_COLUMNS"""
+    count = len(items)
+    columns = {}
+    for name, default in SENSOR_DEFAULTS.items():
+        columns[name] = np.fromiter(
+            (_to_float(item.get(name, default)) for item in items),
+            dtype=np.float64, count=count
+        )
+    columns["Machine_Type_Code"] = np.fromiter(
+        (get_machine_type_code(item.get("Machine_Type", DEFAULT_MACHINE_TYPE)) for item in items),
+        dtype=np.int64, count=count
+    )
+    for name in KEY_COLUMNS:
+        columns[name] = [item.get(name) for item in items]
+    return pd.DataFrame(columns, columns=FEATURE_COLUMNS + KEY_COLUMNS)
+
+def get_model_step(pipeline):
+    """Return the estimator step of the pipeline ('classifier' or 'model')"""
+    if 'classifier' in pipeline.named_steps:
+        return pipeline.named_steps['classifier']
+    elif 'model' in pipeline.named_steps:
+        return pipeline.named_steps['model']
+    raise ValueError("No classifier or model step found in pipeline")
+
+def preprocessing_steps(pipeline):
+    """The steps that precede the estimator step, skipping None/'passthrough'"""
+    model = get_model_step(pipeline)
+    steps = []
+    for name, step in pipeline.steps:
+        if step is model:
+            break
+        if step is not None and step != 'passthrough':
+            steps.append(step)
+    return steps
+
+def transform_features(pipeline, frame):
+    """Apply every pipeline step that precedes the estimator step"""
+    for step in preprocessing_steps(pipeline):
+        frame = step.transform(frame)
+    return frame
+
+def encode_features(pipeline, frame, rows=None, preprocessor=None, out=None):
+    """
+    transform_features() of frame (or its rows where the mask rows is True).
+    With preprocessor (the pipeline's CompiledPreprocessor) the features are
+    computed with NumPy alone, into out if given.
+    """
+    if preprocessor is not None:
+        return preprocessor.transform(frame, rows, out=out)
+    return transform_features(pipeline, frame if rows is None else frame[rows])
+
+def valid_feature_rows(frame):
+    """Mask of rows whose FEATURE_COLUMNS are all finite, i.e. rows the model may score"""
+    return np.isfinite(frame[FEATURE_COLUMNS].to_numpy(dtype=np.float64)).all(axis=1)
+
+# Rule-based risk used when the model cannot score a reading
+def heuristic_risk(frame, rules=None):
+    """Risk from a RiskRules (default: the built-in fallback rules) for every row of frame"""
+    return (rules or DEFAULT_RISK_RULES).score(frame)
+
+# Score a whole batch with one preprocessor/model call
+def score_frame(pipeline, frame, model=None, transformed=None, rules=None, preprocessor=None):
+    """
+    Return (risk, from_model) arrays for every row of frame.
+
+    model overrides the pipeline's estimator step, e.g. with a CompiledForest,
+    and preprocessor its preprocessing steps, with a CompiledPreprocessor whose
+    pooled output buffer is reused across batches.
+    transformed, if given, is transform_features() of the valid rows, already
+    computed by the caller (e.g. to share it with shadow models).
+
+    Rows with missing or non-numeric sensor values, and every row of a batch the
+    model rejects, are scored with heuristic_risk(rules) instead.
+    """
+    risk = np.zeros(len(frame))
+    from_model = np.zeros(len(frame), dtype=bool)
+
+    valid = valid_feature_rows(frame)
+    reason = "no_model"
+    if pipeline is not None and valid.any():
+        buffer = None
+        try:
+            if model is None:
+                model = get_model_step(pipeline)
+            if transformed is None:
+                with span("preprocessing"):
+                    if preprocessor is not None:
+                        buffer = preprocessor.take_buffer(int(valid.sum()))
+                    transformed = encode_features(pipeline, frame, valid, preprocessor, out=buffer)
+            with span("model"):
+                risk[valid] = np.asarray(model.predict(transformed), dtype=np.float64)
+            from_model = valid
+        except Exception as e:
+            reason = "model_error"
+            logger.error(f"Model prediction error for batch of {int(valid.sum())} items: {str(e)}")
+        finally:
+            if buffer is not None:
+                preprocessor.give_buffer(buffer)
+
+    fallback = ~from_model
+    scored = int(from_model.sum())
+    if scored:
+        SCORED_ROWS.inc(scored, source="model")
+    if fallback.any():
+        invalid = len(frame) - int(valid.sum())
+        if invalid:
+            FALLBACK_ROWS.inc(invalid, reason="invalid_features")
+        if len(frame) - scored - invalid:
+            FALLBACK_ROWS.inc(len(frame) - scored - invalid, reason=reason)
+        SCORED_ROWS.inc(len(frame) - scored, source="heuristic")
+        risk[fallback] = heuristic_risk(frame[fallback], rules)
+    return risk, from_model
+
+# Validate and encode posted readings (raw column names, Machine_Type as a string) in bulk
+def validate_readings(raw):
+    """
+    Return (frame, invalid) for a DataFrame of posted readings.
+
+    Raises ValueError when a required sensor column is missing entirely; rows with
+    non-numeric values or an unknown Machine_Type are flagged in the invalid mask.
+    """
+    missing = [name for name in SENSOR_DEFAULTS if name not in raw.columns]
+    if missing:
+        raise ValueError(f"Readings missing required fields: {missing}")
+
+    invalid = np.zeros(len(raw), dtype=bool)
+    columns = {}
+    for name in SENSOR_DEFAULTS:
+        values = pd.to_numeric(raw[name], errors='coerce').to_numpy(dtype=np.float64)
+        invalid |= ~np.isfinite(values)
+        columns[name] = values
+
+    if "Machine_Type" in raw.columns:
+        codes = raw["Machine_Type"].fillna(DEFAULT_MACHINE_TYPE).map(MACHINE_TYPE_CODES)
+        invalid |= codes.isna().to_numpy()
+        columns["Machine_Type_Code"] = codes.fillna(0).to_numpy(dtype=np.int64)
+    else:
+        columns["Machine_Type_Code"] = np.zeros(len(raw), dtype=np.int64)
+
+    keys = [name for name in KEY_COLUMNS if name in raw.columns]
+    for name in keys:
+        columns[name] = raw[name].to_numpy()
+    return pd.DataFrame(columns, columns=FEATURE_COLUMNS + keys), invalid
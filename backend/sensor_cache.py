@@ -0,0 +1,100 @@
+import threading
+import time
+from collections import OrderedDict
+
+class _InFlight:
+    """A fetch in progress that other callers for the same key wait on"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+# Shared in-process read-through cache for DynamoDB sensor queries
+class QueryCache:
+    """
+    TTL + LRU cache with request coalescing.
+
+    get(key, fetch) returns the cached value while it is fresh; otherwise one
+    caller runs fetch() and every concurrent caller for the same key waits for
+    that result instead of issuing its own query. Failed fetches are not cached.
+    A ttl_seconds of 0 disables caching but still coalesces concurrent calls.
+    """
+
+    def __init__(self, ttl_seconds=5.0, max_entries=128, clock=time.monotonic):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._clock = clock
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._in_flight = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+
+    def get(self, key, fetch):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > self._clock():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+                del self._entries[key]
+
+            pending = self._in_flight.get(key)
+            leader = pending is None
+            if leader:
+                pending = self._in_flight[key] = _InFlight()
+                self.misses += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            pending.done.wait()
+            if pending.error is not None:
+                raise pending.error
+            return pending.value
+
+        try:
+            pending.value = fetch()
+        except Exception as e:
+            pending.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+                if pending.error is None and self.ttl_seconds > 0:
+                    self._store(key, pending.value)
+            pending.done.set()
+        return pending.value
+
+    def _store(self, key, value):
+        self._entries[key] = (self._clock() + self.ttl_seconds, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, key=None):
+        """Drop one key, or every entry when key is None"""
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses + self.coalesced
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "hit_rate": round((self.hits + self.coalesced) / lookups, 4) if lookups else None,
+                "ttl_seconds": self.ttl_seconds,
+                "max_entries": self.max_entries,
+            }
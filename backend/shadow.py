@@ -0,0 +1,160 @@
+import json
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import numpy as np
+
+from scoring import encode_features, get_model_step
+
+logger = logging.getLogger(__name__)
+
+# Risk at or above which a reading counts as "at risk" when comparing two models
+DISAGREEMENT_THRESHOLD = 0.5
+
+class _VersionStats:
+    def __init__(self, window):
+        self.batches = 0
+        self.rows = 0
+        self.disagreements = 0
+        self.abs_diff_sum = 0.0
+        self.shared_batches = 0
+        self.errors = 0
+        self.latencies_ms = deque(maxlen=window)
+
+# Score candidate models on live traffic without adding to response latency
+class ShadowScorer:
+    """
+    submit() hands a batch the serving model already scored to a small thread
+    pool and returns at once. Each shadow model reuses the serving model's
+    transformed features when their preprocessing is identical (equal
+    preprocessor_key) and transforms the rows itself otherwise.
+
+    Per-version latency, and disagreement with the risk actually served, are
+    kept for stats() and, with log_path, appended as one JSON line per shadow
+    batch. At most max_pending batches wait for a worker; more are dropped (and
+    counted) rather than queued, so a slow shadow can't pile up memory.
+    """
+
+    def __init__(self, workers=2, max_pending=8, log_path=None, latency_window=1000):
+        self.max_pending = max_pending
+        self.log_path = log_path
+        self._latency_window = latency_window
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="shadow")
+        self._lock = threading.Lock()
+        self._log_lock = threading.Lock()
+        self._stats = {}  # version -> _VersionStats
+        self._pending = 0
+        self._idle = threading.Condition(self._lock)
+        self.dropped = 0
+
+    def _version_stats(self, version):
+        stats = self._stats.get(version)
+        if stats is None:
+            stats = self._stats[version] = _VersionStats(self._latency_window)
+        return stats
+
+    def record_latency(self, version, seconds, rows):
+        """Record a batch scored on the response path (the serving model), for comparison"""
+        with self._lock:
+            stats = self._version_stats(version)
+            stats.batches += 1
+            stats.rows += rows
+            stats.latencies_ms.append(seconds * 1000)
+
+    def submit(self, primary, shadows, frame, transformed, risk):
+        """
+        Queue shadows to score frame, the rows primary scored as risk; transformed
+        is primary's encode_features() of frame. Returns False if dropped.
+        """
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self.dropped += 1
+                return False
+            self._pending += 1
+        try:
+            self._executor.submit(self._run, primary, shadows, frame, transformed, risk)
+        except RuntimeError:
+            self._finish()
+            return False
+        return True
+
+    def _finish(self):
+        with self._lock:
+            self._pending -= 1
+            if self._pending == 0:
+                self._idle.notify_all()
+
+    def _run(self, primary, shadows, frame, transformed, risk):
+        try:
+            for shadow in shadows:
+                self._score(primary, shadow, frame, transformed, risk)
+        finally:
+            self._finish()
+
+    def _score(self, primary, shadow, frame, transformed, risk):
+        start = time.perf_counter()
+        shared = shadow.preprocessor_key is not None and shadow.preprocessor_key == primary.preprocessor_key
+        try:
+            features = (transformed if shared else
+                        encode_features(shadow.pipeline, frame, preprocessor=shadow.compiled_preprocessor))
+            estimator = shadow.compiled_model if shadow.compiled_model is not None else get_model_step(shadow.pipeline)
+            predicted = np.asarray(estimator.predict(features), dtype=np.float64)
+        except Exception as e:
+            logger.error(f"Shadow model {shadow.version} failed on a batch of {len(frame)}: {str(e)}")
+            with self._lock:
+                self._version_stats(shadow.version).errors += 1
+            return
+        elapsed_ms = (time.perf_counter() - start) * 1000
+
+        disagreements = int(np.count_nonzero((predicted >= DISAGREEMENT_THRESHOLD) != (risk >= DISAGREEMENT_THRESHOLD)))
+        abs_diff = float(np.abs(predicted - risk).sum())
+        with self._lock:
+            stats = self._version_stats(shadow.version)
+            stats.batches += 1
+            stats.rows += len(frame)
+            stats.disagreements += disagreements
+            stats.abs_diff_sum += abs_diff
+            stats.shared_batches += shared
+            stats.latencies_ms.append(elapsed_ms)
+
+        if self.log_path:
+            record = {
+                "time": datetime.now().isoformat(timespec="milliseconds"),
+                "primary": primary.version,
+                "version": shadow.version,
+                "rows": len(frame),
+                "latency_ms": round(elapsed_ms, 3),
+                "shared_preprocessing": bool(shared),
+                "disagreements": disagreements,
+                "mean_abs_diff": round(abs_diff / len(frame), 6)
+            }
+            with self._log_lock:
+                with open(self.log_path, "a") as f:
+                    f.write(json.dumps(record) + "\n")
+
+    def wait(self, timeout=None):
+        """Block until every submitted batch is scored; False on timeout"""
+        with self._lock:
+            return self._idle.wait_for(lambda: self._pending == 0, timeout)
+
+    def stats(self):
+        with self._lock:
+            versions = {}
+            for version, stats in self._stats.items():
+                latencies = np.fromiter(stats.latencies_ms, dtype=np.float64)
+                versions[str(version)] = {
+                    "batches": stats.batches,
+                    "rows": stats.rows,
+                    "latency_ms_p50": round(float(np.percentile(latencies, 50)), 3) if len(latencies) else None,
+                    "latency_ms_p95": round(float(np.percentile(latencies, 95)), 3) if len(latencies) else None,
+                    "disagreements": stats.disagreements,
+                    "disagreement_rate": round(stats.disagreements / stats.rows, 6) if stats.rows else None,
+                    "mean_abs_diff": round(stats.abs_diff_sum / stats.rows, 6) if stats.rows else None,
+                    "shared_preprocessing_batches": stats.shared_batches,
+                    "errors": stats.errors
+                }
+            return {"pending": self._pending, "dropped": self.dropped, "versions": versions}
@@ -0,0 +1,156 @@
+import threading
+import time
+import zlib
+from bisect import bisect_left
+from decimal import Decimal
+
+# Evaluators for the key-condition operators the backend uses
+_OPERATORS = {
+    '=': lambda value, operand: value == operand,
+    '<': lambda value, operand: value < operand,
+    '<=': lambda value, operand: value <= operand,
+    '>': lambda value, operand: value > operand,
+    '>=': lambda value, operand: value >= operand,
+    'BETWEEN': lambda value, low, high: low <= value <= high,
+    'begins_with': lambda value, prefix: value.startswith(prefix),
+}
+
+def _segment_of(item, total_segments):
+    """Stable (process-independent) scan segment for an item"""
+    return zlib.crc32(f"{item['deviceId']}|{item['timestamp']}".encode()) % total_segments
+
+def _to_wire(value):
+    """One attribute value in the DynamoDB wire format, as the low-level client returns it"""
+    if isinstance(value, bool):
+        return {'BOOL': value}
+    if isinstance(value, (int, float, Decimal)):
+        return {'N': str(value)}
+    if value is None:
+        return {'NULL': True}
+    return {'S': str(value)}
+
+def _split_condition(condition):
+    """Flatten a boto3 key condition into a list of (attribute, operator, operands)"""
+    expression = condition.get_expression()
+    if expression['operator'] == 'AND':
+        left, right = expression['values']
+        return _split_condition(left) + _split_condition(right)
+    key, *operands = expression['values']
+    return [(key.name, expression['operator'], operands)]
+
+# In-memory stand-in for the boto3 DynamoDB Table resource (IoT_Sensor_Data layout)
+class StubTable:
+    """
+    Local table keyed by deviceId (partition) and timestamp (sort).
+
+    Supports the subset of the Table API the backend uses: query with
+    KeyConditionExpression/ScanIndexForward/Limit/ExclusiveStartKey, scan with
+    Limit/Segment/TotalSegments/ExclusiveStartKey, put_item and batch_writer.
+    query_wire stands in for the same query through the low-level client.
+    latency adds a fixed delay per request to mimic a network round trip, and
+    page_size caps the items per response the way DynamoDB's 1 MB page limit
+    does, so callers must follow LastEvaluatedKey even without a Limit.
+    """
+
+    def __init__(self, items=(), table_name="IoT_Sensor_Data", latency=0.0, page_size=None):
+        self.table_name = table_name
+        self.latency = latency
+        self.page_size = page_size
+        self.query_count = 0
+        self.scan_count = 0
+        self._partitions = {}  # deviceId -> (sorted timestamps, items in the same order)
+        self._lock = threading.Lock()
+        for item in items:
+            self.put_item(Item=item)
+
+    def put_item(self, Item):
+        timestamp = Item['timestamp']
+        with self._lock:
+            timestamps, items = self._partitions.setdefault(Item['deviceId'], ([], []))
+            index = bisect_left(timestamps, timestamp)
+            if index < len(timestamps) and timestamps[index] == timestamp:
+                items[index] = dict(Item)
+            else:
+                timestamps.insert(index, timestamp)
+                items.insert(index, dict(Item))
+        return {}
+
+    def batch_writer(self, overwrite_by_pkeys=None):
+        return _StubBatchWriter(self)
+
+    def query(self, KeyConditionExpression, ScanIndexForward=True, Limit=None, ExclusiveStartKey=None, **kwargs):
+        self._delay()
+        device_id = None
+        sort_filters = []
+        for name, operator, operands in _split_condition(KeyConditionExpression):
+            if name == 'deviceId' and operator == '=':
+                device_id = operands[0]
+            else:
+                sort_filters.append((_OPERATORS[operator], operands))
+        if device_id is None:
+            raise ValueError("Query condition must include deviceId equality")
+
+        with self._lock:
+            self.query_count += 1
+            items = list(self._partitions.get(device_id, ([], []))[1])
+        if not ScanIndexForward:
+            items.reverse()
+        items = [item for item in items
+                 if all(check(item['timestamp'], *operands) for check, operands in sort_filters)]
+        if ExclusiveStartKey is not None:
+            start = ExclusiveStartKey['timestamp']
+            items = [item for item in items
+                     if (item['timestamp'] > start if ScanIndexForward else item['timestamp'] < start)]
+        return self._page(items, Limit)
+
+    def query_wire(self, ExclusiveStartKey=None, **kwargs):
+        """query() as the low-level client answers it: Items and LastEvaluatedKey in the wire format"""
+        if ExclusiveStartKey is not None:
+            ExclusiveStartKey = {name: value['S'] for name, value in ExclusiveStartKey.items()}
+        response = self.query(ExclusiveStartKey=ExclusiveStartKey, **kwargs)
+        response['Items'] = [{name: _to_wire(value) for name, value in item.items()} for item in response['Items']]
+        if 'LastEvaluatedKey' in response:
+            response['LastEvaluatedKey'] = {name: _to_wire(value) for name, value in response['LastEvaluatedKey'].items()}
+        return response
+
+    def scan(self, Limit=None, ExclusiveStartKey=None, Segment=0, TotalSegments=1, **kwargs):
+        self._delay()
+        with self._lock:
+            self.scan_count += 1
+            items = [item for device_id in sorted(self._partitions)
+                     for item in self._partitions[device_id][1]
+                     if _segment_of(item, TotalSegments) == Segment]
+        if ExclusiveStartKey is not None:
+            position = next(i for i, item in enumerate(items)
+                            if item['deviceId'] == ExclusiveStartKey['deviceId']
+                            and item['timestamp'] == ExclusiveStartKey['timestamp'])
+            items = items[position + 1:]
+        return self._page(items, Limit)
+
+    def _page(self, items, limit):
+        response = {'ResponseMetadata': {'HTTPStatusCode': 200}}
+        if self.page_size is not None:
+            limit = self.page_size if limit is None else min(limit, self.page_size)
+        if limit is not None and len(items) > limit:
+            items = items[:limit]
+            response['LastEvaluatedKey'] = {'deviceId': items[-1]['deviceId'], 'timestamp': items[-1]['timestamp']}
+        response['Items'] = [dict(item) for item in items]
+        response['Count'] = len(items)
+        return response
+
+    def _delay(self):
+        if self.latency:
+            time.sleep(self.latency)
+
+class _StubBatchWriter:
+    def __init__(self, table):
+        self._table = table
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def put_item(self, Item):
+        self._table.put_item(Item=Item)
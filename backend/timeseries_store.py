@@ -0,0 +1,282 @@
+import math
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from dynamodb_columns import ReadingColumns
+from scoring import SENSOR_DEFAULTS
+
+CHANNELS = list(SENSOR_DEFAULTS)
+ROLLUP_SECONDS = 60
+HOURLY_ROLLUP_SECONDS = 3600
+_EPOCH = datetime(1970, 1, 1)
+
+def timestamp_seconds(timestamp):
+    """Seconds since 1970 for a DynamoDB timestamp string, taken as-is (no timezone conversion)"""
+    return (datetime.fromisoformat(timestamp.replace('Z', '')) - _EPOCH).total_seconds()
+
+def format_seconds(seconds):
+    """Inverse of timestamp_seconds, in the DynamoDB timestamp format"""
+    return (_EPOCH + timedelta(seconds=seconds)).strftime("%Y-%m-%dT%H:%M:%S.%f")
+
+def timestamps_seconds(timestamps):
+    """timestamp_seconds of each timestamp, NaN for missing or malformed ones"""
+    # One C-level parse when every timestamp is in the DynamoDB format (NumPy warns on a "Z" suffix)
+    if not any(timestamp is None or timestamp.endswith("Z") for timestamp in timestamps):
+        try:
+            parsed = np.array(timestamps, dtype="datetime64[us]")
+            if not np.isnat(parsed).any():
+                return (parsed - np.datetime64(0, "us")).astype(np.int64) / 1e6
+        except (TypeError, ValueError):
+            pass
+    seconds = np.full(len(timestamps), np.nan)
+    for index, timestamp in enumerate(timestamps):
+        try:
+            seconds[index] = timestamp_seconds(timestamp)
+        except (AttributeError, ValueError):
+            pass
+    return seconds
+
+def _nullable(values):
+    """float64 array as a list with NaN as None (SQL NULL)"""
+    missing = np.isnan(values)
+    return np.where(missing, None, values).tolist() if missing.any() else values.tolist()
+
+# Embedded SQLite history of raw sensor readings, for range queries without DynamoDB reads
+class TimeSeriesStore:
+    """
+    One row per (deviceId, timestamp), stored in a WAL-mode SQLite file.
+
+    Readings are written with INSERT OR IGNORE on the primary key, so the same
+    DynamoDB item seen by several queries is stored once. WAL lets range queries
+    run while the ingest path writes. Each thread gets its own connection.
+
+    Every write also refreshes per-minute and per-hour rollups (count/min/max/sum
+    per channel), so downsampling days or weeks reads one row per minute (or
+    hour) instead of one per reading. coverage() records the time range per device that has been fully
+    synced from DynamoDB, so callers only need to fetch what lies outside it.
+    """
+
+    def __init__(self, path="timeseries.db"):
+        self.path = path
+        self._local = threading.local()
+        self._connection()  # create the schema up front
+
+    def _connection(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=10, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            columns = ", ".join(f"{channel} REAL" for channel in CHANNELS)
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS readings ("
+                "deviceId TEXT NOT NULL, timestamp TEXT NOT NULL, epoch REAL NOT NULL, "
+                f"{columns}, Machine_Type TEXT, "
+                "PRIMARY KEY (deviceId, timestamp)) WITHOUT ROWID"
+            )
+            aggregates = ", ".join(f"{channel}_min REAL, {channel}_max REAL, {channel}_sum REAL, {channel}_n INTEGER"
+                                   for channel in CHANNELS)
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS rollups ("
+                f"deviceId TEXT NOT NULL, minute INTEGER NOT NULL, count INTEGER NOT NULL, {aggregates}, "
+                "PRIMARY KEY (deviceId, minute)) WITHOUT ROWID"
+            )
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS hourly_rollups ("
+                f"deviceId TEXT NOT NULL, hour INTEGER NOT NULL, count INTEGER NOT NULL, {aggregates}, "
+                "PRIMARY KEY (deviceId, hour)) WITHOUT ROWID"
+            )
+            # Interval per device known to hold every DynamoDB reading
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS coverage ("
+                "deviceId TEXT PRIMARY KEY, synced_from TEXT NOT NULL, synced_to TEXT NOT NULL)"
+            )
+            self._local.connection = connection
+        return connection
+
+    def write(self, device_id, items):
+        """Store DynamoDB items for device_id; returns how many were new"""
+        return self.write_columns(device_id, ReadingColumns.from_items(items))
+
+    def write_columns(self, device_id, readings):
+        """Store a ReadingColumns for device_id, skipping readings without a valid timestamp; returns how many were new"""
+        epochs = timestamps_seconds(readings.timestamps)
+        valid = ~np.isnan(epochs)
+        if not valid.all():
+            readings = readings.take(np.flatnonzero(valid).tolist())
+            epochs = epochs[valid]
+        if not len(readings):
+            return 0
+        rows = list(zip([device_id] * len(readings), readings.timestamps, epochs.tolist(),
+                        *(_nullable(readings.values[channel]) for channel in CHANNELS), readings.machine_types))
+
+        connection = self._connection()
+        placeholders = ", ".join("?" * (len(CHANNELS) + 4))
+        with connection:
+            before = connection.total_changes
+            connection.executemany(f"INSERT OR IGNORE INTO readings VALUES ({placeholders})", rows)
+            added = connection.total_changes - before
+            if added:
+                self._refresh_rollups(connection, device_id, float(epochs.min()), float(epochs.max()))
+        return added
+
+    def _refresh_rollups(self, connection, device_id, first_epoch, last_epoch):
+        """Recompute the rollup of every minute and hour touched by [first_epoch, last_epoch]"""
+        start = math.floor(first_epoch / ROLLUP_SECONDS) * ROLLUP_SECONDS
+        end = (math.floor(last_epoch / ROLLUP_SECONDS) + 1) * ROLLUP_SECONDS
+        aggregates = ", ".join(f"MIN({channel}), MAX({channel}), SUM({channel}), COUNT({channel})"
+                               for channel in CHANNELS)
+        connection.execute(
+            f"INSERT OR REPLACE INTO rollups SELECT deviceId, CAST(epoch / {ROLLUP_SECONDS} AS INTEGER) AS minute, "
+            f"COUNT(*), {aggregates} FROM readings "
+            "WHERE deviceId = ? AND timestamp >= ? AND timestamp < ? GROUP BY minute",
+            (device_id, format_seconds(start), format_seconds(end)))
+
+        # Hours are rebuilt from their (at most 60) minute rollups
+        minutes_per_hour = HOURLY_ROLLUP_SECONDS // ROLLUP_SECONDS
+        first_hour = math.floor(first_epoch / HOURLY_ROLLUP_SECONDS)
+        last_hour = math.floor(last_epoch / HOURLY_ROLLUP_SECONDS)
+        aggregates = ", ".join(f"MIN({channel}_min), MAX({channel}_max), SUM({channel}_sum), SUM({channel}_n)"
+                               for channel in CHANNELS)
+        connection.execute(
+            f"INSERT OR REPLACE INTO hourly_rollups SELECT deviceId, minute / {minutes_per_hour} AS hour, "
+            f"SUM(count), {aggregates} FROM rollups "
+            "WHERE deviceId = ? AND minute >= ? AND minute < ? GROUP BY hour",
+            (device_id, first_hour * minutes_per_hour, (last_hour + 1) * minutes_per_hour))
+
+    def last_timestamp(self, device_id):
+        """Newest stored timestamp for device_id, or None"""
+        row = self._connection().execute(
+            "SELECT MAX(timestamp) FROM readings WHERE deviceId = ?", (device_id,)).fetchone()
+        return row[0]
+
+    def coverage(self, device_id):
+        """(synced_from, synced_to) for device_id, or None if it was never synced"""
+        row = self._connection().execute(
+            "SELECT synced_from, synced_to FROM coverage WHERE deviceId = ?", (device_id,)).fetchone()
+        return tuple(row) if row else None
+
+    def set_coverage(self, device_id, synced_from, synced_to):
+        connection = self._connection()
+        with connection:
+            connection.execute("INSERT OR REPLACE INTO coverage VALUES (?, ?, ?)",
+                               (device_id, synced_from, synced_to))
+
+    def count(self, device_id=None):
+        if device_id is None:
+            return self._connection().execute("SELECT COUNT(*) FROM readings").fetchone()[0]
+        return self._connection().execute(
+            "SELECT COUNT(*) FROM readings WHERE deviceId = ?", (device_id,)).fetchone()[0]
+
+    def readings(self, device_id, start, end):
+        """Raw rows with start <= timestamp < end, oldest first, as dicts"""
+        cursor = self._connection().execute(
+            f"SELECT timestamp, {', '.join(CHANNELS)} FROM readings "
+            "WHERE deviceId = ? AND timestamp >= ? AND timestamp < ? ORDER BY timestamp",
+            (device_id, start, end))
+        names = [column[0] for column in cursor.description]
+        return [dict(zip(names, row)) for row in cursor]
+
+    def series(self, device_id, start, end, max_rows=100000):
+        """
+        NumPy arrays for [start, end) at the finest resolution that fits in
+        max_rows: raw readings, else minute rollups, else hourly rollups.
+
+        Returns a dict with "resolution" (seconds, 0 for raw), "epoch" (row start
+        times, ascending), "count" (readings per row) and "min"/"max"/"mean" arrays
+        of shape (rows, len(CHANNELS)), NaN where a channel had no values. Rollup
+        rows cover whole minutes/hours overlapping the range.
+        """
+        start_epoch = timestamp_seconds(start)
+        end_epoch = timestamp_seconds(end)
+        connection = self._connection()
+
+        first_hour = math.floor(start_epoch / HOURLY_ROLLUP_SECONDS)
+        last_hour = math.ceil(end_epoch / HOURLY_ROLLUP_SECONDS)
+        readings = connection.execute(
+            "SELECT COALESCE(SUM(count), 0) FROM hourly_rollups WHERE deviceId = ? AND hour >= ? AND hour < ?",
+            (device_id, first_hour, last_hour)).fetchone()[0]
+
+        if readings <= max_rows:
+            rows = connection.execute(
+                f"SELECT epoch, {', '.join(CHANNELS)} FROM readings "
+                "WHERE deviceId = ? AND timestamp >= ? AND timestamp < ? ORDER BY timestamp",
+                (device_id, start, end)).fetchall()
+            values = np.array(rows, dtype=np.float64).reshape(len(rows), len(CHANNELS) + 1)
+            channels = values[:, 1:]
+            return {"resolution": 0, "epoch": values[:, 0], "count": np.ones(len(rows)),
+                    "min": channels, "max": channels, "mean": channels}
+
+        if (end_epoch - start_epoch) / ROLLUP_SECONDS <= max_rows:
+            table, column, seconds = "rollups", "minute", ROLLUP_SECONDS
+        else:
+            table, column, seconds = "hourly_rollups", "hour", HOURLY_ROLLUP_SECONDS
+        aggregates = ", ".join(f"{channel}_min, {channel}_max, {channel}_sum / {channel}_n" for channel in CHANNELS)
+        rows = connection.execute(
+            f"SELECT {column} * {seconds}, count, {aggregates} FROM {table} "
+            f"WHERE deviceId = ? AND {column} >= ? AND {column} < ? ORDER BY {column}",
+            (device_id, math.floor(start_epoch / seconds), math.ceil(end_epoch / seconds))).fetchall()
+        values = np.array(rows, dtype=np.float64).reshape(len(rows), 3 * len(CHANNELS) + 2)
+        return {"resolution": seconds, "epoch": values[:, 0], "count": values[:, 1],
+                "min": values[:, 2::3], "max": values[:, 3::3], "mean": values[:, 4::3]}
+
+    def downsample(self, device_id, start, end, buckets):
+        """
+        Split [start, end) into `buckets` equal time buckets and return one dict
+        per non-empty bucket: its start time, reading count, and min/max/mean of
+        every channel.
+
+        Buckets of a minute or wider are built from the rollups, with raw rows
+        only for the partial minutes at either end; a minute that straddles a
+        bucket edge counts towards the bucket its first second falls in.
+        """
+        start_epoch = timestamp_seconds(start)
+        end_epoch = timestamp_seconds(end)
+        width = max((end_epoch - start_epoch) / buckets, 1e-6)
+        params = {"start_epoch": start_epoch, "width": width, "device": device_id, "start": start, "end": end}
+
+        # Both sources yield (bucket, count, then min/max/sum/n for each channel)
+        raw_columns = ", ".join(f"{channel}, {channel}, {channel}, {channel} IS NOT NULL" for channel in CHANNELS)
+        raw = lambda lower, upper: (f"SELECT CAST((epoch - :start_epoch) / :width AS INTEGER), 1, {raw_columns} "
+                                    f"FROM readings WHERE deviceId = :device AND timestamp >= {lower} AND timestamp < {upper}")
+        source = raw(":start", ":end")
+
+        first_minute = math.ceil(start_epoch / ROLLUP_SECONDS)
+        last_minute = math.floor(end_epoch / ROLLUP_SECONDS)
+        if width >= ROLLUP_SECONDS and first_minute < last_minute:
+            rollup_columns = ", ".join(f"{channel}_min, {channel}_max, {channel}_sum, {channel}_n"
+                                       for channel in CHANNELS)
+            params.update(first_minute=first_minute, last_minute=last_minute,
+                          full_start=format_seconds(first_minute * ROLLUP_SECONDS),
+                          full_end=format_seconds(last_minute * ROLLUP_SECONDS))
+            source = (
+                f"SELECT CAST((minute * {ROLLUP_SECONDS} - :start_epoch) / :width AS INTEGER), count, "
+                f"{rollup_columns} FROM rollups "
+                "WHERE deviceId = :device AND minute >= :first_minute AND minute < :last_minute "
+                f"UNION ALL {raw(':start', ':full_start')} "
+                f"UNION ALL {raw(':full_end', ':end')}"
+            )
+
+        names = ["bucket", "n"] + [f"v{i}" for i in range(4 * len(CHANNELS))]
+        aggregates = ", ".join(f"MIN(v{4 * i}), MAX(v{4 * i + 1}), SUM(v{4 * i + 2}) / SUM(v{4 * i + 3})"
+                               for i in range(len(CHANNELS)))
+        cursor = self._connection().execute(
+            f"WITH parts({', '.join(names)}) AS ({source}) "
+            f"SELECT bucket, SUM(n), {aggregates} FROM parts GROUP BY bucket ORDER BY bucket", params)
+
+        result = []
+        for bucket, count, *values in cursor:
+            row = {"timestamp": format_seconds(start_epoch + bucket * width), "count": count}
+            for index, channel in enumerate(CHANNELS):
+                row[channel] = {"min": values[3 * index], "max": values[3 * index + 1], "mean": values[3 * index + 2]}
+            result.append(row)
+        return result
+
+    def close(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
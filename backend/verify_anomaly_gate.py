@@ -0,0 +1,171 @@
+"""
+Checks for the streaming anomaly gate in front of the model.
+
+Usage: python verify_anomaly_gate.py
+
+Checks that batched, out-of-order updates give the same per-device
+statistics as updating one reading at a time, that nothing is gated before
+warm-up, that spikes and drifts reach the model, that a batch observed twice
+(as two concurrent polls sharing a cached query result would) or a reading
+older than the device's newest is folded in only once, and that a model swap
+drops cached risks. Then turns ANOMALY_GATE on in the app and checks that /predict
+only sends outliers to the model and that the pass-through rate reaches
+/debug/anomaly-gate-stats and /metrics. Exits non-zero if any check fails.
+See bench_anomaly_gate.py for the time saved.
+"""
+import os
+import tempfile
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import numpy as np
+
+import metrics
+from anomaly_gate import SENSOR_CHANNELS, AnomalyGate
+from model_registry import ModelRegistry
+from stub_table import StubTable
+from verify_helpers import build_pipeline, check, finish
+
+def reference_stats(sequence, gate):
+    """EWMA mean and variance of one device's readings, one reading at a time"""
+    mean = np.zeros(len(SENSOR_CHANNELS))
+    var = np.zeros(len(SENSOR_CHANNELS))
+    for count, x in enumerate(sequence, start=1):
+        weight = max(gate.alpha, 1.0 / count)
+        diff = x - mean
+        if count > gate.warmup:
+            diff = np.clip(diff, -gate.threshold * np.sqrt(var), gate.threshold * np.sqrt(var))
+        mean = mean + weight * diff
+        var = (1.0 - weight) * (var + weight * diff * diff)
+    return mean, var
+
+def readings(rng, count, center=(68, 1.2, 0.2, 45, 30), noise=(0.8, 0.08, 0.008, 1.5, 0.4)):
+    return np.asarray(center) + rng.normal(0, noise, size=(count, len(SENSOR_CHANNELS)))
+
+def stamps(start, count):
+    return [(datetime(2025, 5, 29) + timedelta(seconds=4 * (start + i))).isoformat() for i in range(count)]
+
+def check_gate():
+    print("Gate:")
+    rng = np.random.default_rng(0)
+    model = object()
+    gate = AnomalyGate(warmup=30)
+    series = {device: readings(rng, 100) for device in ("a", "b", "c")}
+    times = stamps(0, 100)
+    # Polls of 10 readings per device, interleaved and newest first
+    for start in range(0, 100, 10):
+        device_ids = [device for device in series for _ in range(10)]
+        values = np.concatenate([series[device][start:start + 10][::-1] for device in series])
+        timestamps = [timestamp for _ in series for timestamp in times[start:start + 10][::-1]]
+        nominal, _, _ = gate.observe(model, device_ids, values, timestamps)
+        if start < 30:
+            check(f"nothing gated before warm-up (poll {start // 10})", not nominal.any())
+    check("batched updates match one reading at a time", all(
+        np.allclose(gate._mean[gate._index[device]], reference_stats(series[device], gate)[0])
+        and np.allclose(gate._var[gate._index[device]], reference_stats(series[device], gate)[1])
+        for device in series))
+
+    nominal, in_control, _ = gate.observe(model, ["a"] * 5, readings(rng, 5), stamps(100, 5))
+    check("in-control readings with no model risk yet go to the model", in_control.all() and not nominal.any())
+    gate.record_risk(model, ["a"] * 5, [0.0, 0.0, 1.0, 0.0, 0.0])
+    nominal, _, _ = gate.observe(model, ["a"] * 5, readings(rng, 5), stamps(105, 5))
+    check("a device whose in-control batch had a high risk is not gated", not nominal.any())
+    gate.record_risk(model, ["a"] * 5, np.zeros(5))
+    nominal, _, risk = gate.observe(model, ["a"] * 5, readings(rng, 5), stamps(110, 5))
+    check("in-control readings reuse the device's low risk", nominal.all() and np.all(risk == 0.0))
+
+    spike = readings(rng, 4)
+    for channel, jump in enumerate([15.0, 1.2, 0.08, 25.0]):
+        spike[channel, channel] += jump
+    nominal, in_control, _ = gate.observe(model, ["a"] * 4, spike, stamps(115, 4))
+    check("a spike on any one channel reaches the model", not nominal.any() and not in_control.any())
+    gate.record_risk(model, ["a"], [0.0])
+
+    drifting, passed = readings(rng, 200), []
+    drifting[:, 0] += 0.08 * np.arange(200)
+    for start in range(0, 200, 10):
+        nominal, in_control, _ = gate.observe(model, ["a"] * 10, drifting[start:start + 10], stamps(120 + start, 10))
+        passed.append(int((~nominal).sum()))
+        scored = np.flatnonzero(in_control & ~nominal)
+        gate.record_risk(model, ["a"] * len(scored), np.zeros(len(scored)))
+    check("a slow drift reaches the model at least every third poll",
+          max(np.diff(np.flatnonzero(passed), prepend=-1)) <= 3)
+
+    def state(device):
+        row = gate._index[device]
+        return int(gate._count[row]), gate._mean[row].tolist(), gate._var[row].tolist()
+
+    batch = readings(rng, 6)
+    device_ids, timestamps = ["b"] * 3 + ["c"] * 3, stamps(100, 3) * 2
+    gate.observe(model, device_ids, batch, timestamps)
+    before = {device: state(device) for device in ("b", "c")}
+    nominal, in_control, _ = gate.observe(model, device_ids, batch, timestamps)
+    check("observing the same batch again checks it but leaves the statistics alone",
+          in_control.all() and all(state(device) == before[device] for device in ("b", "c")))
+    gate.observe(model, ["b"] * 4, np.concatenate([batch[:1], batch[:1], readings(rng, 2)]),
+                 [stamps(101, 1)[0], stamps(103, 1)[0], stamps(103, 1)[0], stamps(104, 1)[0]])
+    check("a late reading is skipped and a repeated one folded in once", state("b")[0] == before["b"][0] + 2)
+    gate.observe(model, ["c"] * 2, readings(rng, 2), [None, None])
+    check("readings without a timestamp always count", state("c")[0] == before["c"][0] + 2)
+
+    gate.observe(object(), ["b"] * 5, readings(rng, 5), stamps(110, 5))
+    check("another model drops every cached risk", np.isnan(gate._risk[:len(gate._index)]).all())
+    stats = gate.stats()
+    check("stats report the pass-through rate",
+          stats["pass_through_rate"] == round(stats["passed"] / (stats["passed"] + stats["gated"]), 4))
+
+def check_app(workdir):
+    print("App:")
+    root = os.path.join(workdir, "registry")
+    ModelRegistry(root).publish(build_pipeline(os.path.join(workdir, "forest.joblib")))
+    os.environ.update(MODEL_REGISTRY_DIR=root, MODEL_WATCH_INTERVAL="0", APP_WARMUP="0", SENSOR_CACHE_TTL="0",
+                      PREDICTION_BUFFER_SIZE="10", TIMESERIES_DB_PATH=os.path.join(workdir, "app.db"))
+    import app
+    app.create_app()
+    app.ANOMALY_GATE = True
+    table = StubTable([])
+    app.table_resource.set(table)
+    client = app.app.test_client()
+
+    rng = np.random.default_rng(1)
+    device_id = app.DEFAULT_DEVICE_ID
+    now = datetime.now() - timedelta(hours=1)
+    outliers = 0
+    for poll in range(8):
+        values = readings(rng, 10)
+        if poll >= 5:
+            values[3, 0] += 20  # one overheating reading per poll
+            outliers += 1
+        for i, row in enumerate(values):
+            table.put_item(Item={"deviceId": device_id, "Machine_Type": "Type_A",
+                                 "timestamp": (now + timedelta(seconds=4 * (poll * 10 + i))).strftime(
+                                     "%Y-%m-%dT%H:%M:%S.%f"),
+                                 **{channel: Decimal(f"{value:.4f}") for channel, value in zip(SENSOR_CHANNELS, row)}})
+        model_rows = metrics.SCORED_ROWS.value(source="model") + metrics.SCORED_ROWS.value(source="cache")
+        response = client.get(f'/predict?devices={device_id}')
+        passed = metrics.SCORED_ROWS.value(source="model") + metrics.SCORED_ROWS.value(source="cache") - model_rows
+        if poll == 7:
+            check("after warm-up only outliers and re-anchoring readings reach the model",
+                  response.status_code == 200 and 1 <= passed <= 3)
+            check("the overheating reading scores high",
+                  max(prediction["risk"] for prediction in response.get_json()) == 1.0)
+
+    stats = client.get('/debug/anomaly-gate-stats').get_json()
+    check("/debug/anomaly-gate-stats reports the gate", stats["enabled"] and stats["devices"] == 1
+          and stats["gated"] > 0 and 0 < stats["pass_through_rate"] < 1)
+    body = client.get('/metrics').get_data(as_text=True)
+    check("/metrics exports gated and passed readings", f'anomaly_gate_readings_total{{outcome="gated"}} '
+          f'{stats["gated"]}' in body and 'scored_readings_total{source="anomaly_gate"}' in body)
+    print(f"  pass-through rate {stats['pass_through_rate']:.1%} over {stats['gated'] + stats['passed']} readings "
+          f"({outliers} outliers)")
+    app.ANOMALY_GATE = False
+
+def main():
+    check_gate()
+    with tempfile.TemporaryDirectory() as workdir:
+        check_app(workdir)
+
+    finish("anomaly gate")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Checks for backfill.py against a generated fixture dataset.
+
+Usage: python verify_backfill.py [--rows 20000]
+
+Runs a multi-process parallel-scan backfill over a JSON lines fixture, then
+checks that every reading was scored exactly once, and that a segment
+interrupted mid-scan resumes from its checkpoint without gaps or duplicates.
+Exits non-zero if any check fails.
+"""
+import argparse
+import glob
+import json
+import os
+import tempfile
+
+import numpy as np
+import pyarrow.parquet as pq
+
+import backfill
+from stub_table import StubTable
+from verify_helpers import check, finish
+
+def write_fixture(path, rows, devices=25):
+    rng = np.random.default_rng(3)
+    with open(path, "w") as f:
+        for i in range(rows):
+            f.write(json.dumps({
+                "deviceId": f"device-{i % devices:02d}",
+                "timestamp": f"2025-05-{1 + i // 86400 % 28:02d}T{i // 3600 % 24:02d}:{i // 60 % 60:02d}:{i % 60:02d}.{i:06d}",
+                "Temperature": round(float(rng.normal(70, 8)), 2),
+                "Vibration": round(float(rng.normal(1.5, 0.6)), 3),
+                "Power_Usage": round(float(rng.normal(0.22, 0.04)), 4),
+                "Humidity": round(float(rng.normal(45, 10)), 2),
+                "Pressure": round(float(rng.normal(30, 4)), 2),
+                "Machine_Type": ["Type_A", "Type_B", "Type_C"][i % 3],
+            }) + "\n")
+
+def read_output(output_dir, pattern="*.parquet"):
+    files = sorted(glob.glob(os.path.join(output_dir, pattern)))
+    return pq.ParquetDataset(files).read().to_pandas() if files else None
+
+class FailingTable:
+    """Wraps a table and raises after a number of scan calls, to simulate a crash"""
+
+    def __init__(self, table, fail_after):
+        self.table = table
+        self.fail_after = fail_after
+
+    def scan(self, **kwargs):
+        if self.fail_after == 0:
+            raise RuntimeError("simulated crash")
+        self.fail_after -= 1
+        return self.table.scan(**kwargs)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=20000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        fixture = os.path.join(workdir, "readings.jsonl")
+        write_fixture(fixture, args.rows)
+
+        print("Parallel backfill:")
+        output_dir = os.path.join(workdir, "full")
+        backfill.run_backfill(output_dir, segments=4, workers=2, chunk_size=3000, page_size=500, fixture=fixture)
+        result = read_output(output_dir)
+        check("every reading written", len(result) == args.rows)
+        check("no duplicate readings", not result.duplicated(["deviceId", "timestamp"]).any())
+        check("risk scored for every row", result["risk"].between(0, 1).all())
+        part_rows = [pq.ParquetFile(path).metadata.num_rows for path in glob.glob(os.path.join(output_dir, "*.parquet"))]
+        check("parts bounded by chunk size + one page", max(part_rows) <= 3000 + 500)
+
+        parts_before = len(glob.glob(os.path.join(output_dir, "*.parquet")))
+        backfill.run_backfill(output_dir, segments=4, workers=2, chunk_size=3000, page_size=500, fixture=fixture)
+        check("re-run skips finished segments", len(glob.glob(os.path.join(output_dir, "*.parquet"))) == parts_before)
+
+        print("Resume after interruption:")
+        resume_dir = os.path.join(workdir, "resume")
+        os.makedirs(os.path.join(resume_dir, "checkpoints"))
+        table = StubTable(backfill.load_fixture(fixture))
+        backfill.init_worker("IoT_Sensor_Data", fixture, "pipeline.joblib")
+        backfill.worker_table = FailingTable(table, fail_after=9)
+        try:
+            backfill.backfill_segment(resume_dir, 0, 1, chunk_size=2000, page_size=500)
+            check("simulated crash raised", False)
+        except RuntimeError:
+            checkpoint = backfill.read_checkpoint(resume_dir, 0)
+            check("checkpoint saved before the crash", checkpoint["parts"] > 0 and not checkpoint["done"])
+
+        backfill.worker_table = table
+        checkpoint = backfill.backfill_segment(resume_dir, 0, 1, chunk_size=2000, page_size=500)
+        resumed = read_output(resume_dir)
+        check("resumed segment completes", checkpoint["done"] and checkpoint["rows"] == args.rows)
+        check("resume writes no duplicates or gaps",
+              len(resumed) == args.rows and not resumed.duplicated(["deviceId", "timestamp"]).any())
+
+    finish("backfill")
+
+if __name__ == "__main__":
+    main()
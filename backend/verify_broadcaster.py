@@ -0,0 +1,191 @@
+"""
+Checks for Broadcaster and the /stream/predictions server-sent event stream.
+
+Usage: python verify_broadcaster.py [--publishers 4] [--events 2000]
+
+Checks that a subscriber whose queue is full loses its oldest events, keeps
+the newest in order and is counted in `dropped`, without holding back other
+subscribers, including under concurrent publishers. Then serves a 100-tree
+forest against a StubTable and reads /stream/predictions: the snapshot and
+prediction events are well-formed SSE frames, only the requested devices'
+predictions are sent, a stalled stream gets the newest events after overflow,
+and closing a stream, read or not, unsubscribes it. Exits non-zero if any
+check fails.
+"""
+import argparse
+import json
+import os
+import queue
+import tempfile
+import threading
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import numpy as np
+
+from broadcaster import Broadcaster
+from model_registry import ModelRegistry
+from stub_table import StubTable
+from verify_helpers import build_pipeline, check, finish
+
+def drain(subscription):
+    events = []
+    while True:
+        try:
+            events.append(subscription.get_nowait())
+        except queue.Empty:
+            return events
+
+def check_broadcaster(publishers, events):
+    print("Broadcaster:")
+    broadcaster = Broadcaster(max_queue=5)
+    stalled = broadcaster.subscribe()
+    reader = broadcaster.subscribe()
+    received = []
+    for i in range(12):
+        broadcaster.publish("predictions", i)
+        received.extend(drain(reader))
+    check("a full queue drops its oldest events and keeps the newest in order",
+          drain(stalled) == [("predictions", i) for i in range(7, 12)])
+    check("drops are counted", broadcaster.stats() == {"subscribers": 2, "published": 12, "dropped": 7, "max_queue": 5})
+    check("a subscriber that keeps up gets every event", received == [("predictions", i) for i in range(12)])
+
+    broadcaster.unsubscribe(stalled)
+    broadcaster.publish("predictions", 12)
+    check("an unsubscribed queue gets nothing more", broadcaster.subscriber_count() == 1 and drain(stalled) == [])
+    broadcaster.unsubscribe(stalled)
+    check("unsubscribing twice is harmless", broadcaster.subscriber_count() == 1)
+
+    # Concurrent publishers into one slow subscriber: each publisher's events still arrive in order, none twice
+    broadcaster = Broadcaster(max_queue=50)
+    subscription = broadcaster.subscribe()
+    received = []
+    done = threading.Event()
+
+    def read():
+        while not done.is_set() or not subscription.empty():
+            try:
+                received.append(subscription.get(timeout=0.01)[1])
+            except queue.Empty:
+                pass
+
+    def publish(publisher):
+        for i in range(events):
+            broadcaster.publish("predictions", (publisher, i))
+
+    reader_thread = threading.Thread(target=read)
+    reader_thread.start()
+    threads = [threading.Thread(target=publish, args=(p,)) for p in range(publishers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    done.set()
+    reader_thread.join()
+    stats = broadcaster.stats()
+    check(f"{publishers} concurrent publishers: received + dropped = published",
+          stats["published"] == publishers * events and len(received) + stats["dropped"] == stats["published"])
+    check("each publisher's events arrive in order, none twice",
+          all([i for p, i in received if p == publisher] == sorted(set(i for p, i in received if p == publisher))
+              for publisher in range(publishers)))
+
+class EventStream:
+    """The frames of one streamed /stream/predictions response"""
+
+    def __init__(self, response):
+        self.response = response
+        self.chunks = iter(response.response)
+
+    def next_frame(self):
+        """(event, data) of the next frame, after checking it is `event: ...`, `data: <JSON>` and a blank line"""
+        chunk = next(self.chunks)
+        text = chunk.decode() if isinstance(chunk, bytes) else chunk
+        lines = text.split("\n")
+        assert len(lines) == 4 and lines[2:] == ["", ""], f"malformed frame {text!r}"
+        assert lines[0].startswith("event: ") and lines[1].startswith("data: "), f"malformed frame {text!r}"
+        return lines[0][len("event: "):], json.loads(lines[1][len("data: "):])
+
+    def close(self):
+        self.response.close()
+
+def make_items(rng, device_id, count, newest):
+    return [{"deviceId": device_id, "timestamp": (newest - timedelta(minutes=i)).strftime("%Y-%m-%dT%H:%M:%S.%f"),
+             "Temperature": Decimal(f"{rng.uniform(20, 100):.2f}"), "Vibration": Decimal(f"{rng.uniform(20, 100):.2f}"),
+             "Power_Usage": Decimal(f"{rng.uniform(20, 100):.2f}"), "Humidity": Decimal(f"{rng.uniform(20, 100):.2f}"),
+             "Pressure": Decimal(f"{rng.uniform(20, 100):.2f}"), "Machine_Type": "Type_A"}
+            for i in range(count)]
+
+def check_stream(workdir):
+    print("/stream/predictions:")
+    root = os.path.join(workdir, "registry")
+    ModelRegistry(root).publish(build_pipeline(os.path.join(workdir, "forest.joblib")))
+    # The background poller only watches a device without readings, so every event below is published here
+    os.environ.update(MODEL_REGISTRY_DIR=root, MODEL_WATCH_INTERVAL="0", APP_WARMUP="0", SENSOR_CACHE_TTL="0",
+                      PREDICTION_STREAM_QUEUE_SIZE="3", PREDICTION_STREAM_INTERVAL="3600",
+                      PREDICTION_STREAM_DEVICES="Idle_Device", TIMESERIES_DB_PATH=os.path.join(workdir, "app.db"))
+    import app
+    app.create_app()
+    rng = np.random.default_rng(0)
+    now = datetime.now() - timedelta(minutes=5)
+    devices = ["Press_A", "Press_B", "Press_C"]
+    table = StubTable([item for device_id in devices for item in make_items(rng, device_id, 5, now)])
+    app.table_resource.set(table)
+    app.current_table()
+    client = app.app.test_client()
+    broadcaster = app.prediction_broadcaster
+    app.update_predictions(devices)
+
+    stream = EventStream(client.get('/stream/predictions?devices=Press_A,Press_B', buffered=False))
+    check("the response is an uncached event stream", stream.response.mimetype == "text/event-stream"
+          and stream.response.headers["Cache-Control"] == "no-cache")
+    event, data = stream.next_frame()
+    check("the first frame is a snapshot of the requested devices' stored predictions", event == "snapshot"
+          and data == app.prediction_store.latest("Press_A") + app.prediction_store.latest("Press_B"))
+    check("an open stream is subscribed", broadcaster.subscriber_count() == 1)
+
+    for device_id in devices:
+        for item in make_items(rng, device_id, 2, now + timedelta(minutes=2)):
+            table.put_item(Item=item)
+    added, _ = app.update_predictions(devices)
+    event, data = stream.next_frame()
+    check("newly scored readings arrive as a predictions frame, other devices' filtered out", event == "predictions"
+          and data == [prediction for prediction in added if prediction["machine_id"] != "Press_C"] and len(data) == 4)
+    broadcaster.publish("predictions", [{"machine_id": "Press_C", "failure_risk": 0.5}])
+    broadcaster.publish("predictions", [{"machine_id": "Press_B", "failure_risk": 0.25}])
+    check("an event with none of the requested devices sends no frame",
+          stream.next_frame() == ("predictions", [{"machine_id": "Press_B", "failure_risk": 0.25}]))
+
+    print("Overflow and disconnects:")
+    stalled = EventStream(client.get('/stream/predictions?devices=Press_A', buffered=False))
+    stalled.next_frame()
+    dropped = broadcaster.stats()["dropped"]
+    for i in range(8):
+        broadcaster.publish("predictions", [{"machine_id": "Press_A", "failure_risk": i / 10}])
+    frames = [stalled.next_frame()[1][0]["failure_risk"] for _ in range(3)]
+    check("a stalled stream resumes with the newest PREDICTION_STREAM_QUEUE_SIZE events",
+          frames == [0.5, 0.6, 0.7] and stream.next_frame()[1][0]["failure_risk"] == 0.5)
+    check("/debug/stream-stats counts both streams' drops",
+          client.get('/debug/stream-stats').get_json()["dropped"] == dropped + 2 * 5)
+    stalled.close()
+    check("closing a stream unsubscribes it", broadcaster.subscriber_count() == 1)
+    stream.close()
+    check("closing the other leaves no subscribers", broadcaster.subscriber_count() == 0)
+    # The test client always reads the first frame, so call the view to close a stream the server never started
+    with app.app.test_request_context('/stream/predictions'):
+        app.stream_predictions().close()
+    check("a stream closed before its first frame leaves no subscriber behind", broadcaster.subscriber_count() == 0)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--publishers", type=int, default=4)
+    parser.add_argument("--events", type=int, default=2000)
+    args = parser.parse_args()
+
+    check_broadcaster(args.publishers, args.events)
+    with tempfile.TemporaryDirectory() as workdir:
+        check_stream(workdir)
+
+    finish("broadcaster")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Equivalence checks for CompiledForest against sklearn.
+
+Usage: python verify_compiled_forest.py [--pipeline pipeline.joblib]
+
+Compares predict and predict_proba bit for bit on:
+  * the bundled model step, with random inputs and inputs sitting exactly on split thresholds
+  * freshly fitted pipelines (binary and multi-class) built on the bundled preprocessor
+Exits non-zero if any output differs.
+"""
+import argparse
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.pipeline import Pipeline
+
+from compiled_forest import CompiledForest
+from scoring import FEATURE_COLUMNS, get_model_step
+from verify_helpers import check_equal, failures, finish
+
+def boundary_inputs(forest, rng, count):
+    """Inputs whose features sit exactly on split thresholds of the fitted trees"""
+    X = rng.normal(0, 3, size=(count, forest.n_features_in_))
+    for tree in (estimator.tree_ for estimator in forest.estimators_[:5]):
+        internal = np.flatnonzero(tree.children_left != -1)
+        picks = rng.choice(internal, size=count)
+        X[np.arange(count), tree.feature[picks]] = tree.threshold[picks]
+    return X
+
+def compare_model(label, model, X):
+    compiled = CompiledForest(model)
+    check_equal(f"{label} predict_proba", model.predict_proba(X), compiled.predict_proba(X))
+    check_equal(f"{label} predict", model.predict(X), compiled.predict(X))
+
+def synthetic_readings(rng, count):
+    return pd.DataFrame({
+        "Temperature": rng.normal(70, 8, count),
+        "Vibration": rng.normal(1.5, 0.6, count),
+        "Power_Usage": rng.normal(0.22, 0.04, count),
+        "Humidity": rng.normal(45, 10, count),
+        "Pressure": rng.normal(30, 4, count),
+        "Machine_Type_Code": rng.integers(0, 3, count),
+    }, columns=FEATURE_COLUMNS)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pipeline", default="pipeline.joblib")
+    args = parser.parse_args()
+    rng = np.random.default_rng(7)
+
+    pipeline = joblib.load(args.pipeline)
+    preprocessor = pipeline.named_steps['preprocessor']
+    model = get_model_step(pipeline)
+
+    print(f"Bundled model step ({type(model).__name__}, {model.n_features_in_} features):")
+    for size in (1, 10, 1000, 20000):
+        compare_model(f"random x{size}", model, rng.normal(0, 50, size=(size, model.n_features_in_)))
+    compare_model("thresholds x5000", model, boundary_inputs(model, rng, 5000))
+
+    compiled = CompiledForest(model)
+    try:
+        compiled.predict(np.zeros((1, model.n_features_in_ + 1)))
+        print("  FAIL  wrong feature count accepted")
+        failures.append("feature count check")
+    except ValueError:
+        print("  OK    wrong feature count rejected")
+
+    # End-to-end pipelines on the bundled preprocessor
+    readings = synthetic_readings(rng, 4000)
+    risk = 0.04 * (readings["Temperature"] - 70) + 1.5 * (readings["Vibration"] - 1.5)
+    targets = {
+        "binary": (risk + rng.normal(0, 0.5, len(readings)) > 0.6).astype(int),
+        "multi-class": np.digitize(risk + rng.normal(0, 0.5, len(readings)), [-0.5, 0.6]),
+    }
+    for label, y in targets.items():
+        fitted = Pipeline([
+            ('preprocessor', preprocessor),
+            ('model', RandomForestClassifier(n_estimators=25, class_weight='balanced', random_state=42))
+        ])
+        fitted.named_steps['model'].fit(preprocessor.transform(readings), y)
+        print(f"Fitted {label} pipeline:")
+        holdout = synthetic_readings(rng, 5000)
+        compiled = CompiledForest(fitted.named_steps['model'])
+        transformed = preprocessor.transform(holdout)
+        check_equal(f"pipeline.predict_proba ({label})", fitted.predict_proba(holdout), compiled.predict_proba(transformed))
+        check_equal(f"pipeline.predict ({label})", fitted.predict(holdout), compiled.predict(transformed))
+
+    # Small-batch latency, the case the compiled engine targets
+    print("Small-batch latency (best of 200):")
+    X = rng.normal(0, 50, size=(10, model.n_features_in_))
+    for label, fn in (("sklearn", model.predict), ("compiled", CompiledForest(model).predict)):
+        best = float("inf")
+        for _ in range(200):
+            start = time.perf_counter()
+            fn(X)
+            best = min(best, time.perf_counter() - start)
+        print(f"  {label:<9} {best * 1e3:.3f} ms / 10 rows")
+
+    finish("equivalence")
+
+if __name__ == "__main__":
+    main()
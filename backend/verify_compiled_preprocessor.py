@@ -0,0 +1,179 @@
+"""
+Equivalence checks for CompiledPreprocessor against the fitted ColumnTransformer.
+
+Usage: python verify_compiled_preprocessor.py
+
+Compares transform() output bit for bit (float32 output against the
+transformer's output cast to float32) on:
+  * the bundled preprocessors (models/preproc.joblib and pipeline.joblib's), with row masks,
+    reused buffers, extra and reordered columns, and unknown categories
+  * ColumnTransformers using every supported option: StandardScaler without mean or std,
+    clipping MinMaxScaler, chained scalers, passthrough and remainder columns, and
+    OneHotEncoder with drop=None/'first'/'if_binary' and handle_unknown='ignore'
+Checks that unsupported transformers are left to sklearn, that scoring a
+freshly fitted pipeline gives the same risks either way, and that the app
+serves with the compiled encoder. Exits non-zero if any check fails.
+See bench_preprocessing.py for the time and memory saved.
+"""
+import os
+import tempfile
+
+import joblib
+import numpy as np
+from sklearn.compose import ColumnTransformer
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import MinMaxScaler, OneHotEncoder, PolynomialFeatures, StandardScaler
+
+from compiled_forest import CompiledForest
+from compiled_preprocessor import CompiledPreprocessor, compile_preprocessor, model_input_dtype
+from model_registry import ModelRegistry
+from scoring import FEATURE_COLUMNS, get_model_step, items_to_frame, preprocessing_steps, score_frame
+from stub_table import StubTable
+from verify_helpers import NUMERIC, build_pipeline, bundled_preprocessor, check, finish, sensor_frame
+
+def same(expected, actual):
+    return expected.shape == actual.shape and expected.dtype == actual.dtype and np.array_equal(expected, actual)
+
+def raises(function):
+    try:
+        function()
+    except ValueError:
+        return True
+    return False
+
+def forest_pipeline(path=None, trees=100):
+    """The bundled pipeline's preprocessing with a forest fitted on its output"""
+    frame = sensor_frame(5000, seed=1)
+    failing = (frame["Temperature"] > 80) | (frame["Vibration"] > 2.3) | (frame["Power_Usage"] > 0.28)
+    return build_pipeline(path, frame, failing, RandomForestClassifier(n_estimators=trees, max_depth=8, random_state=0),
+                          bundled_preprocessor())
+
+def check_bundled(label, transformer):
+    print(f"{label}:")
+    compiled = CompiledPreprocessor(transformer)
+    compiled32 = CompiledPreprocessor(transformer, dtype=np.float32)
+    for size in (1, 10, 1000, 20000):
+        frame = sensor_frame(size, seed=size)
+        check(f"x{size}", same(transformer.transform(frame), compiled.transform(frame)))
+    frame = sensor_frame(5000, seed=3)
+    rows = np.random.default_rng(3).random(len(frame)) < 0.7
+    expected = transformer.transform(frame[rows])
+    check("row mask", same(expected, compiled.transform(frame, rows)))
+    check("float32 output is the float64 output rounded",
+          same(expected.astype(np.float32), compiled32.transform(frame, rows)))
+
+    buffer = compiled32.take_buffer(5000)
+    check("a pooled buffer holds the batch", same(expected.astype(np.float32), compiled32.transform(frame, rows, out=buffer)))
+    compiled32.give_buffer(buffer)
+    small = sensor_frame(7, seed=4)
+    reused = compiled32.take_buffer(7)
+    check("the buffer is reused for a smaller batch", reused is buffer and
+          same(transformer.transform(small).astype(np.float32), compiled32.transform(small, out=reused)))
+    compiled32.give_buffer(reused)
+
+    shuffled = frame[["timestamp", "Pressure", "Machine_Type_Code"] + NUMERIC[::-1]]
+    check("columns are picked by name", same(transformer.transform(frame), compiled.transform(shuffled)))
+    floats = frame.assign(Machine_Type_Code=frame["Machine_Type_Code"].astype(np.float64))
+    check("float category codes", same(transformer.transform(floats), compiled.transform(floats)))
+    unknown = frame.copy()
+    unknown.loc[10, "Machine_Type_Code"] = 7
+    check("an unknown category is an error, as in sklearn",
+          raises(lambda: transformer.transform(unknown)) and raises(lambda: compiled.transform(unknown)))
+    check("a missing column is an error", raises(lambda: compiled.transform(frame.drop(columns=["Humidity"]))))
+
+def check_variants():
+    print("Supported transformers:")
+    fit = sensor_frame(3000, seed=6)
+    frame = sensor_frame(3000, seed=5)
+    frame["Temperature"] *= 1.5  # past MinMaxScaler's fitted range
+    frame["Machine_Type_Code"] = frame["Machine_Type_Code"].where(frame.index % 50 != 0, 9)  # unseen in fit
+    binary_fit = fit.assign(Machine_Type_Code=fit["Machine_Type_Code"] % 2)
+    binary = frame.assign(Machine_Type_Code=frame["Machine_Type_Code"] % 2)
+    variants = {
+        "StandardScaler(with_mean=False)": ([('s', StandardScaler(with_mean=False), NUMERIC)], "drop", fit, frame),
+        "StandardScaler(with_std=False)": ([('s', StandardScaler(with_std=False), NUMERIC)], "drop", fit, frame),
+        "MinMaxScaler(clip=True) past its range": ([('m', MinMaxScaler(clip=True), NUMERIC)], "drop", fit, frame),
+        "StandardScaler then MinMaxScaler": ([('p', Pipeline([('s', StandardScaler()), ('m', MinMaxScaler())]),
+                                                NUMERIC)], "drop", fit, frame),
+        "passthrough and remainder columns": ([('s', StandardScaler(), ["Temperature"]), ('p', 'passthrough', ["Pressure"])],
+                                              "passthrough", fit[FEATURE_COLUMNS], frame[FEATURE_COLUMNS]),
+        "OneHotEncoder(handle_unknown='ignore')": ([('o', OneHotEncoder(sparse_output=False, handle_unknown='ignore'),
+                                                     ["Machine_Type_Code"])], "drop", fit, frame),
+        "OneHotEncoder(drop='first', handle_unknown='ignore')": (
+            [('o', OneHotEncoder(drop='first', sparse_output=False, handle_unknown='ignore'), ["Machine_Type_Code"])],
+            "drop", fit, frame),
+        "OneHotEncoder(drop='if_binary')": ([('o', OneHotEncoder(drop='if_binary', sparse_output=False),
+                                              ["Machine_Type_Code"])], "drop", binary_fit, binary),
+    }
+    rows = np.arange(len(frame)) % 7 != 0
+    for label, (transformers, remainder, fit_frame, frame) in variants.items():
+        transformer = ColumnTransformer(transformers, remainder=remainder).fit(fit_frame)
+        compiled = CompiledPreprocessor(transformer)
+        check(label, same(transformer.transform(frame), compiled.transform(frame))
+              and same(transformer.transform(frame[rows]), compiled.transform(frame, rows)))
+
+    print("Unsupported transformers (left to sklearn):")
+    sample = items_to_frame([{"Machine_Type": machine_type} for machine_type in ("Type_A", "Type_B", "Type_C")])
+    unsupported = {
+        "PolynomialFeatures": ColumnTransformer([('p', PolynomialFeatures(), NUMERIC)]),
+        "string categories": ColumnTransformer([('o', OneHotEncoder(sparse_output=False), ["deviceId"])]),
+        "pandas output": ColumnTransformer([('s', StandardScaler(), NUMERIC)]).set_output(transform="pandas"),
+    }
+    for label, transformer in unsupported.items():
+        transformer.fit(fit)
+        check(label, compile_preprocessor([transformer], sample) is None)
+    check("more than one preprocessing step", compile_preprocessor([StandardScaler(), StandardScaler()], sample) is None)
+
+def check_scoring():
+    print("Scoring:")
+    pipeline = forest_pipeline(trees=30)
+    model = get_model_step(pipeline)
+    check("tree models take float32 features", model_input_dtype(model) == np.float32
+          and model_input_dtype(CompiledForest(model)) == np.float32)
+    compiled = compile_preprocessor(preprocessing_steps(pipeline), sensor_frame(3), dtype=model_input_dtype(model))
+    frame = sensor_frame(20000, seed=8, invalid=0.02)
+    risk, from_model = score_frame(pipeline, frame)
+    compiled_risk, compiled_from_model = score_frame(pipeline, frame, preprocessor=compiled)
+    check("score_frame risks are identical with the compiled encoder", np.array_equal(risk, compiled_risk)
+          and np.array_equal(from_model, compiled_from_model) and not from_model.all())
+    forest_risk, _ = score_frame(pipeline, frame, model=CompiledForest(model), preprocessor=compiled)
+    check("... and with a CompiledForest too", np.array_equal(risk, forest_risk))
+    proba = model.predict_proba(pipeline.named_steps['preprocessor'].transform(frame[from_model]))
+    check("predict_proba is identical on float32 features",
+          np.array_equal(proba, model.predict_proba(compiled.transform(frame, from_model))))
+
+def check_app(workdir):
+    print("App:")
+    root = os.path.join(workdir, "registry")
+    ModelRegistry(root).publish(forest_pipeline(os.path.join(workdir, "forest.joblib")))
+    os.environ.update(MODEL_REGISTRY_DIR=root, MODEL_WATCH_INTERVAL="0", APP_WARMUP="0", SHADOW_MODEL_VERSIONS="",
+                      TIMESERIES_DB_PATH=os.path.join(workdir, "app.db"))
+    import app
+    app.create_app()
+    app.table_resource.set(StubTable([]))
+    client = app.app.test_client()
+
+    info = client.get('/model-info').get_json()
+    check("/model-info reports compiled preprocessing", info.get("preprocessing") == "compiled")
+    model = app.current_model()
+    check("the serving encoder produces float32 features", model.compiled_preprocessor.dtype == np.float32)
+    readings = sensor_frame(500, seed=9)
+    readings["Machine_Type"] = np.array(["Type_A", "Type_B", "Type_C"])[readings["Machine_Type_Code"]]
+    body = readings.drop(columns=["Machine_Type_Code"]).to_dict(orient="records")
+    served = [row["risk"] for row in client.post('/predict/batch', json=body).get_json()]
+    expected, _ = score_frame(model.pipeline, readings)
+    check("/predict/batch risks match the fitted transformer's", served == [round(float(r), 3) for r in expected])
+
+def main():
+    check_bundled("models/preproc.joblib", joblib.load("models/preproc.joblib"))
+    check_bundled("pipeline.joblib preprocessor", joblib.load("pipeline.joblib").named_steps['preprocessor'])
+    check_variants()
+    check_scoring()
+    with tempfile.TemporaryDirectory() as workdir:
+        check_app(workdir)
+
+    finish("compiled preprocessor")
+
+if __name__ == "__main__":
+    main()
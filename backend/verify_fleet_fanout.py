@@ -0,0 +1,139 @@
+"""
+Checks for the multi-device fan-out behind /sensors?devices= and /predict?devices=.
+
+Usage: python verify_fleet_fanout.py [--devices 6] [--page-size 4]
+
+Serves a 100-tree forest from a temporary registry against a StubTable that
+returns at most --page-size items per response, so every device's query
+takes several pages. Checks that each device's newest readings are collected
+across pages (with the expected number of requests), that /sensors and
+/predict return every requested device's readings, and that a later /predict
+only fetches what is new. Then makes one device's queries fail: /sensors and
+/predict still answer with every other device, name the failed one in the
+X-Device-Errors header and leave its watermark alone, a request for only that
+device is a 500, and once it recovers the next poll scores its readings.
+Exits non-zero if any check fails.
+"""
+import argparse
+import json
+import math
+import os
+import tempfile
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import numpy as np
+
+from model_registry import ModelRegistry
+from stub_table import StubTable, _split_condition
+from verify_helpers import build_pipeline, check, finish
+
+# StubTable whose queries for the devices in `failing` raise, as a throttled or unreachable partition would
+class FlakyTable(StubTable):
+    def __init__(self, items, **kwargs):
+        super().__init__(items, **kwargs)
+        self.failing = set()
+
+    def query(self, KeyConditionExpression, **kwargs):
+        device_id = _split_condition(KeyConditionExpression)[0][2][0]
+        if device_id in self.failing:
+            raise RuntimeError(f"ProvisionedThroughputExceededException for {device_id}")
+        return super().query(KeyConditionExpression, **kwargs)
+
+def make_items(rng, device_id, count, newest):
+    """count readings for device_id, one a minute back from newest"""
+    return [{"deviceId": device_id, "timestamp": (newest - timedelta(minutes=i)).strftime("%Y-%m-%dT%H:%M:%S.%f"),
+             "Temperature": Decimal(f"{rng.uniform(20, 100):.2f}"), "Vibration": Decimal(f"{rng.uniform(20, 100):.2f}"),
+             "Power_Usage": Decimal(f"{rng.uniform(20, 100):.2f}"), "Humidity": Decimal(f"{rng.uniform(20, 100):.2f}"),
+             "Pressure": Decimal(f"{rng.uniform(20, 100):.2f}"), "Machine_Type": "Type_B"}
+            for i in range(count)]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--devices", type=int, default=6)
+    parser.add_argument("--page-size", type=int, default=4)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        root = os.path.join(workdir, "registry")
+        ModelRegistry(root).publish(build_pipeline(os.path.join(workdir, "forest.joblib")))
+        os.environ.update(MODEL_REGISTRY_DIR=root, MODEL_WATCH_INTERVAL="0", APP_WARMUP="0", SENSOR_CACHE_TTL="0",
+                          PREDICTION_BUFFER_SIZE="10", TIMESERIES_DB_PATH=os.path.join(workdir, "app.db"))
+        import app
+        app.create_app()
+        rng = np.random.default_rng(0)
+        now = datetime.now() - timedelta(minutes=1)
+        devices = [f"Line_{i:02d}" for i in range(args.devices)]
+        counts = {device_id: 30 if i else 7 for i, device_id in enumerate(devices)}  # the first has fewer than a page's worth
+        items = [item for device_id in devices for item in make_items(rng, device_id, counts[device_id], now)]
+        table = FlakyTable(items, page_size=args.page_size)
+        app.table_resource.set(table)
+        app.current_table()
+        client = app.app.test_client()
+        newest = {device_id: sorted((item["timestamp"] for item in items if item["deviceId"] == device_id),
+                                    reverse=True) for device_id in devices}
+
+        print("Pagination:")
+        pages = {device_id: math.ceil(min(counts[device_id], 24) / args.page_size) for device_id in devices}
+        for device_id in devices[:2]:
+            before = table.query_count
+            readings = app.query_device_readings(device_id, limit=24, window=timedelta(hours=6))
+            check(f"{device_id}: its {min(counts[device_id], 24)} newest readings in {pages[device_id]} pages",
+                  readings.timestamps == newest[device_id][:24] and table.query_count - before == pages[device_id])
+
+        print("/sensors:")
+        before = table.query_count
+        response = client.get(f"/sensors?devices={','.join(devices)}")
+        rows = response.get_json()
+        check("every device's newest readings, newest first overall", response.status_code == 200
+              and all([row["timestamp"] for row in rows if row["device_id"] == device_id] == newest[device_id][:24]
+                      for device_id in devices)
+              and [row["timestamp"] for row in rows] == sorted((row["timestamp"] for row in rows), reverse=True))
+        check("one paginated query per device", table.query_count - before == sum(pages.values()))
+
+        print("/predict:")
+        response = client.get(f"/predict?devices={','.join(devices)}")
+        stored = {device_id: [p["timestamp"] for p in app.prediction_store.latest(device_id)] for device_id in devices}
+        check("every device's newest readings are scored", response.status_code == 200
+              and all(stored[device_id] == newest[device_id][:10] for device_id in devices))
+        for device_id in devices[:2]:
+            for item in make_items(rng, device_id, 3, now + timedelta(seconds=30)):
+                table.put_item(Item=item)
+        before = table.query_count
+        client.get(f"/predict?devices={','.join(devices)}")
+        check("the next poll fetches only new readings, one page per device", table.query_count - before == len(devices)
+              and all(app.prediction_store.latest(device_id)[0]["timestamp"] > newest[device_id][0]
+                      for device_id in devices[:2]))
+
+        print("One device failing:")
+        app.prediction_store.clear()
+        broken = devices[2]
+        healthy = [device_id for device_id in devices if device_id != broken]
+        table.failing.add(broken)
+        response = client.get(f"/sensors?devices={','.join(devices)}")
+        rows = response.get_json()
+        check("/sensors answers with every other device's readings", response.status_code == 200
+              and {row["device_id"] for row in rows} == set(healthy))
+        check("and names the failed device in X-Device-Errors",
+              list(json.loads(response.headers["X-Device-Errors"])) == [broken]
+              and "ProvisionedThroughputExceededException" in json.loads(response.headers["X-Device-Errors"])[broken])
+        response = client.get(f"/predict?devices={','.join(devices)}")
+        check("/predict scores every other device and names the failed one", response.status_code == 200
+              and sorted(app.prediction_store.device_ids()) == sorted(healthy)
+              and list(json.loads(response.headers["X-Device-Errors"])) == [broken])
+        check("the failed device's watermark doesn't move", app.prediction_store.last_timestamp(broken) is None)
+        check("a request for only the failed device is a 500 naming it",
+              client.get(f"/predict?devices={broken}").status_code == 500
+              and client.get(f"/sensors?devices={broken}").get_json()["error"].startswith("Query failed"))
+        check("a request without it has no X-Device-Errors",
+              "X-Device-Errors" not in client.get(f"/sensors?devices={','.join(healthy)}").headers)
+        table.failing.clear()
+        response = client.get(f"/predict?devices={','.join(devices)}")
+        check("once it recovers, the next poll scores its readings", response.status_code == 200
+              and "X-Device-Errors" not in response.headers
+              and [p["timestamp"] for p in app.prediction_store.latest(broken)] == newest[broken][:10])
+
+    finish("fan-out")
+
+if __name__ == "__main__":
+    main()
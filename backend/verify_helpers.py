@@ -0,0 +1,100 @@
+"""
+Shared helpers for the verify_*.py checks and the bench_*.py benchmarks.
+
+check() prints one OK/FAIL line and records failures; finish() prints the
+summary and exits non-zero if any check failed. build_pipeline() fits the
+small pipelines the scripts publish to a temporary model registry, on
+uniform_frame() or sensor_frame() data.
+"""
+import sys
+
+import numpy as np
+import pandas as pd
+
+from scoring import FEATURE_COLUMNS
+
+NUMERIC = ["Temperature", "Vibration", "Power_Usage", "Humidity"]
+
+failures = []
+
+def check(name, condition):
+    print(f"  {'OK  ' if condition else 'FAIL'}  {name}")
+    if not condition:
+        failures.append(name)
+
+def check_equal(name, expected, actual):
+    """check() that two arrays are identical, reporting the largest difference if not"""
+    if expected.shape == actual.shape and np.array_equal(expected, actual):
+        print(f"  OK    {name}")
+    else:
+        diff = np.max(np.abs(expected - actual)) if expected.shape == actual.shape else "shape mismatch"
+        print(f"  FAIL  {name} (max abs diff: {diff})")
+        failures.append(name)
+
+def finish(label):
+    if failures:
+        print(f"{len(failures)} check(s) failed")
+        sys.exit(1)
+    print(f"All {label} checks passed")
+
+def uniform_frame(count, seed=0):
+    """FEATURE_COLUMNS drawn uniformly from 20-100"""
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame(rng.uniform(20, 100, size=(count, len(FEATURE_COLUMNS))), columns=FEATURE_COLUMNS)
+
+def sensor_frame(count, seed=0, invalid=0.0):
+    """A serving-shaped frame; a share of rows gets a NaN Temperature, as unparseable readings do"""
+    rng = np.random.default_rng(seed)
+    frame = pd.DataFrame({
+        "Temperature": rng.normal(70, 8, count),
+        "Vibration": rng.normal(1.5, 0.6, count),
+        "Power_Usage": rng.normal(0.22, 0.04, count),
+        "Humidity": rng.normal(45, 10, count),
+        "Pressure": rng.normal(30, 4, count),
+        "Machine_Type_Code": rng.integers(0, 3, count),
+        "deviceId": ["ESP8266_IoT"] * count,
+        "timestamp": [f"2025-05-29T10:00:00.{i:06d}" for i in range(count)],
+    })
+    frame.loc[rng.random(count) < invalid, "Temperature"] = np.nan
+    return frame
+
+def bundled_preprocessor():
+    """An unfitted ColumnTransformer shaped like the bundled pipeline's"""
+    from sklearn.compose import ColumnTransformer
+    from sklearn.pipeline import Pipeline
+    from sklearn.preprocessing import OneHotEncoder, StandardScaler
+
+    return ColumnTransformer([
+        ('num', Pipeline([('scale', StandardScaler())]), NUMERIC),
+        ('cat', Pipeline([('ohe', OneHotEncoder(drop='first', sparse_output=False))]), ['Machine_Type_Code']),
+    ])
+
+def build_pipeline(path=None, frame=None, labels=None, model=None, preprocessor='passthrough'):
+    """
+    A pipeline fitted on frame[FEATURE_COLUMNS] (default uniform_frame(2000))
+    to labels (default Temperature > 75). model defaults to a 100-tree forest
+    of depth 8. preprocessor is applied to every feature column; a
+    ColumnTransformer is used as is, and None fits the model alone on a bare
+    array. Dumped to path and the path returned if given, else the pipeline.
+    """
+    import joblib
+    from sklearn.compose import ColumnTransformer
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.pipeline import Pipeline
+
+    frame = (uniform_frame(2000) if frame is None else frame)[FEATURE_COLUMNS]
+    if labels is None:
+        labels = frame["Temperature"] > 75
+    if model is None:
+        model = RandomForestClassifier(n_estimators=100, max_depth=8, random_state=0)
+    steps = [('model', model)]
+    if preprocessor is not None:
+        if type(preprocessor).__name__ != "ColumnTransformer":
+            preprocessor = ColumnTransformer([('sensors', preprocessor, FEATURE_COLUMNS)])
+        steps.insert(0, ('preprocessor', preprocessor))
+    pipeline = Pipeline(steps)
+    pipeline.fit(frame if preprocessor is not None else frame.to_numpy(), np.asarray(labels).astype(int))
+    if path is None:
+        return pipeline
+    joblib.dump(pipeline, path)
+    return path
@@ -0,0 +1,247 @@
+"""
+Checks for POST /ingest and its micro-batching worker.
+
+Usage: python verify_ingest.py [--bursts 20] [--clients 16] [--rows 8]
+
+Checks MicroBatcher's flush by size and by deadline, its row bound and
+error handling. Then serves a 100-tree forest from a temporary registry and
+checks that ingested readings get the risks /predict/batch gives them, reach
+the per-device latest state (/predict/latest) and the prediction stream,
+are written back through batch_writer with INGEST_WRITE_BACK, and that a
+full queue answers 503. It checks that pushed readings don't move the
+watermark /predict polls DynamoDB from, that late and duplicate readings are
+counted as rejected, and that INGEST_MAX_DEVICES caps new devices. Finally it sends --bursts bursts of --clients
+concurrent requests of --rows readings each. It checks that every accepted
+reading is scored exactly once, and reports queue-to-scored latency
+percentiles, throughput and batch sizes. bench_ingest.py measures the same
+over real HTTP against synchronous /predict/batch. Exits non-zero if any
+check fails.
+"""
+import argparse
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from ingest import MicroBatcher
+from model_registry import ModelRegistry
+from stub_table import StubTable
+from verify_helpers import build_pipeline, check, finish
+
+def make_readings(rng, device_ids, per_device, start):
+    """Posted readings, per_device for each device at 1-second steps from start"""
+    return [{"deviceId": device_id,
+             "timestamp": (start + timedelta(seconds=i)).strftime("%Y-%m-%dT%H:%M:%S.%f"),
+             "Temperature": round(float(rng.normal(70, 8)), 1), "Vibration": round(float(rng.uniform(0, 100)), 2),
+             "Power_Usage": round(float(rng.uniform(0.1, 0.4)), 3), "Humidity": round(float(rng.normal(45, 5)), 1),
+             "Pressure": round(float(rng.normal(30, 2)), 1), "Machine_Type": ("Type_A", "Type_B", "Type_C")[i % 3]}
+            for device_id in device_ids for i in range(per_device)]
+
+def check_batcher():
+    print("MicroBatcher:")
+    handled = []
+    batcher = MicroBatcher(lambda chunks: handled.append(sum(chunks)), batch_size=256, max_wait=0.02)
+
+    class Rows(int):
+        def __len__(self):
+            return int(self)
+
+    start = time.monotonic()
+    batcher.put(Rows(1))
+    batcher.drain(timeout=5)
+    elapsed = time.monotonic() - start
+    check(f"a lone reading is flushed by the deadline ({elapsed * 1000:.1f} ms)",
+          handled == [1] and 0.015 <= elapsed < 0.2 and batcher.flushes["deadline"] == 1)
+
+    handled.clear()
+    for _ in range(100):
+        batcher.put(Rows(10))
+    batcher.drain(timeout=5)
+    check("a burst is flushed by size in batches of about 256",
+          sum(handled) == 1000 and batcher.flushes["size"] >= 3 and max(handled) < 256 + 10)
+
+    release = threading.Event()
+    handled.clear()
+
+    def handle_when_released(chunks):
+        release.wait()
+        handled.append(sum(chunks))
+
+    blocked = MicroBatcher(handle_when_released, batch_size=10, max_wait=0.001, max_rows=50)
+    accepted = [blocked.put(Rows(10)) for _ in range(8)]
+    time.sleep(0.05)
+    accepted += [blocked.put(Rows(10)) for _ in range(2)]
+    check("a full queue refuses chunks instead of growing", accepted.count(False) >= 2
+          and blocked.queued_rows() <= 50 and blocked.stats()["rejected"] == 10 * accepted.count(False))
+    release.set()
+    blocked.drain(timeout=5)
+    check("every accepted chunk is handled once", sum(handled) == 10 * accepted.count(True))
+
+    failing = MicroBatcher(lambda chunks: 1 / 0, batch_size=1, max_wait=0.001)
+    failing.put(Rows(1))
+    failing.drain(timeout=5)
+    failing.put(Rows(1))
+    failing.drain(timeout=5)
+    check("a failing batch is counted and the worker keeps going", failing.stats()["errors"] == 2)
+
+def check_app(workdir, bursts, clients, rows):
+    print("App:")
+    root = os.path.join(workdir, "registry")
+    ModelRegistry(root).publish(build_pipeline(os.path.join(workdir, "forest.joblib")))
+    os.environ.update(MODEL_REGISTRY_DIR=root, MODEL_WATCH_INTERVAL="0", APP_WARMUP="0", SENSOR_CACHE_TTL="0",
+                      TIMESERIES_DB_PATH=os.path.join(workdir, "app.db"))
+    import app
+    app.create_app()
+    table = StubTable([])
+    app.table_resource.set(table)
+    client = app.app.test_client()
+
+    rng = np.random.default_rng(0)
+    devices = ["Press_A1", "Lathe_B2", "Pump_C3"]
+    readings = make_readings(rng, devices, 20, datetime(2025, 5, 29, 10))
+    readings[5]["Temperature"] = "hot"
+    subscription = app.prediction_broadcaster.subscribe()
+    app.INGEST_WRITE_BACK = True
+    response = client.post('/ingest', json=readings)
+    app.ingest_batcher.drain(timeout=10)
+    app.INGEST_WRITE_BACK = False
+    body = response.get_json()
+    check("POST /ingest answers 202 with the invalid rows", response.status_code == 202
+          and body["accepted"] == len(readings) - 1 and body["invalid"] == [5])
+
+    expected = {(row["deviceId"], row["timestamp"]): row["risk"]
+                for row in client.post('/predict/batch', json=readings).get_json() if "risk" in row}
+    stored = [prediction for device_id in devices for prediction in app.prediction_store.latest(device_id)]
+    check("ingested readings get the risks /predict/batch gives them", len(stored) == 3 * app.PREDICTION_BUFFER_SIZE
+          and all(prediction["risk"] == expected[(prediction["machine_id"], prediction["timestamp"])]
+                  for prediction in stored))
+    latest = client.get('/predict/latest').get_json()
+    check("/predict/latest has each device's newest reading", set(latest) == set(devices)
+          and all(latest[device]["timestamp"] == max(r["timestamp"] for r in readings if r["deviceId"] == device)
+                  for device in devices))
+    check("?devices= selects devices, unknown ones are null",
+          client.get('/predict/latest?devices=Pump_C3,Nope').get_json().keys() == {"Pump_C3", "Nope"}
+          and client.get('/predict/latest?devices=Nope').get_json() == {"Nope": None})
+    published = []
+    while not subscription.empty():
+        published.extend(subscription.get_nowait()[1])
+    app.prediction_broadcaster.unsubscribe(subscription)
+    check("scored readings are published to the prediction stream", len(published) == len(readings) - 1)
+    written = table.query(KeyConditionExpression=app.Key('deviceId').eq("Pump_C3"))["Items"]
+    check("INGEST_WRITE_BACK writes readings with their risk through batch_writer",
+          len(written) == 20 and all("Risk" in item for item in written))
+
+    check("a payload without sensor fields is a 400",
+          client.post('/ingest', json=[{"deviceId": "x"}]).status_code == 400)
+
+    # DynamoDB has unscored readings older than a pushed one; the next poll must still score them
+    polled = make_readings(rng, ["Mill_D4"], 3, datetime(2025, 5, 29, 9, 59))
+    for row in polled:
+        table.put_item(Item={**row, **{name: app.Decimal(str(row[name])) for name in app.SENSOR_DEFAULTS}})
+    client.post('/ingest', json=make_readings(rng, ["Mill_D4"], 1, datetime(2025, 5, 29, 10, 5)))
+    app.ingest_batcher.drain(timeout=10)
+    check("pushed readings leave the poll watermark alone", app.prediction_store.last_timestamp("Mill_D4") is None)
+    client.get('/predict?devices=Mill_D4')
+    timestamps = [prediction["timestamp"] for prediction in app.prediction_store.latest("Mill_D4")]
+    check("the next poll scores DynamoDB readings older than the pushed one", len(timestamps) == 4
+          and timestamps == sorted(timestamps, reverse=True) and timestamps[0].startswith("2025-05-29T10:05"))
+
+    # Press_A1's full buffer holds its ten newest readings: one older than those and one already stored are
+    # refused, one between stored readings goes in order
+    before = app.ingest_batcher.stats()
+    press = [row for row in readings if row["deviceId"] == "Press_A1"]
+    between = dict(press[15], timestamp=press[15]["timestamp"][:-6] + "500000")
+    client.post('/ingest', json=[press[0], press[19], between])
+    app.ingest_batcher.drain(timeout=10)
+    stats = app.ingest_batcher.stats()
+    timestamps = [prediction["timestamp"] for prediction in app.prediction_store.latest("Press_A1")]
+    check("late and duplicate readings are counted as rejected, not accepted",
+          stats["rejected"] - before["rejected"] == 2 and stats["accepted"] - before["accepted"] == 1)
+    check("a reading between stored ones is merged by timestamp", between["timestamp"] in timestamps
+          and timestamps == sorted(timestamps, reverse=True) and len(timestamps) == app.PREDICTION_BUFFER_SIZE)
+
+    app.INGEST_MAX_DEVICES = len(set(app.prediction_store.device_ids()) - {a["device_id"] for a in app.ASSETS})
+    body = client.post('/ingest', json=make_readings(rng, ["Rogue_X1", "Press_A1"], 1, datetime(2025, 5, 29, 11))).get_json()
+    app.ingest_batcher.drain(timeout=10)
+    check("readings for new devices past INGEST_MAX_DEVICES are rejected", body["accepted"] == 1
+          and body["rejected"] == [0] and "Rogue_X1" not in app.prediction_store.device_ids())
+    app.INGEST_MAX_DEVICES = 1000
+    # Two posts make a full batch the worker holds on to; two more fill the queue, so the fifth can't fit
+    serving = app.ingest_batcher
+    held, release = threading.Event(), threading.Event()
+
+    def hold(chunks):
+        held.set()
+        release.wait()
+
+    app.ingest_batcher = MicroBatcher(hold, batch_size=20, max_wait=60, max_rows=20)
+    valid = readings[20:30]
+    statuses = [client.post('/ingest', json=valid).status_code for _ in range(2)]
+    held.wait(timeout=10)
+    statuses += [client.post('/ingest', json=valid).status_code for _ in range(2)]
+    full = client.post('/ingest', json=valid)
+    check("a full queue answers 503 with Retry-After", held.is_set() and statuses == [202] * 4
+          and full.status_code == 503 and full.headers.get("Retry-After") == "1")
+    release.set()
+    app.ingest_batcher.drain(timeout=10)
+    app.ingest_batcher = serving
+
+    # Bursts of concurrent clients, each posting its own device's readings
+    before = app.ingest_batcher.stats()
+    posted = [0]
+    lock = threading.Lock()
+    barrier = threading.Barrier(clients)
+
+    def run_client(index):
+        local = app.app.test_client()
+        client_rng = np.random.default_rng(index + 1)
+        for burst in range(bursts):
+            body = make_readings(client_rng, [f"Burst_{index:02d}"], rows, datetime(2025, 6, 1) + timedelta(minutes=burst))
+            barrier.wait()
+            if local.post('/ingest', json=body).status_code == 202:
+                with lock:
+                    posted[0] += len(body)
+            time.sleep(0.02)
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=run_client, args=(index,)) for index in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    app.ingest_batcher.drain(timeout=30)
+    elapsed = time.perf_counter() - start
+    stats = app.ingest_batcher.stats()
+    handled = stats["handled_rows"] - before["handled_rows"]
+    batches = stats["batches"] - before["batches"]
+    check("every accepted burst reading is scored exactly once", handled == posted[0] == bursts * clients * rows)
+    check("bursts are scored in micro-batches, not per request", handled / batches > rows)
+    print(f"  {bursts} bursts x {clients} clients x {rows} readings: {handled / elapsed:,.0f} readings/s, "
+          f"{batches} batches of {handled / batches:.1f} on average "
+          f"(flushed by size {stats['flushes']['size'] - before['flushes']['size']}, "
+          f"by deadline {stats['flushes']['deadline'] - before['flushes']['deadline']})")
+    latency = stats["latency_ms"]
+    print(f"  queue-to-scored latency p50 {latency['p50']:.1f} ms, p95 {latency['p95']:.1f} ms, "
+          f"p99 {latency['p99']:.1f} ms")
+    check("/debug/ingest-stats and /metrics report the queue",
+          client.get('/debug/ingest-stats').get_json()["handled_rows"] == stats["handled_rows"]
+          and 'ingest_readings_total{outcome="accepted"}' in client.get('/metrics').get_data(as_text=True))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--bursts", type=int, default=20)
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--rows", type=int, default=8)
+    args = parser.parse_args()
+
+    check_batcher()
+    with tempfile.TemporaryDirectory() as workdir:
+        check_app(workdir, args.bursts, args.clients, args.rows)
+
+    finish("ingest")
+
+if __name__ == "__main__":
+    main()
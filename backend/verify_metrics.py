@@ -0,0 +1,138 @@
+"""
+Checks for /metrics and request instrumentation, run against a StubTable.
+
+Usage: python verify_metrics.py
+
+Serves a small decision-tree pipeline from a temporary registry, drives
+/sensors, /predict and /predict/batch, then checks that /metrics is valid
+Prometheus text with per-route latency histograms, DynamoDB/preprocessing/
+model/serialization spans and heuristic fallback counts, and that requests log
+nothing at the default INFO level. Reports the cost of one observation.
+Exits non-zero if any check fails.
+"""
+import logging
+import os
+import re
+import tempfile
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from sklearn.tree import DecisionTreeClassifier
+
+import metrics
+from model_registry import ModelRegistry
+from stub_table import StubTable
+from verify_helpers import build_pipeline, check, finish, uniform_frame
+
+SAMPLE_LINE = re.compile(r'^[a-zA-Z_:][a-zA-Z0-9_:]*(\{([a-zA-Z_][a-zA-Z0-9_]*="(\\.|[^"\\])*",?)*\})? \S+$')
+
+def seed_items(device_id, count):
+    now = datetime.now()
+    return [
+        {"deviceId": device_id,
+         "timestamp": (now - timedelta(minutes=i)).strftime("%Y-%m-%dT%H:%M:%S.%f"),
+         "Temperature": Decimal("71.5"), "Vibration": Decimal("1.2"), "Power_Usage": Decimal("0.21"),
+         "Humidity": Decimal("44"), "Pressure": Decimal("30"), "Machine_Type": "Type_A"}
+        for i in range(count)
+    ]
+
+def sample(text, name, **labels):
+    """Value of the first sample of `name` whose labels include `labels`"""
+    for line in text.splitlines():
+        if line.startswith(name + "{") or line.startswith(name + " "):
+            if all(f'{key}="{value}"' in line for key, value in labels.items()):
+                return float(line.rsplit(" ", 1)[1])
+    return None
+
+def check_format():
+    print("Exposition format:")
+    histogram = metrics.Histogram("verify_seconds", "test", ("path",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 5.0):
+        histogram.observe(value, path='a "quoted" \\ path')
+    lines = histogram.render()
+    check("buckets are cumulative and end at +Inf", [line.rsplit(" ", 1)[1] for line in lines[2:5]] == ["1", "2", "3"]
+          and 'le="+Inf"' in lines[4])
+    check("label values are escaped", all(SAMPLE_LINE.match(line) for line in lines[2:]))
+    check("sum and count are reported", lines[-2].endswith(" 5.55") and lines[-1].endswith(" 3"))
+    metrics._registry.remove(histogram)
+
+def check_app(workdir):
+    print("App instrumentation:")
+    root = os.path.join(workdir, "registry")
+    ModelRegistry(root).publish(build_pipeline(os.path.join(workdir, "tree.joblib"), uniform_frame(500),
+                                            model=DecisionTreeClassifier(max_depth=3, random_state=0)))
+    os.environ.update(MODEL_REGISTRY_DIR=root, MODEL_WATCH_INTERVAL="0", APP_WARMUP="0",
+                      TIMESERIES_DB_PATH=os.path.join(workdir, "app.db"))
+    import app
+    app.create_app()
+    app.table_resource.set(StubTable(seed_items("ESP8266_IoT", 30)))
+    client = app.app.test_client()
+
+    app.current_model()  # loading the model logs at INFO, once
+
+    # Per-request logging is DEBUG only: nothing should reach an INFO handler
+    records = []
+    handler = logging.Handler(level=logging.INFO)
+    handler.emit = records.append
+    logging.getLogger().addHandler(handler)
+    client.get('/sensors')
+    bad = seed_items("ESP8266_IoT", 1)[0]
+    bad["Temperature"] = "n/a"  # the newest reading can't be scored by the model
+    app.current_table().put_item(Item=bad)
+    client.get('/predict')
+    readings = [{"Temperature": 80, "Vibration": 1, "Power_Usage": 0.2, "Humidity": 40, "Pressure": 30},
+                {"Temperature": "n/a", "Vibration": 1, "Power_Usage": 0.2, "Humidity": 40, "Pressure": 30}]
+    client.post('/predict/batch', json=readings).get_data()
+    client.get('/no-such-route')
+    logging.getLogger().removeHandler(handler)
+    check("requests log nothing at INFO", not records)
+
+    response = client.get('/metrics')
+    text = response.get_data(as_text=True)
+    samples = [line for line in text.splitlines() if line and not line.startswith("#")]
+    check("/metrics is Prometheus text", response.status_code == 200
+          and response.mimetype == "text/plain" and all(SAMPLE_LINE.match(line) for line in samples))
+    check("per-route latency histograms",
+          sample(text, "http_request_duration_seconds_count", route="/sensors", status="200") == 1
+          and sample(text, "http_request_duration_seconds_count", route="/predict", status="200") == 1
+          and sample(text, "http_request_duration_seconds_count", route="/predict/batch", status="200") == 1
+          and sample(text, "http_request_duration_seconds_count", route="unmatched", status="404") == 1)
+    spans = {name: sample(text, "app_span_duration_seconds_count", span=name)
+             for name in ("dynamodb_query", "preprocessing", "model", "serialization")}
+    print(f"  span counts: {spans}")
+    check("DynamoDB, preprocessing, model and serialization spans", all(spans.values()))
+    check("DynamoDB requests are counted", sample(text, "dynamodb_requests_total", operation="query") >= 1)
+    check("heuristic fallbacks are counted by reason",
+          sample(text, "heuristic_fallback_readings_total", reason="invalid_features") == 1)
+    check("model-scored readings are counted", sample(text, "scored_readings_total", source="model") >= 2)
+    check("cache and model state are exported", sample(text, "model_info", version="v1") == 1
+          and sample(text, "sensor_cache_requests_total", result="miss") is not None)
+
+    app.active_model = None
+    app.model_resource.set(None)
+    client.post('/predict/batch', json=readings[:1]).get_data()
+    text = client.get('/metrics').get_data(as_text=True)
+    check("scoring without a model counts as no_model fallback",
+          sample(text, "heuristic_fallback_readings_total", reason="no_model") == 1)
+
+def report_overhead():
+    histogram = metrics.Histogram("overhead_seconds", "test", ("route", "method", "status"))
+    count = 100000
+    start = time.perf_counter()
+    for _ in range(count):
+        histogram.observe(0.003, route="/predict", method="GET", status="200")
+    elapsed = time.perf_counter() - start
+    metrics._registry.remove(histogram)
+    print(f"Histogram.observe: {elapsed / count * 1e6:.2f} µs per call")
+
+def main():
+    check_format()
+    with tempfile.TemporaryDirectory() as workdir:
+        check_app(workdir)
+    report_overhead()
+
+    finish("metrics")
+
+if __name__ == "__main__":
+    main()
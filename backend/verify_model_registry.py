@@ -0,0 +1,141 @@
+"""
+Checks for the model registry and hot reload, run against a temporary registry.
+
+Usage: python verify_model_registry.py
+
+Publishes small decision-tree pipelines that disagree on a 70° reading, then
+covers startup from the ACTIVE version, /models/reload while /predict/batch is
+under load, rejection of versions that fail validation or the warm-up batch,
+/models/rollback (which a watcher tick must not undo, and which refuses to go
+back to an unversioned PIPELINE_PATH model), and the registry watcher following
+an ACTIVE change.
+Exits non-zero if any check fails.
+"""
+import hashlib
+import os
+import tempfile
+import threading
+import time
+
+from sklearn.tree import DecisionTreeClassifier
+
+from model_registry import LoadedModel, ModelRegistry
+from verify_helpers import build_pipeline, check, finish, uniform_frame
+
+READING = {"deviceId": "ESP8266_IoT", "Temperature": 70.0, "Vibration": 1.0, "Power_Usage": 0.2,
+           "Humidity": 40.0, "Pressure": 30.0, "Machine_Type": "Type_A"}
+
+def threshold_pipeline(path, threshold, preprocessor='passthrough'):
+    """A pipeline that predicts 1 when Temperature is above threshold"""
+    frame = uniform_frame(500)
+    return build_pipeline(path, frame, frame["Temperature"] > threshold,
+                          DecisionTreeClassifier(max_depth=3, random_state=0), preprocessor)
+
+def wait_for_reload(app, timeout=30):
+    deadline = time.time() + timeout
+    while app.model_reload_status["state"] == "loading" and time.time() < deadline:
+        time.sleep(0.01)
+    return app.model_reload_status["state"]
+
+def score(client):
+    row = client.post('/predict/batch', json=[READING]).get_json()[0]
+    return row["risk"], row["source"]
+
+def main():
+    with tempfile.TemporaryDirectory() as workdir:
+        root = os.path.join(workdir, "registry")
+        os.environ.update(MODEL_REGISTRY_DIR=root, MODEL_WATCH_INTERVAL="0.2", APP_WARMUP="0",
+                          TIMESERIES_DB_PATH=os.path.join(workdir, "app.db"))
+        registry = ModelRegistry(root)
+
+        print("Registry:")
+        cool = threshold_pipeline(os.path.join(workdir, "cool.joblib"), 75)
+        hot = threshold_pipeline(os.path.join(workdir, "hot.joblib"), 60)
+        check("publish numbers versions in order",
+              [registry.publish(cool, note="threshold 75"), registry.publish(hot)] == ["v1", "v2"])
+        with open(cool, "rb") as f:
+            check("metadata records the artifact hash", registry.metadata("v1")["sha256"] == hashlib.sha256(f.read()).hexdigest()
+                  and registry.metadata("v1")["note"] == "threshold 75")
+        check("newest version is active by default", registry.active_version() == "v2")
+        registry.set_active("v1")
+        check("ACTIVE pins a version", registry.active_version() == "v1")
+
+        print("Hot reload:")
+        import app
+        app.create_app()
+        check("create_app() leaves the registry watcher to the serving process", app.model_watcher_thread is None)
+        app.start_model_watcher()
+        client = app.app.test_client()
+        check("startup serves the ACTIVE version", app.current_model().version == "v1" and score(client) == (0.0, "model"))
+        body = client.get('/models').get_json()
+        check("/models lists versions and the active one",
+              [v["version"] for v in body["versions"]] == ["v1", "v2"] and body["active"]["version"] == "v1")
+
+        # Keep /predict/batch busy while v2 loads and swaps in
+        errors, results, stop = [], [], threading.Event()
+        def hammer():
+            local = app.app.test_client()
+            while not stop.is_set():
+                try:
+                    results.append(score(local))
+                except Exception as e:
+                    errors.append(e)
+        threads = [threading.Thread(target=hammer) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        time.sleep(0.1)
+        response = client.post('/models/reload', json={"version": "v2"})
+        state = wait_for_reload(app)
+        time.sleep(0.1)
+        stop.set()
+        for thread in threads:
+            thread.join()
+        check("reload is accepted and runs in the background", response.status_code == 202 and state == "ready")
+        check("no request failed during the swap", not errors and len(results) > 0)
+        check("every in-flight request was scored by one whole version",
+              set(results) <= {(0.0, "model"), (1.0, "model")})
+        check("new version serves after the swap", score(client) == (1.0, "model") and app.active_model.version == "v2")
+        check("explicit reload pins ACTIVE", registry.active_version() == "v2")
+        check("replaced version is kept for rollback", app.previous_model.version == "v1")
+
+        response = client.post('/models/rollback')
+        check("rollback restores the previous version immediately",
+              response.status_code == 200 and score(client) == (0.0, "model") and registry.active_version() == "v1")
+        app.check_model_registry()
+        time.sleep(0.5)  # and a few ticks of the background watcher
+        check("a watcher tick after the rollback keeps it", app.model_reload_status["state"] == "ready"
+              and app.active_model.version == "v1" and score(client) == (0.0, "model"))
+
+        # As when PIPELINE_PATH was served before the first version was published and reloaded
+        unversioned = LoadedModel(None, app.load_pipeline(hot), path=hot)
+        with app.model_swap_lock:
+            app.previous_model = unversioned
+        response = client.post('/models/rollback')
+        app.check_model_registry()
+        check("rollback to an unversioned model is refused, and nothing changes", response.status_code == 409
+              and "no registry version" in response.get_json()["error"] and app.active_model.version == "v1"
+              and registry.active_version() == "v1" and app.previous_model is unversioned)
+
+        print("Rejected versions:")
+        registry.publish(threshold_pipeline(os.path.join(workdir, "bare.joblib"), 75, preprocessor=None))
+        client.post('/models/reload', json={"version": "v3"})
+        check("version without a preprocessor fails validation", wait_for_reload(app) == "failed"
+              and "preprocessor" in app.model_reload_status["error"])
+        check("failed reload keeps serving the old version", app.active_model.version == "v1" and score(client) == (0.0, "model"))
+        registry.publish("pipeline.joblib")
+        client.post('/models/reload', json={"version": "v4"})
+        check("version that can't score the warm-up batch is rejected", wait_for_reload(app) == "failed"
+              and app.active_model.version == "v1" and registry.active_version() == "v1")
+        check("unknown version is rejected", client.post('/models/reload', json={"version": "v9"}).status_code == 404)
+
+        print("Registry watcher:")
+        registry.set_active("v2")
+        deadline = time.time() + 5
+        while app.active_model.version != "v2" and time.time() < deadline:
+            time.sleep(0.05)
+        check("watcher loads a new ACTIVE version", app.active_model.version == "v2" and score(client) == (1.0, "model"))
+
+    finish("model registry")
+
+if __name__ == "__main__":
+    main()
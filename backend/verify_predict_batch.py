@@ -0,0 +1,146 @@
+"""
+Checks for POST /predict/batch on mixed and malformed payloads.
+
+Usage: python verify_predict_batch.py
+
+Serves a 100-tree forest from a temporary registry and posts a batch mixing
+valid readings with non-numeric, missing and unknown-machine-type ones. Checks
+that every row comes back at its index with the deviceId and timestamp it was
+posted with, that invalid rows get an error and no risk, and that valid rows
+get the risk the pipeline gives them, from JSON, the {"readings": [...]}
+wrapper, NDJSON and CSV alike. Then checks that payloads which can't be read
+as readings are a 400, and that an oversized batch is a 413, a body over
+MAX_CONTENT_LENGTH before it is read. Exits non-zero if any check fails.
+"""
+import io
+import json
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from model_registry import ModelRegistry
+from scoring import score_frame, validate_readings
+from stub_table import StubTable
+from verify_helpers import build_pipeline, check, finish
+
+def make_body():
+    """Posted readings with invalid ones at known positions; returns (readings, invalid indices)"""
+    rng = np.random.default_rng(0)
+    readings = [{"deviceId": f"Press_{i % 3}", "timestamp": f"2025-05-29T10:00:{i:02d}.000000",
+                 "Temperature": round(float(rng.uniform(20, 100)), 1), "Vibration": round(float(rng.uniform(20, 100)), 1),
+                 "Power_Usage": round(float(rng.uniform(20, 100)), 1), "Humidity": round(float(rng.uniform(20, 100)), 1),
+                 "Pressure": round(float(rng.uniform(20, 100)), 1), "Machine_Type": ("Type_A", "Type_B", "Type_C")[i % 3]}
+                for i in range(40)]
+    readings[3]["Temperature"] = "hot"
+    readings[8]["Vibration"] = None
+    readings[15]["Machine_Type"] = "Type_Z"
+    readings[21]["Pressure"] = "NaN"
+    readings[30]["Humidity"] = "55.5"  # numeric strings are read as numbers
+    del readings[33]["Machine_Type"]  # defaults to Type_A
+    del readings[36]["deviceId"]
+    return readings, [3, 8, 15, 21]
+
+def to_csv(readings):
+    buffer = io.StringIO()
+    pd.DataFrame.from_records(readings).to_csv(buffer, index=False)
+    return buffer.getvalue()
+
+def check_rows(label, rows, readings, invalid, expected):
+    valid = [i for i in range(len(readings)) if i not in invalid]
+    check(f"{label}: one row per reading, in order", [row["index"] for row in rows] == list(range(len(readings))))
+    check(f"{label}: deviceId and timestamp are echoed",
+          all(row.get("deviceId") == reading.get("deviceId") and row["timestamp"] == reading["timestamp"]
+              for row, reading in zip(rows, readings)))
+    check(f"{label}: invalid rows get an error and no risk",
+          all("error" in rows[i] and "risk" not in rows[i] for i in invalid))
+    check(f"{label}: valid rows get the pipeline's risk",
+          all("error" not in rows[i] and rows[i]["source"] == "model" for i in valid)
+          and [rows[i]["risk"] for i in valid] == expected)
+
+def main():
+    with tempfile.TemporaryDirectory() as workdir:
+        root = os.path.join(workdir, "registry")
+        ModelRegistry(root).publish(build_pipeline(os.path.join(workdir, "forest.joblib")))
+        os.environ.update(MODEL_REGISTRY_DIR=root, MODEL_WATCH_INTERVAL="0", APP_WARMUP="0",
+                          TIMESERIES_DB_PATH=os.path.join(workdir, "app.db"))
+        import app
+        app.create_app()
+        app.table_resource.set(StubTable([]))
+        client = app.app.test_client()
+
+        print("Row-level results:")
+        readings, invalid = make_body()
+        frame, flagged = validate_readings(pd.DataFrame.from_records(readings))
+        check("validate_readings flags exactly the invalid rows", np.flatnonzero(flagged).tolist() == invalid)
+        risk, _ = score_frame(app.current_model().pipeline, frame[~flagged])
+        expected = np.round(risk, 3).tolist()
+        ndjson = "\n".join(json.dumps(reading) for reading in readings)
+        payloads = {
+            "JSON array": dict(json=readings),
+            "readings wrapper": dict(json={"readings": readings}),
+            "NDJSON": dict(data=ndjson, content_type="application/x-ndjson"),
+        }
+        for label, kwargs in payloads.items():
+            response = client.post('/predict/batch', **kwargs)
+            # Streamed bodies are read before the next request, which pushes its own request context
+            body = response.get_data(as_text=True)
+            rows = json.loads(body) if response.mimetype == "application/json" else \
+                [json.loads(line) for line in body.splitlines()]
+            check(f"{label}: 200", response.status_code == 200)
+            check_rows(label, rows, readings, invalid, expected)
+            if label == "JSON array":
+                json_rows = rows
+
+        # CSV has no nulls of its own: the deleted fields come back as empty cells
+        response = client.post('/predict/batch', data=to_csv(readings), content_type="text/csv")
+        check("CSV: the same risks and errors", response.status_code == 200
+              and [row.get("risk") for row in response.get_json()] == [row.get("risk") for row in json_rows])
+        check("an all-invalid batch answers 200 with an error per row",
+              all("error" in row for row in client.post('/predict/batch', json=[readings[i] for i in invalid]).get_json()))
+        check("an empty batch answers []", client.post('/predict/batch', json=[]).get_json() == [])
+
+        print("Bad payloads:")
+        bad = {
+            "malformed JSON": dict(data="[{\"Temperature\": 70,", content_type="application/json"),
+            "a JSON object without readings": dict(json={"Temperature": 70}),
+            "a JSON scalar": dict(json="hello"),
+            "an array of non-objects": dict(json=[1, 2, 3]),
+            "readings without the sensor fields": dict(json=[{"deviceId": "x", "Temperature": 70}]),
+            "a malformed NDJSON line": dict(data=json.dumps(readings[0]) + "\n{oops\n", content_type="application/x-ndjson"),
+            "CSV without the sensor columns": dict(data="deviceId,timestamp\nx,2025-05-29\n", content_type="text/csv"),
+            "an empty CSV body": dict(data="", content_type="text/csv"),
+        }
+        for label, kwargs in bad.items():
+            response = client.post('/predict/batch', **kwargs)
+            check(f"{label} is a 400 with an error", response.status_code == 400
+                  and response.get_json()["error"].startswith("Invalid payload"))
+
+        limit = app.PREDICT_BATCH_MAX_ROWS
+        app.PREDICT_BATCH_MAX_ROWS = 10
+        response = client.post('/predict/batch', json=readings)
+        check("more than PREDICT_BATCH_MAX_ROWS readings is a 413", response.status_code == 413
+              and "Too many readings" in response.get_json()["error"])
+        app.PREDICT_BATCH_MAX_ROWS = limit
+
+        body = dict(data=json.dumps(readings), content_type="application/json")
+        size = len(body["data"].encode())
+        max_bytes = app.app.config["MAX_CONTENT_LENGTH"]
+        app.app.config["MAX_CONTENT_LENGTH"] = size - 1
+        parse_readings, parsed = app.parse_readings, []
+        app.parse_readings = lambda *args: parsed.append(args) or parse_readings(*args)
+        for route in ('/predict/batch', '/ingest'):
+            response = client.post(route, **body)
+            check(f"{route}: a body over MAX_CONTENT_LENGTH is a 413 before it is parsed", response.status_code == 413
+                  and response.get_json()["error"].startswith("Request body too large") and not parsed)
+        app.app.config["MAX_CONTENT_LENGTH"] = size
+        check("a body at MAX_CONTENT_LENGTH is scored",
+              client.post('/predict/batch', **body).status_code == 200 and len(parsed) == 1)
+        app.parse_readings = parse_readings
+        app.app.config["MAX_CONTENT_LENGTH"] = max_bytes
+
+    finish("batch prediction")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+Checks for the prediction cache, plus its effect on /predict-style scoring.
+
+Usage: python verify_prediction_cache.py [--batches 100] [--rows 500]
+
+Covers exact and quantized keys, LRU eviction, invalidation when the served
+model changes, and that cached scoring returns exactly what the pipeline
+returns. Then scores --batches batches of readings at sensor precision
+(0.1 degree/percent steps, so values recur) with a 100-tree RandomForest
+served from a temporary registry, with and without the cache, at --rows and
+at a 10-row poll size, and reports hit rate and scoring time. Exits non-zero if any check fails.
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+
+from model_registry import ModelRegistry
+from prediction_cache import PredictionCache, parse_quanta
+from scoring import items_to_frame
+from verify_helpers import build_pipeline, check, finish, uniform_frame
+
+def threshold_pipeline(path, threshold):
+    """A 100-tree forest that predicts 1 when Temperature is above threshold"""
+    frame = uniform_frame(2000)
+    return build_pipeline(path, frame, frame["Temperature"] > threshold,
+                          RandomForestClassifier(n_estimators=100, max_depth=6, random_state=0))
+
+def make_items(count, seed):
+    """Readings at sensor precision from a steady machine, so identical vectors recur"""
+    rng = np.random.default_rng(seed)
+    return [
+        {"deviceId": "ESP8266_IoT", "Temperature": round(t, 1), "Vibration": 1.2, "Power_Usage": 0.22,
+         "Humidity": round(h, 1), "Pressure": 30.0, "Machine_Type": "Type_A"}
+        for t, h in zip(rng.normal(72, 0.3, count), rng.normal(45, 0.3, count))
+    ]
+
+def check_cache():
+    print("Cache:")
+    frame = items_to_frame([{"Temperature": 70.04}, {"Temperature": 70.06}, {"Temperature": "n/a"}])
+    exact = PredictionCache(max_entries=2)
+    keys = exact.keys(frame)
+    check("exact keys keep every digit; bad rows get no key", keys[0] != keys[1] and keys[2] is None)
+    quantized = PredictionCache(quanta=parse_quanta("Temperature=0.5"))
+    keys = quantized.keys(frame)
+    check("quantized keys merge readings within one step", keys[0] == keys[1])
+    try:
+        parse_quanta("Temp=0.1")
+        check("unknown quantization column is rejected", False)
+    except ValueError:
+        check("unknown quantization column is rejected", True)
+
+    first, second = object(), object()
+    keys = exact.keys(items_to_frame([{"Temperature": t} for t in (60, 61, 62)]))
+    exact.lookup(first, keys)
+    exact.store(first, keys, [0.1, 0.2, 0.3])
+    risk, hit = exact.lookup(first, keys)
+    check("LRU keeps max_entries newest", hit.tolist() == [False, True, True] and exact.evictions == 1)
+    risk, hit = exact.lookup(second, keys)
+    check("another model clears the cache", not hit.any() and exact.invalidations == 1)
+    exact.store(first, keys, [0.1, 0.2, 0.3])
+    check("results from a replaced model are not stored", not exact.lookup(second, keys)[1].any())
+
+def check_app(workdir, batches, rows):
+    print("Cached scoring in the app:")
+    root = os.path.join(workdir, "registry")
+    registry = ModelRegistry(root)
+    registry.publish(threshold_pipeline(os.path.join(workdir, "v1.joblib"), 72))
+    registry.publish(threshold_pipeline(os.path.join(workdir, "v2.joblib"), 60))
+    registry.set_active("v1")
+    os.environ.update(MODEL_REGISTRY_DIR=root, MODEL_WATCH_INTERVAL="0", APP_WARMUP="0",
+                      TIMESERIES_DB_PATH=os.path.join(workdir, "app.db"))
+    import app
+    app.create_app()
+
+    traffic = [items_to_frame(make_items(rows, seed)) for seed in range(batches)]
+    uncached = [app.score_with_active_model(frame) for frame in traffic[:5]]
+    cached = [app.score_with_active_model(frame, cached=True) for frame in traffic[:5]]
+    check("cached scoring returns exactly the pipeline's results",
+          all(np.array_equal(a[0], b[0]) and np.array_equal(a[1], b[1]) for a, b in zip(uncached, cached)))
+    again = app.score_with_active_model(traffic[0], cached=True)
+    check("repeated batch is served from the cache", np.array_equal(again[0], uncached[0][0])
+          and app.prediction_cache.stats()["hits"] >= rows)
+
+    app.activate_model(app.load_model("v2"))
+    reloaded = app.score_with_active_model(traffic[0], cached=True)
+    check("reload invalidates the cache", app.prediction_cache.invalidations == 1
+          and np.array_equal(reloaded[0], app.score_with_active_model(traffic[0])[0])
+          and not np.array_equal(reloaded[0], uncached[0][0]))
+    app.activate_model(app.load_model("v1"))
+
+    print(f"Scoring {batches} batches of steady-state readings:")
+    for size in (rows, 10):
+        frames = traffic if size == rows else [items_to_frame(make_items(size, seed)) for seed in range(batches)]
+        app.prediction_cache.invalidate()
+        app.prediction_cache.hits = app.prediction_cache.misses = 0
+        timings = {}
+        for cached in (False, True):
+            start = time.perf_counter()
+            for frame in frames:
+                app.score_with_active_model(frame, cached=cached)
+            timings[cached] = (time.perf_counter() - start) * 1000 / batches
+        stats = app.prediction_cache.stats()
+        print(f"  {size:>4} rows: pipeline {timings[False]:6.2f} ms, cached {timings[True]:6.2f} ms per batch "
+              f"(hit rate {stats['hit_rate']:.1%}, {stats['entries']} distinct vectors)")
+        check(f"steady-state {size}-row batches mostly hit the cache", stats["hit_rate"] > 0.5)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batches", type=int, default=100)
+    parser.add_argument("--rows", type=int, default=500)
+    args = parser.parse_args()
+
+    check_cache()
+    with tempfile.TemporaryDirectory() as workdir:
+        check_app(workdir, args.batches, args.rows)
+
+    finish("prediction cache")
+
+if __name__ == "__main__":
+    main()
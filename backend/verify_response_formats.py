@@ -0,0 +1,188 @@
+"""
+Checks for ?format= response encodings, run against a StubTable.
+
+Usage: python verify_response_formats.py [--readings 20000]
+
+Seeds --readings readings per asset, then checks that the json format of
+/sensors, /sensors?from=&to=&points= (lttb and minmax), /sensors/history and
+/predict is what the row-building code returned, and that columnar JSON,
+msgpack (when installed) and Arrow IPC decode to the same values, with
+missing values as null. Then reports body size and serialization time of a
+2000-point minmax range for every asset in each format, against the previous
+stdlib json encoding. Exits non-zero if any check fails.
+"""
+import argparse
+import io
+import json
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import numpy as np
+import pyarrow as pa
+from sklearn.tree import DecisionTreeClassifier
+
+import metrics
+import payloads
+from model_registry import ModelRegistry
+from stub_table import StubTable
+from verify_helpers import build_pipeline, check, finish, uniform_frame
+
+def seed_items(device_ids, count):
+    rng = np.random.default_rng(0)
+    now = datetime.now()
+    items = []
+    for device_id in device_ids:
+        for i in range(count):
+            item = {"deviceId": device_id,
+                    "timestamp": (now - timedelta(seconds=4 * i)).strftime("%Y-%m-%dT%H:%M:%S.%f"),
+                    "Temperature": Decimal(str(round(rng.normal(70, 5), 1))),
+                    "Vibration": Decimal(str(round(rng.uniform(0, 3), 2))),
+                    "Power_Usage": Decimal("0.21"), "Humidity": Decimal(str(round(rng.normal(45, 3), 1))),
+                    "Pressure": Decimal("30"), "Machine_Type": "Type_A"}
+            if i == 3:
+                del item["Humidity"]  # reported as the /sensors default
+            items.append(item)
+    return items
+
+def old_sensor_rows(items):
+    """What /sensors built before columns: one dict per reading"""
+    return [{"id": i + 1, "device_id": device_id, "timestamp": item.get("timestamp"),
+             "temperature": float(item.get("Temperature", 0)), "vibration": float(item.get("Vibration", 0)),
+             "power_consumption": float(item.get("Power_Usage", 0)), "humidity": float(item.get("Humidity", 65)),
+             "pressure": float(item.get("Pressure", 905))}
+            for i, (device_id, item) in enumerate(items)]
+
+def decode(response):
+    """Columns from a columnar/msgpack/arrow response body"""
+    body = response.get_data()
+    if response.mimetype == "application/vnd.apache.arrow.stream":
+        table = pa.ipc.open_stream(io.BytesIO(body)).read_all()
+        metadata = {key.decode(): json.loads(value) for key, value in (table.schema.metadata or {}).items()}
+        columns = {name: column.to_pylist() for name, column in zip(table.column_names, table.columns)}
+        return dict(metadata, points=columns) if metadata else columns
+    if response.mimetype == "application/msgpack":
+        return payloads.msgpack.unpackb(body)
+    return json.loads(body)
+
+def same(a, b):
+    """Equal, treating floats within 1e-9 as equal"""
+    if isinstance(a, dict) and isinstance(b, dict):
+        return a.keys() == b.keys() and all(same(a[key], b[key]) for key in a)
+    if isinstance(a, list) and isinstance(b, list):
+        return len(a) == len(b) and all(same(x, y) for x, y in zip(a, b))
+    if isinstance(a, float) or isinstance(b, float):
+        return a is not None and b is not None and abs(a - b) <= 1e-9 * max(1.0, abs(a))
+    return a == b
+
+def check_formats(client, label, url, nested=None):
+    """json rows vs every columnar format for one URL; nested names the key holding the rows"""
+    rows = client.get(url).get_json()
+    points = rows[nested] if nested else rows
+    if nested == "points":
+        # Columnar history flattens {"min", "max", "mean"} per field into <field>_min/_max/_mean
+        points = [{key: value for key, value in point.items() if not isinstance(value, dict)}
+                  | {f"{key}_{stat}": value[stat] for key, value in point.items() if isinstance(value, dict)
+                     for stat in ("min", "max", "mean")} for point in points]
+    expected = payloads.rows_to_columns(points)
+    formats = ["columnar", "arrow"] + (["msgpack"] if payloads.msgpack is not None else [])
+    for fmt in formats:
+        response = client.get(f"{url}{'&' if '?' in url else '?'}format={fmt}")
+        decoded = decode(response)
+        columns = decoded["points"] if nested else decoded
+        check(f"{label}: {fmt} matches json ({len(points)} rows)", response.status_code == 200
+              and same(columns, expected)
+              and (not nested or all(same(decoded[key], rows[key]) for key in rows if key != "points")))
+    return rows
+
+def check_app(workdir, readings):
+    root = os.path.join(workdir, "registry")
+    ModelRegistry(root).publish(build_pipeline(os.path.join(workdir, "tree.joblib"), uniform_frame(500),
+                                            model=DecisionTreeClassifier(max_depth=3, random_state=0)))
+    os.environ.update(MODEL_REGISTRY_DIR=root, MODEL_WATCH_INTERVAL="0", APP_WARMUP="0", SENSOR_CACHE_TTL="0",
+                      TIMESERIES_DB_PATH=os.path.join(workdir, "app.db"))
+    import app
+    app.create_app()
+    device_ids = [asset["device_id"] for asset in app.ASSETS]
+    items = seed_items(device_ids, readings)
+    # A device without a humidity sensor
+    items += [{key: value for key, value in item.items() if key != "Humidity"} for item in seed_items(["Gauge_E5"], 100)]
+    app.table_resource.set(StubTable(items))
+    client = app.app.test_client()
+
+    print("Responses:")
+    rows = check_formats(client, "/sensors", "/sensors?devices=all")
+    newest = [(device_id, item) for device_id in device_ids
+              for item in sorted((item for item in items if item["deviceId"] == device_id),
+                                 key=lambda item: item["timestamp"], reverse=True)[:24]]
+    newest.sort(key=lambda pair: pair[1]["timestamp"], reverse=True)
+    check("/sensors json is what the row-building code returned", same(rows, old_sensor_rows(newest)))
+    check("a missing attribute reports the /sensors default", any(row["humidity"] == 65.0 for row in rows))
+
+    end = datetime.now() + timedelta(seconds=1)
+    start = end - timedelta(seconds=4 * readings + 60)
+    span_query = f"from={start.isoformat()}&to={end.isoformat()}&devices=all"
+    check_formats(client, "/sensors range lttb", f"/sensors?{span_query}&points=500")
+    rows = check_formats(client, "/sensors range minmax", f"/sensors?{span_query}&points=2000&method=minmax")
+    check("range rows are newest first with ids in order",
+          [row["timestamp"] for row in rows] == sorted((row["timestamp"] for row in rows), reverse=True)
+          and [row["id"] for row in rows] == list(range(1, len(rows) + 1)))
+    gauge_query = f"/sensors?{span_query.replace('devices=all', 'devices=Gauge_E5')}&points=10&method=minmax"
+    gauge = client.get(gauge_query).get_json()
+    check("a field with no readings is null", bool(gauge) and all(row["humidity"] is None for row in gauge))
+    arrow = pa.ipc.open_stream(io.BytesIO(client.get(gauge_query + "&format=arrow").get_data())).read_all()
+    check("... and an Arrow null", arrow.column("humidity").null_count == len(gauge))
+    check_formats(client, "/sensors/history", f"/sensors/history?from={start.isoformat()}&to={end.isoformat()}",
+                  nested="points")
+    check_formats(client, "/predict", "/predict?devices=all")
+
+    response = client.get('/sensors?format=xml')
+    check("unknown format is a 400", response.status_code == 400 and "format" in response.get_json()["error"])
+    if payloads.msgpack is None:
+        check("msgpack without the package is a 400", client.get('/predict?format=msgpack').status_code == 400)
+    response = client.get('/sensors', headers={"Accept": "application/vnd.apache.arrow.stream"})
+    check("Accept header selects Arrow", response.mimetype == "application/vnd.apache.arrow.stream")
+    readings = [{"Temperature": t, "Vibration": 1, "Power_Usage": 0.2, "Humidity": 40, "Pressure": 30} for t in (70, 90)]
+    response = client.post('/predict/batch', data="\n".join(json.dumps(reading) for reading in readings),
+                           content_type="application/x-ndjson")
+    check("batch stream is still valid NDJSON",
+          [json.loads(line)["index"] for line in response.get_data(as_text=True).splitlines()] == [0, 1])
+    check("batch stream is still a valid JSON array", len(client.post('/predict/batch', json=readings).get_json()) == 2)
+
+    url = f"/sensors?{span_query}&points=2000&method=minmax"
+    print(f"Body size and serialization time, 2000-point minmax range for {len(device_ids)} assets:")
+    rows = client.get(url).get_json()
+    start_time = time.perf_counter()
+    for _ in range(10):
+        legacy = json.dumps(rows, sort_keys=True).encode()  # jsonify before orjson
+    legacy_ms = (time.perf_counter() - start_time) * 100
+    print(f"  {'stdlib json':<10} {len(legacy):>9} bytes  {legacy_ms:7.2f} ms to serialize")
+    sizes = {}
+    for fmt in ["json", "columnar", "arrow"] + (["msgpack"] if payloads.msgpack is not None else []):
+        body = client.get(f"{url}&format={fmt}").get_data()
+        sizes[fmt] = len(body)
+        count_before, seconds_before = metrics.SPAN_SECONDS.snapshot(span="serialization")
+        for _ in range(10):
+            client.get(f"{url}&format={fmt}").get_data()
+        count, seconds = metrics.SPAN_SECONDS.snapshot(span="serialization")
+        print(f"  {fmt:<10} {len(body):>9} bytes  {(seconds - seconds_before) / (count - count_before) * 1000:7.2f} ms "
+              f"to serialize ({len(legacy) / len(body):.1f}x smaller)")
+    check("columnar and Arrow bodies are at least 2x smaller than rows",
+          sizes["columnar"] * 2 <= len(legacy) and sizes["arrow"] * 2 <= len(legacy))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--readings", type=int, default=20000)
+    args = parser.parse_args()
+
+    print(f"JSON encoder: {'orjson' if payloads.orjson is not None else 'stdlib json'}; "
+          f"msgpack {'installed' if payloads.msgpack is not None else 'not installed'}")
+    with tempfile.TemporaryDirectory() as workdir:
+        check_app(workdir, args.readings)
+
+    finish("response format")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+"""
+Checks for the rule-based risk scorer and the healthy-reading pre-filter.
+
+Usage: python verify_risk_rules.py [--rows 1000000] [--batch-sizes 4 20000]
+
+Checks that the built-in rules and risk_rules.json give exactly the risks of
+the old hard-coded fallback (NaN readings included), that malformed rule
+files are rejected, and that without a model whole batches are scored by the
+rules. Then serves a 100-tree forest from a temporary registry and checks that
+RISK_PREFILTER sends only readings outside the healthy ranges to the model,
+reporting rule throughput over --rows readings and the time to score mostly
+healthy batches of each --batch-sizes with and without the pre-filter (small
+batches are what the stream poller scores per device; a batch skips the model
+entirely when every reading is healthy). Exits non-zero if any check fails.
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+import metrics
+from model_registry import ModelRegistry
+from risk_rules import DEFAULT_RISK_RULES, RiskRules
+from scoring import FEATURE_COLUMNS, score_frame
+from verify_helpers import build_pipeline, check, finish
+
+def old_heuristic_risk(frame):
+    """The fallback rules as they were hard-coded in scoring.py"""
+    temperature = frame["Temperature"].to_numpy()
+    vibration = frame["Vibration"].to_numpy()
+    power_usage = frame["Power_Usage"].to_numpy()
+    humidity = frame["Humidity"].to_numpy()
+    pressure = frame["Pressure"].to_numpy()
+
+    risk = np.full(len(frame), 0.1)
+    risk += np.where(temperature > 75, 0.3, 0.0)
+    risk += np.where(vibration > 2.0, 0.2, 0.0)
+    risk += np.where(power_usage > 0.25, 0.2, 0.0)
+    risk += np.where((humidity > 70) | (humidity < 30), 0.1, 0.0)
+    risk += np.where((pressure > 35) | (pressure < 25), 0.1, 0.0)
+    return np.minimum(risk, 1.0)
+
+def make_frame(count, seed, healthy_share=0.5):
+    """Readings around the rule thresholds; healthy_share of them well inside the healthy ranges"""
+    rng = np.random.default_rng(seed)
+    healthy = rng.random(count) < healthy_share
+    frame = pd.DataFrame({
+        "Temperature": np.where(healthy, rng.uniform(60, 69, count), rng.uniform(60, 90, count)).round(1),
+        "Vibration": np.where(healthy, rng.uniform(0.5, 1.4, count), rng.uniform(0.5, 3, count)).round(2),
+        "Power_Usage": np.where(healthy, rng.uniform(0.15, 0.21, count), rng.uniform(0.15, 0.3, count)).round(3),
+        "Humidity": np.where(healthy, rng.uniform(40, 60, count), rng.uniform(20, 80, count)).round(1),
+        "Pressure": np.where(healthy, rng.uniform(28, 32, count), rng.uniform(22, 38, count)).round(1),
+        "Machine_Type_Code": rng.integers(0, 3, count),
+    })
+    return frame[FEATURE_COLUMNS]
+
+def check_rules(rows):
+    print("Rules:")
+    frame = make_frame(10000, 1)
+    frame.loc[::97, "Humidity"] = np.nan
+    file_rules = RiskRules.load("risk_rules.json", columns=FEATURE_COLUMNS)
+    check("built-in rules match the old fallback exactly", np.array_equal(DEFAULT_RISK_RULES.score(frame),
+                                                                          old_heuristic_risk(frame)))
+    check("risk_rules.json matches the old fallback exactly", np.array_equal(file_rules.score(frame),
+                                                                             old_heuristic_risk(frame)))
+    check("rule file round-trips through describe()",
+          np.array_equal(RiskRules.from_dict(file_rules.describe()).score(frame), file_rules.score(frame)))
+    for label, spec in (("unknown column", {"rules": [{"column": "Temp", "above": 75, "add": 0.3}]}),
+                        ("two conditions", {"rules": [{"column": "Temperature", "above": 1, "below": 2}]}),
+                        ("inverted range", {"healthy": {"Pressure": [35, 25]}})):
+        try:
+            RiskRules.from_dict(spec, columns=FEATURE_COLUMNS)
+            check(f"{label} is rejected", False)
+        except ValueError:
+            check(f"{label} is rejected", True)
+
+    healthy = file_rules.healthy(frame)
+    check("healthy readings get the base risk", bool(healthy.any())
+          and np.all(file_rules.score(frame[healthy]) == file_rules.base))
+    check("NaN readings are never healthy", not healthy[::97].any())
+
+    risk, from_model = score_frame(None, frame, rules=file_rules)
+    check("without a model the whole batch is scored by the rules",
+          not from_model.any() and np.array_equal(risk, old_heuristic_risk(frame)))
+
+    big = make_frame(rows, 2)
+    start = time.perf_counter()
+    file_rules.score(big)
+    elapsed = time.perf_counter() - start
+    print(f"  rules scored {rows:,} readings in {elapsed * 1000:.1f} ms ({rows / elapsed / 1e6:.1f} M readings/s)")
+
+def check_prefilter(workdir, batch_sizes):
+    print("Pre-filter:")
+    root = os.path.join(workdir, "registry")
+    ModelRegistry(root).publish(build_pipeline(os.path.join(workdir, "forest.joblib"), make_frame(3000, 0)))
+    os.environ.update(MODEL_REGISTRY_DIR=root, MODEL_WATCH_INTERVAL="0", APP_WARMUP="0",
+                      TIMESERIES_DB_PATH=os.path.join(workdir, "app.db"))
+    import app
+    app.create_app()
+    client = app.app.test_client()
+    check("app loads risk_rules.json", app.risk_rules.healthy_ranges
+          and client.get('/model-info').get_json()["fallback_rules"]["healthy"])
+
+    frame = make_frame(5000, 3)
+    app.RISK_PREFILTER = False
+    plain_risk, plain_from_model = app.score_with_active_model(frame)
+    app.RISK_PREFILTER = True
+    model_rows = metrics.SCORED_ROWS.value(source="model")
+    risk, from_model = app.score_with_active_model(frame)
+    healthy = app.risk_rules.healthy(frame)
+    check("healthy readings skip the model", metrics.SCORED_ROWS.value(source="model") - model_rows
+          == int((~healthy).sum()) and not from_model[healthy].any())
+    check("healthy readings get the rule risk", np.array_equal(risk[healthy], app.risk_rules.score(frame[healthy])))
+    check("other readings get the model's risk", np.array_equal(risk[~healthy], plain_risk[~healthy])
+          and from_model[~healthy].all())
+    print(f"  {healthy.mean():.1%} of readings pre-filtered; model and pre-filter agree that "
+          f"{np.mean(plain_risk[healthy] < 0.5):.1%} of them are low risk")
+
+    print("Scoring mostly healthy batches (90% drawn from the healthy ranges):")
+    for size in batch_sizes:
+        frames = [make_frame(size, seed, healthy_share=0.9) for seed in range(max(5, 2000 // size))]
+        timings = {}
+        for prefilter in (False, True):
+            app.RISK_PREFILTER = prefilter
+            start = time.perf_counter()
+            for batch in frames:
+                app.score_with_active_model(batch)
+            timings[prefilter] = (time.perf_counter() - start) / len(frames) * 1000
+        skipped = np.mean([app.risk_rules.healthy(batch).all() for batch in frames])
+        print(f"  {size:>6} readings  off {timings[False]:7.2f} ms  on {timings[True]:7.2f} ms  "
+              f"({timings[False] / timings[True]:.1f}x, {skipped:.0%} of batches skip the model)")
+    app.RISK_PREFILTER = False
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[4, 20000])
+    args = parser.parse_args()
+
+    check_rules(args.rows)
+    with tempfile.TemporaryDirectory() as workdir:
+        check_prefilter(workdir, args.batch_sizes)
+
+    finish("risk rule")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,248 @@
+"""
+Checks RollingWindow and RollingFeatures against pandas rolling()/ewm().
+
+Usage: python verify_rolling_features.py [--readings 5000]
+
+Pushes --readings values through windows of several sizes, so every window
+fills, evicts and runs its periodic recompute many times. After each push it
+compares mean, std, slope, EWMA and rate of change with the same statistics
+from pandas rolling()/ewm(). Also checks that:
+  * the recompute every `size` pushes resets the running sums to the window's exact values
+  * RollingFeatures.transform matches per-device pandas statistics on interleaved, shuffled rows and keeps their order
+  * stateful transform() calls on consecutive slices match one stateless call on the whole stream
+  * the app refuses stateful stages, and serves a stateless one on whole batches without the prediction cache,
+    the pre-filter or the anomaly gate, leaving the stage's state untouched
+  * /predict polls that each bring one or two new readings give the risks of scoring the device's whole history
+    in one batch, including the first poll after the app's windows are lost, which reads the readings before
+    the new ones from DynamoDB
+Exits non-zero if any check fails.
+"""
+import argparse
+import os
+import tempfile
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.compose import ColumnTransformer
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.pipeline import Pipeline
+
+import metrics
+from model_registry import ModelRegistry
+from rolling_features import ROLLING_STATS, RollingFeatures, RollingWindow
+from scoring import FEATURE_COLUMNS, SENSOR_DEFAULTS, score_frame, validate_readings
+from stub_table import StubTable
+from verify_helpers import check, finish
+
+def pandas_stats(series, size):
+    """DataFrame of ROLLING_STATS over the last size values at each position, as RollingWindow defines them"""
+    rolling = series.rolling(size, min_periods=1)
+    return pd.DataFrame({
+        "mean": rolling.mean(),
+        "std": series.rolling(size, min_periods=min(size, 2)).std().fillna(0.0),
+        "slope": rolling.apply(lambda v: np.polyfit(np.arange(len(v)), v, 1)[0] if len(v) > 1 else 0.0, raw=True),
+        "ewma": series.ewm(span=size, adjust=False).mean(),
+        "roc": rolling.apply(lambda v: (v[-1] - v[0]) / (len(v) - 1) if len(v) > 1 else 0.0, raw=True),
+    })[list(ROLLING_STATS)]
+
+def close(expected, actual, scale):
+    return np.allclose(expected, actual, rtol=1e-9, atol=1e-9 * scale)
+
+def check_window(count):
+    print("RollingWindow:")
+    rng = np.random.default_rng(0)
+    offsets = {"around 70": 70.0, "around 1e6 (cancellation-prone)": 1e6}
+    for label, offset in offsets.items():
+        series = pd.Series(offset + np.cumsum(rng.normal(0, 1, count)))
+        for size in (1, 7, 60, 500):
+            window = RollingWindow(size)
+            actual = []
+            for value in series:
+                window.push(value)
+                actual.append(window.stats())
+            expected = pandas_stats(series, size).to_numpy()
+            check(f"window {size}, {label}, {count} pushes", close(expected, np.array(actual), offset))
+
+    window = RollingWindow(50)
+    for value in rng.normal(1e6, 1, 50 * 40):
+        window.push(value)
+    values = np.array(window.values)
+    check("the periodic recompute resets the running sums to the window's exact values",
+          window._pushes == 0 and window.mean == float(values.mean())
+          and window.m2 == float(((values - values.mean()) ** 2).sum())
+          and window.sum_jx == float(np.arange(len(values)) @ values))
+
+def make_frame(rng, devices, per_device, start):
+    frame = pd.DataFrame({
+        "deviceId": np.repeat(devices, per_device),
+        "timestamp": [(start + timedelta(seconds=5 * i)).strftime("%Y-%m-%dT%H:%M:%S.%f")
+                      for _ in devices for i in range(per_device)],
+        "Temperature": rng.normal(70, 8, len(devices) * per_device),
+        "Vibration": rng.normal(1.5, 0.6, len(devices) * per_device),
+        "Power_Usage": rng.normal(0.22, 0.04, len(devices) * per_device),
+        "Humidity": rng.normal(45, 10, len(devices) * per_device),
+        "Pressure": rng.normal(30, 4, len(devices) * per_device),
+        "Machine_Type_Code": rng.integers(0, 3, len(devices) * per_device),
+    })
+    return frame
+
+def check_transform():
+    print("RollingFeatures:")
+    rng = np.random.default_rng(1)
+    devices = ["Press_A1", "Lathe_B2", "Pump_C3"]
+    frame = make_frame(rng, devices, 300, datetime(2025, 5, 29, 10))
+    shuffled = frame.sample(frac=1, random_state=2)
+    shuffled.index = np.arange(len(shuffled)) * 3 + 5  # a non-default index must be kept too
+    stage = RollingFeatures(windows=(5, 40)).fit(shuffled)
+    out = stage.transform(shuffled)
+    check("rows keep their input order and index", out.index.equals(shuffled.index)
+          and out[list(shuffled.columns)].equals(shuffled))
+
+    matches = True
+    for device in devices:
+        ordered = out[out["deviceId"] == device].sort_values("timestamp")
+        for channel in SENSOR_DEFAULTS:
+            for size in (5, 40):
+                expected = pandas_stats(ordered[channel].reset_index(drop=True), size).to_numpy()
+                actual = ordered[[f"{channel}_{stat}_{size}" for stat in ROLLING_STATS]].to_numpy()
+                matches &= close(expected, actual, 100)
+    check("per-device features match pandas on interleaved, shuffled rows", matches)
+    check("a stateless stage keeps no windows between calls", stage.state_ == {}
+          and stage.transform(shuffled).equals(out))
+
+    stateful = RollingFeatures(windows=(5, 40), stateful=True).fit(frame)
+    cut = frame["timestamp"].sort_values().iloc[len(frame) // 2]
+    parts = [stateful.transform(frame[frame["timestamp"] < cut]), stateful.transform(frame[frame["timestamp"] >= cut])]
+    whole = RollingFeatures(windows=(5, 40)).fit(frame).transform(frame)
+    names = list(stateful.get_feature_names_out())
+    check("stateful calls on consecutive slices match one stateless call on the whole stream",
+          np.allclose(pd.concat(parts).loc[whole.index, names].to_numpy(), whole[names].to_numpy()))
+    windows = {device: [list(window.values) for channel in state for window in channel]
+               for device, state in stateful.state_.items()}
+    stateful.transform(frame[frame["timestamp"] < cut])
+    check("a stateful stage does not push readings at or before the newest it has seen",
+          windows == {device: [list(window.values) for channel in state for window in channel]
+                      for device, state in stateful.state_.items()})
+
+def rolling_pipeline(frame, stateful=False):
+    """Temperature trend features feeding a forest that flags warming machines"""
+    columns = FEATURE_COLUMNS + ["Temperature_mean_5", "Temperature_slope_5"]
+    pipeline = Pipeline([
+        ('rolling', RollingFeatures(windows=(5,), stateful=stateful)),
+        ('preprocessor', ColumnTransformer([('sensors', 'passthrough', columns)])),
+        ('model', RandomForestClassifier(n_estimators=30, max_depth=6, random_state=0))
+    ])
+    features = RollingFeatures(windows=(5,)).fit_transform(frame)
+    return pipeline.fit(frame, (features["Temperature_slope_5"] > 0.5).astype(int))
+
+def check_app(workdir):
+    print("App:")
+    rng = np.random.default_rng(3)
+    frame = make_frame(rng, ["Train_1", "Train_2"], 500, datetime(2025, 5, 1))
+    root = os.path.join(workdir, "registry")
+    path = os.path.join(workdir, "rolling.joblib")
+    joblib.dump(rolling_pipeline(frame), path)
+    ModelRegistry(root).publish(path)
+    os.environ.update(MODEL_REGISTRY_DIR=root, MODEL_WATCH_INTERVAL="0", APP_WARMUP="0", SENSOR_CACHE_TTL="0",
+                      TIMESERIES_DB_PATH=os.path.join(workdir, "app.db"))
+    import app
+    app.create_app()
+    app.RISK_PREFILTER = True
+    app.ANOMALY_GATE = True
+    table = StubTable([])
+    app.table_resource.set(table)
+    client = app.app.test_client()
+
+    try:
+        app.validate_pipeline(rolling_pipeline(frame, stateful=True))
+        rejected = False
+    except ValueError as e:
+        rejected = "stateful" in str(e)
+    check("a pipeline with a stateful stage fails validation", rejected)
+    check("/model-info reports the model as windowed", client.get('/model-info').get_json().get("windowed") is True)
+
+    readings = make_frame(rng, ["Press_A1", "Lathe_B2"], 40, datetime(2025, 5, 29, 10))
+    readings["Temperature"] += np.where(np.arange(len(readings)) % 40 >= 20, np.arange(len(readings)) % 40 - 20, 0)
+    readings["Machine_Type"] = "Type_A"
+    body = readings.drop(columns=["Machine_Type_Code"]).to_dict(orient="records")
+    expected, _ = score_frame(app.current_model().pipeline, validate_readings(pd.DataFrame(body))[0])
+    sources = ("cache", "prefilter", "anomaly_gate")
+    before = {source: metrics.SCORED_ROWS.value(source=source) for source in sources}
+    served = [[row["risk"] for row in client.post('/predict/batch', json=body).get_json()] for _ in range(2)]
+    check("/predict/batch scores the whole batch with the pipeline, the same every time",
+          served[0] == served[1] == [round(float(r), 3) for r in expected] and 0 < np.mean(expected) < 1)
+
+    for row in body:
+        table.put_item(Item={"deviceId": row["deviceId"], "timestamp": row["timestamp"], "Machine_Type": "Type_A",
+                             **{name: app.Decimal(f"{row[name]:.4f}") for name in SENSOR_DEFAULTS}})
+    gate = app.anomaly_gate.stats()
+    response = client.get('/predict?devices=Press_A1,Lathe_B2')
+    check("/predict scores polled readings", response.status_code == 200 and len(response.get_json()) > 0)
+    check("the prediction cache, pre-filter and anomaly gate are bypassed",
+          all(metrics.SCORED_ROWS.value(source=source) == before[source] for source in sources)
+          and app.anomaly_gate.stats()["gated"] + app.anomaly_gate.stats()["passed"] == gate["gated"] + gate["passed"])
+    check("serving leaves the stage's state untouched", app.current_model().pipeline.named_steps['rolling'].state_ == {})
+    check_incremental(app, table, rng)
+    app.RISK_PREFILTER = False
+    app.ANOMALY_GATE = False
+
+def check_incremental(app, table, rng):
+    print("Incremental /predict:")
+    history = make_frame(rng, ["Drill_D4"], 62, datetime(2025, 5, 30, 8))
+    history["Temperature"] += np.where(np.arange(62) >= 30, (np.arange(62) - 30) * 0.8, 0)
+    items = [{"deviceId": row["deviceId"], "timestamp": row["timestamp"], "Machine_Type": "Type_A",
+              **{name: Decimal(f"{row[name]:.4f}") for name in SENSOR_DEFAULTS}}
+             for row in history.to_dict(orient="records")]
+    frame = app.ReadingColumns.from_items(items).to_frame()
+    pipeline = app.current_model().pipeline
+    expected = dict(zip(frame["timestamp"], np.round(score_frame(pipeline, frame)[0], 3).tolist()))
+
+    # The first poll finds PREDICTION_BUFFER_SIZE readings, each later one one or two
+    batches = [range(0, 10)]
+    while batches[-1].stop < 60:
+        batches.append(range(batches[-1].stop, min(batches[-1].stop + 1 + len(batches) % 2, 60)))
+    client = app.app.test_client()
+    served = {}
+    statuses = set()
+    for batch in batches:
+        for i in batch:
+            table.put_item(Item=items[i])
+        statuses.add(client.get('/predict?devices=Drill_D4').status_code)
+        served.update((p["timestamp"], p["risk"]) for p in app.prediction_store.latest("Drill_D4"))
+    check(f"{len(batches)} polls of one or two new readings give the risks of the whole history in one batch",
+          statuses == {200} and served == {t: expected[t] for t in frame["timestamp"][:60]})
+    alone = {t: round(float(r), 3) for batch in batches
+             for t, r in zip(frame["timestamp"][batch.start:batch.stop],
+                             score_frame(pipeline, frame.iloc[batch.start:batch.stop])[0])}
+    check("(scoring each poll's readings on their own gives different risks)", alone != served)
+
+    # As after a restart or a model swap: no windows, and no watermark, so the next poll refetches the buffer
+    model = app.current_model()
+    model.streaming_pipeline = app.streaming_pipeline(model.pipeline)
+    app.prediction_store.clear()
+    for item in items[60:]:
+        table.put_item(Item=item)
+    before = table.query_count
+    client.get('/predict?devices=Drill_D4')
+    refetched = {p["timestamp"]: p["risk"] for p in app.prediction_store.latest("Drill_D4")}
+    check("with empty windows, the readings before the new ones are read first and the risks still match",
+          table.query_count - before == 2 and len(refetched) == 10
+          and refetched == {t: expected[t] for t in frame["timestamp"][52:]})
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--readings", type=int, default=5000)
+    args = parser.parse_args()
+
+    check_window(args.readings)
+    check_transform()
+    with tempfile.TemporaryDirectory() as workdir:
+        check_app(workdir)
+
+    finish("rolling feature")
+
+if __name__ == "__main__":
+    main()
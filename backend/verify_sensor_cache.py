@@ -0,0 +1,129 @@
+"""
+Checks for the DynamoDB read-through cache, run against a local StubTable.
+
+Usage: python verify_sensor_cache.py
+
+Covers TTL expiry, LRU eviction, request coalescing under concurrency,
+failure handling, and /sensors + /predict sharing queries through the cache.
+Exits non-zero if any check fails.
+"""
+import threading
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from boto3.dynamodb.conditions import Key
+
+from model_registry import LoadedModel
+from sensor_cache import QueryCache
+from stub_table import StubTable
+from verify_helpers import check, finish
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+def seed_items(device_id, count):
+    now = datetime.now()
+    return [
+        {
+            "deviceId": device_id,
+            "timestamp": (now - timedelta(minutes=i)).strftime("%Y-%m-%dT%H:%M:%S.%f"),
+            "Temperature": Decimal("71.5"),
+            "Vibration": Decimal("1.2"),
+            "Power_Usage": Decimal("0.21"),
+            "Humidity": Decimal("44"),
+            "Pressure": Decimal("30"),
+            "Machine_Type": "Type_A",
+        }
+        for i in range(count)
+    ]
+
+def check_ttl_and_lru():
+    print("TTL and LRU:")
+    clock = FakeClock()
+    cache = QueryCache(ttl_seconds=5, max_entries=2, clock=clock)
+    calls = []
+    fetch = lambda key: (lambda: calls.append(key) or f"value-{key}")
+
+    cache.get("a", fetch("a"))
+    cache.get("a", fetch("a"))
+    check("second lookup within TTL is a hit", calls == ["a"] and cache.hits == 1)
+
+    clock.now = 5.1
+    cache.get("a", fetch("a"))
+    check("lookup after TTL refetches", calls == ["a", "a"])
+
+    cache.get("b", fetch("b"))
+    cache.get("a", fetch("a"))  # touch a so b is least recently used
+    cache.get("c", fetch("c"))
+    check("LRU entry evicted at capacity", cache.evictions == 1 and cache.stats()["entries"] == 2)
+    cache.get("b", fetch("b"))
+    check("evicted key refetches", calls[-1] == "b")
+
+def check_coalescing():
+    print("Request coalescing:")
+    table = StubTable(seed_items("ESP8266_IoT", 30), latency=0.2)
+    cache = QueryCache(ttl_seconds=5)
+    results = []
+
+    def worker():
+        fetch = lambda: table.query(KeyConditionExpression=Key('deviceId').eq('ESP8266_IoT'),
+                                    ScanIndexForward=False, Limit=10)['Items']
+        results.append(cache.get(("ESP8266_IoT", None, 10), fetch))
+
+    threads = [threading.Thread(target=worker) for _ in range(20)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    check("20 concurrent callers issue one query", table.query_count == 1)
+    check("every caller gets the result", len(results) == 20 and all(len(r) == 10 for r in results))
+    check("followers counted as coalesced", cache.misses == 1 and cache.coalesced == 19)
+
+def check_failures():
+    print("Failures:")
+    cache = QueryCache(ttl_seconds=5)
+
+    def failing():
+        raise RuntimeError("throttled")
+
+    try:
+        cache.get("k", failing)
+        check("fetch error propagates", False)
+    except RuntimeError:
+        check("fetch error propagates", True)
+    check("failed fetch is not cached", cache.get("k", lambda: "ok") == "ok")
+
+def check_app_endpoints():
+    print("App endpoints on a stub table:")
+    import app
+    import joblib
+    app.table = StubTable(seed_items("ESP8266_IoT", 30))
+    # /predict only queries when a model is served; the bundled pipeline fails its warm-up batch
+    if app.current_model() is None:
+        app.activate_model(LoadedModel(None, joblib.load("pipeline.joblib"), path="pipeline.joblib"))
+    app.sensor_cache.invalidate()
+    client = app.app.test_client()
+
+    for _ in range(3):
+        client.get('/sensors')
+    check("repeated /sensors polls share one query", app.table.query_count == 1)
+    for _ in range(3):
+        client.get('/predict')
+    # Cold /predict query, then one incremental "newer than" query shared by later polls
+    check("/predict polls share incremental queries", app.table.query_count == 3)
+    stats = client.get('/debug/cache-stats').get_json()
+    check("/debug/cache-stats reports hits and misses", stats["hits"] == 3 and stats["misses"] == 3)
+
+def main():
+    check_ttl_and_lru()
+    check_coalescing()
+    check_failures()
+    check_app_endpoints()
+    finish("cache")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Checks for shadow scoring, run against a temporary model registry.
+
+Usage: python verify_shadow_scoring.py [--batches 200] [--rows 500]
+
+Serves v1 (at risk above 75°) with two shadows: v2 shares v1's preprocessing
+but flags readings above 60°, and v3 agrees with v1 but scales its features
+first. Checks that responses are unchanged, that disagreement rates match the
+readings between 60° and 75°, that only v2 reuses v1's features, and that each
+shadow batch is logged; then reports /predict/batch latency with and without
+shadows. Exits non-zero if any check fails.
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+
+import numpy as np
+from sklearn.preprocessing import StandardScaler
+from sklearn.tree import DecisionTreeClassifier
+
+from model_registry import ModelRegistry
+from verify_helpers import build_pipeline, check, finish, uniform_frame
+
+def threshold_pipeline(path, threshold, scale=False):
+    """A pipeline that predicts 1 when Temperature is above threshold"""
+    frame = uniform_frame(2000)
+    return build_pipeline(path, frame, frame["Temperature"] > threshold, DecisionTreeClassifier(max_depth=4, random_state=0),
+                          StandardScaler() if scale else 'passthrough')
+
+def make_readings(count, seed):
+    rng = np.random.default_rng(seed)
+    return [
+        {"Temperature": float(t), "Vibration": 1.0, "Power_Usage": 0.2, "Humidity": 40.0, "Pressure": 30.0,
+         "Machine_Type": "Type_A"}
+        for t in rng.uniform(40, 95, count).round(1)
+    ]
+
+def post_batches(client, batches, rows):
+    """Post batches of readings; returns (risks per batch, latency per request)"""
+    risks, latencies = [], []
+    for batch in range(batches):
+        readings = make_readings(rows, batch)
+        start = time.perf_counter()
+        response = client.post('/predict/batch', json=readings)
+        body = response.get_json()
+        latencies.append(time.perf_counter() - start)
+        risks.append([row["risk"] for row in body])
+    return risks, np.array(latencies)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batches", type=int, default=200)
+    parser.add_argument("--rows", type=int, default=500)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        root = os.path.join(workdir, "registry")
+        registry = ModelRegistry(root)
+        for name, threshold, scale in (("v1", 75, False), ("v2", 60, False), ("v3", 75, True)):
+            registry.publish(threshold_pipeline(os.path.join(workdir, f"{name}.joblib"), threshold, scale))
+        registry.set_active("v1")
+        log_path = os.path.join(workdir, "shadow_log.jsonl")
+        os.environ.update(MODEL_REGISTRY_DIR=root, MODEL_WATCH_INTERVAL="0", APP_WARMUP="0",
+                          SHADOW_MODEL_VERSIONS="v2,v3", SHADOW_LOG_PATH=log_path,
+                          TIMESERIES_DB_PATH=os.path.join(workdir, "app.db"))
+        import app
+        app.create_app()
+        client = app.app.test_client()
+        check("shadow models load", [shadow.version for shadow in app.current_shadow_models()] == ["v2", "v3"])
+        print("Shadow scoring:")
+
+        app.SHADOW_MODEL_VERSIONS = []
+        baseline, plain_latency = post_batches(client, args.batches, args.rows)
+        app.SHADOW_MODEL_VERSIONS = ["v2", "v3"]
+        shadowed, shadow_latency = post_batches(client, args.batches, args.rows)
+        check("all shadow batches finish", app.shadow_scorer.wait(timeout=120))
+        check("responses are identical with shadows on", shadowed == baseline)
+
+        temperatures = np.concatenate([[r["Temperature"] for r in make_readings(args.rows, b)] for b in range(args.batches)])
+        expected_rate = np.mean((temperatures > 60) & (temperatures <= 75))
+        stats = client.get('/debug/shadow-stats').get_json()
+        scored = args.batches - stats["dropped"]
+        v2, v3 = stats["versions"]["v2"], stats["versions"]["v3"]
+        print(f"  v2 disagreement {v2['disagreement_rate']:.4f} (expected about {expected_rate:.4f}), "
+              f"v3 {v3['disagreement_rate']:.4f}; {stats['dropped']} batch(es) dropped")
+        check("every shadow batch not dropped is scored", v2["batches"] == v3["batches"] == scored > 0)
+        check("v2 disagrees on readings between 60 and 75 degrees", abs(v2["disagreement_rate"] - expected_rate) < 0.02)
+        check("v3 agrees with the serving model", v3["disagreement_rate"] < 0.005)
+        check("only identical preprocessing is shared",
+              v2["shared_preprocessing_batches"] == scored and v3["shared_preprocessing_batches"] == 0)
+        with open(log_path) as f:
+            records = [json.loads(line) for line in f]
+        check("one log line per shadow batch", len(records) == 2 * scored
+              and {record["primary"] for record in records} == {"v1"})
+
+        print(f"/predict/batch latency over {args.batches} x {args.rows} readings:")
+        for label, latencies in (("no shadows", plain_latency), ("2 shadows", shadow_latency)):
+            print(f"  {label:<11} p50 {np.percentile(latencies, 50) * 1000:7.2f} ms   "
+                  f"p95 {np.percentile(latencies, 95) * 1000:7.2f} ms")
+        for version, version_stats in stats["versions"].items():
+            print(f"  {version} scoring p50 {version_stats['latency_ms_p50']:7.2f} ms "
+                  f"({'serving' if version == stats['serving'] else 'shadow'})")
+
+    finish("shadow scoring")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""
+Checks for the local time-series store and /sensors/history, run against a StubTable.
+
+Usage: python verify_timeseries_store.py [--rows 604800]
+
+Covers write-once ingest, bucketed min/max/mean against a NumPy reference,
+rollup-level selection, incremental DynamoDB sync behind /sensors/history,
+downsampled /sensors?from=&to=&points= responses, and reports range-query
+latency over --rows readings (default: one week at 1 Hz).
+Exits non-zero if any check fails.
+"""
+import argparse
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import numpy as np
+
+from stub_table import StubTable
+from timeseries_store import CHANNELS, TimeSeriesStore, timestamp_seconds
+from verify_helpers import check, finish
+
+def make_items(device_id, end, count, step_seconds, seed=0):
+    """count readings ending at `end`, step_seconds apart, oldest first"""
+    rng = np.random.default_rng(seed)
+    values = rng.normal([70, 1.5, 0.22, 45, 30], [8, 0.6, 0.04, 10, 4], size=(count, len(CHANNELS)))
+    return [
+        {
+            "deviceId": device_id,
+            "timestamp": (end - timedelta(seconds=step_seconds * (count - 1 - i))).strftime("%Y-%m-%dT%H:%M:%S.%f"),
+            **{channel: Decimal(str(round(float(value), 4))) for channel, value in zip(CHANNELS, row)},
+            "Machine_Type": "Type_A",
+        }
+        for i, row in enumerate(values)
+    ]
+
+def check_store(workdir):
+    print("Store:")
+    store = TimeSeriesStore(os.path.join(workdir, "store.db"))
+    end = datetime(2025, 6, 1)
+    items = make_items("pump", end, 1000, 60)
+    check("first write stores every reading", store.write("pump", items) == 1000)
+    check("rewriting the same readings stores nothing", store.write("pump", items) == 0 and store.count() == 1000)
+
+    start = items[0]["timestamp"]
+    stop = (end + timedelta(seconds=1)).strftime("%Y-%m-%dT%H:%M:%S.%f")
+    buckets = store.downsample("pump", start, stop, 10)
+
+    epochs = np.array([timestamp_seconds(item["timestamp"]) for item in items])
+    temperatures = np.array([float(item["Temperature"]) for item in items])
+    width = (timestamp_seconds(stop) - timestamp_seconds(start)) / 10
+    index = ((epochs - epochs[0]) // width).astype(int)
+    expected = [(temperatures[index == b].min(), temperatures[index == b].max(), temperatures[index == b].mean())
+                for b in range(10)]
+    actual = [(b["Temperature"]["min"], b["Temperature"]["max"], b["Temperature"]["mean"]) for b in buckets]
+    check("ten buckets covering every reading", len(buckets) == 10 and sum(b["count"] for b in buckets) == 1000)
+    check("bucket min/max/mean match NumPy", np.allclose(actual, expected))
+    check("raw range query returns rows oldest first",
+          [row["timestamp"] for row in store.readings("pump", start, stop)] == [item["timestamp"] for item in items])
+
+    store.write("fan", make_items("fan", end, 2000, 30))  # two readings per minute
+    levels = [store.series("fan", start, stop, max_rows=max_rows)["resolution"] for max_rows in (2000, 1500, 500)]
+    check("series falls back from raw to minute to hourly rollups", levels == [0, 60, 3600])
+    hours = store.series("pump", start, stop, max_rows=10)
+    check("hourly rollups count every reading", hours["count"].sum() == 1000
+          and len(hours["epoch"]) == len(np.unique(epochs // 3600)))
+    check("hourly rollups keep the extremes", np.isclose(np.nanmax(hours["max"][:, 0]), temperatures.max())
+          and np.isclose(np.nanmin(hours["min"][:, 0]), temperatures.min()))
+    store.close()
+
+def check_history_endpoint(workdir):
+    print("/sensors/history on a stub table:")
+    os.environ["TIMESERIES_DB_PATH"] = os.path.join(workdir, "app.db")
+    import app
+    app.create_app()
+    now = datetime.now()
+    history = make_items("ESP8266_IoT", now - timedelta(minutes=1), 7 * 24 * 60, 60)
+    app.table = StubTable(history)
+    client = app.app.test_client()
+    week_ago = (now - timedelta(days=3)).strftime("%Y-%m-%dT%H:%M:%S")
+
+    response = client.get(f'/sensors/history?from={week_ago}&points=72')
+    body = response.get_json()
+    check("history returns 72 hourly buckets", response.status_code == 200 and len(body["points"]) == 72)
+    check("bucket fields use /sensors names", set(body["points"][0]) >= {"temperature", "power_consumption", "count"})
+    check("first call stores the requested range", app.timeseries_store.count("ESP8266_IoT") == 3 * 24 * 60)
+
+    queries = app.table.query_count
+    client.get(f'/sensors/history?from={week_ago}&points=72')
+    check("repeat call only asks DynamoDB for newer readings", app.table.query_count == queries + 1
+          and app.timeseries_store.count("ESP8266_IoT") == 3 * 24 * 60)
+
+    for item in make_items("ESP8266_IoT", now, 1, 60, seed=1):
+        app.table.put_item(Item=item)
+    client.get(f'/sensors/history?from={week_ago}&points=72')
+    check("new DynamoDB reading is synced once", app.timeseries_store.count("ESP8266_IoT") == 3 * 24 * 60 + 1)
+
+    earlier = (now - timedelta(days=5)).strftime("%Y-%m-%dT%H:%M:%S")
+    client.get(f'/sensors/history?from={earlier}&points=120')
+    check("earlier range fetches only the missing days", app.timeseries_store.count("ESP8266_IoT") == 5 * 24 * 60 + 1)
+
+    check("bad range is rejected", client.get('/sensors/history?from=2025-06-02&to=2025-06-01').status_code == 400)
+
+    rows = client.get(f'/sensors?from={earlier}&points=500').get_json()
+    check("/sensors?from=&points= returns at most `points` rows", 0 < len(rows) <= 500)
+    check("downsampled rows keep the /sensors shape, newest first",
+          {"id", "device_id", "timestamp", "temperature", "pressure"} <= set(rows[0])
+          and rows[0]["timestamp"] > rows[-1]["timestamp"])
+    buckets = client.get(f'/sensors?from={earlier}&points=100&method=minmax').get_json()
+    stored = [row["Temperature"] for row in app.timeseries_store.readings("ESP8266_IoT", earlier, "9999")]
+    check("minmax buckets keep the extremes", len(buckets) <= 100
+          and np.isclose(max(row["temperature_max"] for row in buckets), max(stored))
+          and np.isclose(min(row["temperature_min"] for row in buckets), min(stored)))
+    check("unknown method is rejected", client.get('/sensors?points=10&method=avg').status_code == 400)
+
+def report_latency(workdir, rows):
+    print(f"Range query latency over {rows} readings:")
+    store = TimeSeriesStore(os.path.join(workdir, "latency.db"))
+    end = datetime(2025, 6, 1)
+    items = make_items("fan", end, rows, 1)
+    start_time = time.perf_counter()
+    for offset in range(0, rows, 50000):
+        store.write("fan", items[offset:offset + 50000])
+    print(f"  ingest: {time.perf_counter() - start_time:.2f}s")
+
+    start = items[0]["timestamp"]
+    stop = (end + timedelta(seconds=1)).strftime("%Y-%m-%dT%H:%M:%S.%f")
+    for span_rows in (3600, 86400, rows):
+        span_start = items[-min(span_rows, rows)]["timestamp"]
+        start_time = time.perf_counter()
+        buckets = store.downsample("fan", span_start, stop, 500)
+        elapsed = time.perf_counter() - start_time
+        print(f"  {min(span_rows, rows):>8} readings -> {len(buckets)} buckets: {elapsed * 1000:.1f} ms")
+    check("full range downsampled into 500 buckets", len(store.downsample("fan", start, stop, 500)) == 500)
+    store.close()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=7 * 24 * 3600)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        check_store(workdir)
+        check_history_endpoint(workdir)
+        report_latency(workdir, args.rows)
+
+    finish("time-series store")
+
+if __name__ == "__main__":
+    main()